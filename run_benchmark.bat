@@ -0,0 +1,2 @@
+echo "run synthetic benchmark"
+py -m tests.benchmark.run_benchmark %*
@@ -11,4 +11,4 @@ echo "run test_travel_time_scoring"
 python -m tests.modules.bus_scoring.test_travel_time_scoring
 
 echo " RUN ALL SCORING"
-python -m tests.compare_flow.test_compareflow
\ No newline at end of file
+python -m src compare %*
\ No newline at end of file
@@ -0,0 +1,411 @@
+"""
+Unified command line entry point: python -m src <command> [options]
+
+Only argparse is imported at start-up; every command imports the processors/scoring
+modules (and with them pandas, NumPy, SciPy) when it runs, so --help stays instant.
+"""
+import argparse
+import os
+import sys
+
+def _print_result(result):
+    import json
+    print(f"RESULT={json.dumps(result, indent=4, default=str)}")
+
+def _time_window(args):
+    from src.modules.prepare_bus_score_data.events_stream import parse_time_window
+    return parse_time_window(args.time_window)
+
+def _out(output_dir: str, name: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, name)
+
+# --- Core data processors ---
+
+def _cmd_network(args):
+    from src.modules.core_data_processor.network_processor import NetworkData
+    network = NetworkData(args.network)
+    network.process()
+    network.save_nodes_to_csv(_out(args.output_dir, "nodes.csv"))
+    network.save_links_to_csv(_out(args.output_dir, "links.csv"))
+
+def _cmd_schedule(args):
+    from src.modules.core_data_processor.schedule_processor import TransitScheduleData
+    schedule = TransitScheduleData(args.schedule)
+    schedule.process()
+    schedule.save_stops_to_csv(_out(args.output_dir, "stops.csv"))
+    schedule.save_routes_to_csv(_out(args.output_dir, "routes.csv"))
+    schedule.save_route_stops_to_csv(_out(args.output_dir, "route_stops.csv"))
+    schedule.save_route_links_to_csv(_out(args.output_dir, "route_links.csv"))
+    schedule.save_departures_to_csv(_out(args.output_dir, "departures.csv"))
+    schedule.get_route_stop_index().save_route_stop_distances_to_csv(_out(args.output_dir, "route_stop_distances.csv"))
+
+def _cmd_vehicles(args):
+    from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+    vehicles = VehicleData(args.vehicles)
+    vehicles.process()
+    vehicles.save_vehicles_to_csv(_out(args.output_dir, "vehicles.csv"))
+    vehicles.save_vehicle_types_to_csv(_out(args.output_dir, VEHICLE_TYPES_CSV))
+
+def _cmd_plans(args):
+    from src.modules.core_data_processor.plan_input_processor import PlanInputData
+    plans = PlanInputData(args.plans, num_workers=args.workers)
+    plans.process()
+    plans.save_homes_to_npy(_out(args.output_dir, "homes_processed.npy"))
+    plans.save_activities_to_csv(_out(args.output_dir, "plan_activities.csv"))
+    plans.save_legs_to_csv(_out(args.output_dir, "plan_legs.csv"))
+
+# --- Score data preparation (events) ---
+
+def _cmd_ridership_prepare(args):
+    from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+    ridership = RidershipPrepareData(args.events, args.vehicles_csv, bin_size=args.bin_size,
+                                     time_window=_time_window(args), distinct_counting=args.distinct)
+    ridership.process()
+    ridership.save_ridership_to_csv(_out(args.output_dir, "ridership_processed.csv"))
+    ridership.save_time_series_to_csv(_out(args.output_dir, "ridership_time_series.csv"))
+    ridership.save_travel_time_sketches_to_json(_out(args.output_dir, "travel_time_sketches.json"))
+    if args.distinct == "hll":
+        ridership.save_distinct_riders_to_csv(_out(args.output_dir, "distinct_riders.csv"))
+        ridership.save_distinct_rider_sketches_to_json(_out(args.output_dir, "distinct_riders.json"))
+
+def _cmd_trips_prepare(args):
+    from src.modules.prepare_bus_score_data.trips_legs_prepare_processor import TripsLegsPrepareData
+    ridership = TripsLegsPrepareData(args.trips, args.legs, args.vehicles_csv, bin_size=args.bin_size,
+                                     time_window=_time_window(args), distinct_counting=args.distinct)
+    ridership.process()
+    ridership.save_ridership_to_csv(_out(args.output_dir, "ridership_processed.csv"))
+    ridership.save_time_series_to_csv(_out(args.output_dir, "ridership_time_series.csv"))
+    ridership.save_travel_time_sketches_to_json(_out(args.output_dir, "travel_time_sketches.json"))
+    if args.distinct == "hll":
+        ridership.save_distinct_riders_to_csv(_out(args.output_dir, "distinct_riders.csv"))
+        ridership.save_distinct_rider_sketches_to_json(_out(args.output_dir, "distinct_riders.json"))
+    if args.parity_events:
+        from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+        reference = RidershipPrepareData(args.parity_events, args.vehicles_csv, bin_size=args.bin_size,
+                                         time_window=_time_window(args))
+        reference.process()
+        _print_result(ridership.check_parity(reference))
+
+def _cmd_transfers_prepare(args):
+    from src.modules.prepare_bus_score_data.trip_structure_prepare_processor import TripStructurePrepareData
+    structure = TripStructurePrepareData(args.ridership_csv)
+    structure.process()
+    structure.save_transfer_distribution_to_csv(_out(args.output_dir, "pt_transfer_distribution.csv"))
+    structure.save_sequence_distribution_to_csv(_out(args.output_dir, "pt_vehicle_sequences.csv"))
+    _print_result(structure.summary())
+
+def _cmd_otp_prepare(args):
+    from src.modules.prepare_bus_score_data.on_time_performance_prepare_processor import OnTimePerformancePrepareData
+    otp = OnTimePerformancePrepareData(args.events, args.vehicles_csv, bin_size=args.bin_size,
+                                       time_window=_time_window(args))
+    otp.process()
+    otp.save_otp_data_to_csv(_out(args.output_dir, "otp_processed.csv"))
+    otp.save_time_series_to_csv(_out(args.output_dir, "otp_time_series.csv"))
+
+def _cmd_occupancy_prepare(args):
+    from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+    occupancy = BusOccupancyPrepareData(args.events, args.vehicles_csv, time_window=_time_window(args))
+    occupancy.process()
+    occupancy.save_loads_to_csv(_out(args.output_dir, "bus_loads.csv"))
+    occupancy.save_load_factor_distribution_to_csv(_out(args.output_dir, "bus_load_factor_distribution.csv"))
+    _print_result(occupancy.summary())
+
+def _cmd_stop_activity_prepare(args):
+    from src.modules.prepare_bus_score_data.stop_activity_prepare_processor import StopActivityPrepareData
+    activity = StopActivityPrepareData(args.events, args.vehicles_csv, time_window=_time_window(args))
+    activity.process()
+    activity.save_stop_activity_to_csv(_out(args.output_dir, "stop_activity.csv"))
+    activity.save_stop_totals_to_csv(_out(args.output_dir, "stop_activity_totals.csv"))
+    _print_result(activity.summary())
+
+def _cmd_distance_prepare(args):
+    from src.modules.core_data_processor.network_processor import NetworkData
+    from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+    from src.modules.prepare_bus_score_data.bus_distance_prepare_processor import BusDistancePrepareData
+    network = NetworkData(args.network)
+    network.process()
+    occupancy = BusOccupancyPrepareData(args.events, args.vehicles_csv)
+    distance = BusDistancePrepareData(args.events, network.link_length_array(), occupancy,
+                                      time_window=_time_window(args), link_ids=network.ids)
+    distance.process()
+    distance.save_route_distances_to_csv(_out(args.output_dir, "bus_route_distances.csv"))
+    _print_result(distance.summary())
+
+def _cmd_service_hours_prepare(args):
+    from src.modules.prepare_bus_score_data.service_hours_prepare_processor import ServiceHoursPrepareData
+    service = ServiceHoursPrepareData(args.schedule, modes=None if args.all_modes else ("bus",),
+                                      time_window=_time_window(args))
+    service.process()
+    service.save_route_service_hours_to_csv(_out(args.output_dir, "route_service_hours.csv"))
+    _print_result(service.summary())
+
+def _cmd_od_prepare(args):
+    from src.modules.core_data_processor.network_processor import NetworkData
+    from src.modules.core_data_processor.zone_processor import ZoneGrid
+    from src.modules.prepare_bus_score_data.od_matrix_prepare_processor import ODMatrixPrepareData
+    network = NetworkData(args.network)
+    network.process()
+    grid = ZoneGrid.from_points([n.x for n in network.nodes_list], [n.y for n in network.nodes_list],
+                                rows=args.rows, cols=args.cols)
+    grid.save_zones_to_json(_out(args.output_dir, "zones.json"))
+    od = ODMatrixPrepareData(args.activities_csv, args.ridership_csv, grid, legs_csv_path=args.legs_csv)
+    od.process()
+    od.save_od_matrices_to_npz(_out(args.output_dir, "od_matrices.npz"))
+    od.save_od_pairs_to_csv(_out(args.output_dir, "od_pairs.csv"))
+
+# --- Scores ---
+
+def _cmd_score_ridership(args):
+    from src.modules.bus_scoring.ridership_scoring import calculate_bus_ridership
+    _print_result(calculate_bus_ridership(args.ridership_csv, args.homes, args.riders_sketch))
+
+def _cmd_score_travel_time(args):
+    from src.modules.bus_scoring.travel_time_scoring import calculate_travel_time_scores
+    _print_result(calculate_travel_time_scores(args.ridership_csv, args.sketches))
+
+def _cmd_score_otp(args):
+    from src.modules.bus_scoring.on_time_performance_scoring import calculate_otp_score
+    _print_result(calculate_otp_score(args.otp_csv, args.filter_column, args.min_threshold, args.max_threshold))
+
+def _cmd_score_productivity(args):
+    from src.modules.prepare_bus_score_data.service_hours_prepare_processor import ServiceHoursPrepareData
+    from src.modules.bus_scoring.ridership_scoring import calculate_bus_ridership
+    from src.modules.bus_scoring.productivity_scoring import calculate_productivity_score
+    service = ServiceHoursPrepareData(args.schedule, time_window=_time_window(args))
+    service.process()
+    riders = calculate_bus_ridership(args.ridership_csv, riders_sketch_path=args.riders_sketch)["unique_persons_bus"]
+    _print_result(calculate_productivity_score(service.summary()["revenue_hours"], riders))
+
+def _cmd_score_coverage(args):
+    from src.modules.bus_scoring.service_coverage_scoring import ServiceCoveragePrepareData
+    coverage = ServiceCoveragePrepareData(args.schedule, args.homes)
+    coverage.process()
+    _print_result(coverage.calculate_coverage(args.radius))
+
+def _cmd_score_od(args):
+    from src.modules.bus_scoring.od_matrix_scoring import calculate_od_changes
+    _print_result(calculate_od_changes(args.before_npz, args.after_npz, args.delta_csv))
+
+def _cmd_score_accessibility(args):
+    from src.modules.core_data_processor.network_processor import NetworkData
+    from src.modules.core_data_processor.zone_processor import ZoneGrid
+    from src.modules.bus_scoring.accessibility_scoring import AccessibilityScoring
+    from src.modules.prepare_bus_score_data.events_stream import parse_time_window
+    network = NetworkData(args.network)
+    network.process()
+    grid = ZoneGrid.from_points([n.x for n in network.nodes_list], [n.y for n in network.nodes_list],
+                                rows=args.rows, cols=args.cols)
+    scoring = AccessibilityScoring(args.schedule, grid, args.homes, args.activities_csv,
+                                   departure_window=parse_time_window(args.departure_window),
+                                   departure_interval=args.interval * 60, num_workers=args.workers)
+    scoring.process()
+    scoring.save_zone_accessibility_to_csv(_out(args.output_dir, "zone_accessibility.csv"))
+    _print_result(scoring.summary())
+
+def _cmd_live(args):
+    from src.modules.bus_scoring.live_scoring import LiveScoring
+    live = LiveScoring(args.events, args.vehicles_csv, args.output_dir, args.interval * 60, args.homes,
+                       args.poll, args.idle_timeout, _time_window(args))
+    _print_result(live.run())
+
+def _cmd_iterations(args):
+    from src.modules.core_data_processor.network_processor import NetworkData
+    from src.modules.bus_scoring.ridership_scoring import count_population
+    from src.modules.compare_flow.iteration_scoring import IterationScoring
+    link_ids = link_lengths = None
+    if args.network:
+        network = NetworkData(args.network)
+        network.process()
+        link_ids = [l.id for l in network.link_list]
+        link_lengths = [l.length for l in network.link_list]
+    scoring = IterationScoring(args.matsim_output, args.vehicles_csv, args.output_dir, link_ids, link_lengths,
+                               count_population(args.homes) if args.homes else 0, args.workers, args.every,
+                               _time_window(args))
+    scoring.process()
+    scoring.save_scores()
+    print(scoring.get_dataframe().to_string(index=False))
+
+# --- Full flow ---
+
+def _cmd_compare(args):
+    from src.modules.compare_flow.compare_flow import run_compare_flow
+    run_compare_flow(args.config, args.output_dir, args.time_window)
+
+TIME_WINDOW_HELP = "Only score events in this period, e.g. 06:00-09:00"
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src", description="Bus network evaluation: processors, scores and BEFORE/AFTER comparison")
+    parser.add_argument("--profile", metavar="STAGES",
+                        help="Profile stages with cProfile/tracemalloc ('all' or comma separated stage names)")
+    parser.add_argument("--profile_dir", default="profiles", help="Directory for profiling outputs")
+    parser.add_argument("--metrics_json", help="Save per-stage metrics of this run to a JSON file")
+    sub = parser.add_subparsers(dest="command", metavar="<command>")
+    sub.required = True
+
+    def command(name, func, help_text):
+        p = sub.add_parser(name, help=help_text, description=help_text)
+        p.set_defaults(func=func)
+        return p
+
+    p = command("network", _cmd_network, "Parse network.xml into nodes/links CSV")
+    p.add_argument("--network", required=True, help="Path to network XML")
+    p.add_argument("--output_dir", required=True)
+
+    p = command("schedule", _cmd_schedule, "Parse transit schedule into stops/routes CSV")
+    p.add_argument("--schedule", required=True, help="Path to transit schedule XML")
+    p.add_argument("--output_dir", required=True)
+
+    p = command("vehicles", _cmd_vehicles, "Parse transit vehicles into vehicles/vehicle types CSV")
+    p.add_argument("--vehicles", required=True, help="Path to transit vehicles XML")
+    p.add_argument("--output_dir", required=True)
+
+    p = command("plans", _cmd_plans, "Parse population plans into homes cache, activities and legs")
+    p.add_argument("--plans", required=True, help="Path to plans XML (.xml or .xml.gz)")
+    p.add_argument("--output_dir", required=True)
+    p.add_argument("--workers", type=int, default=None, help="Parallel parser processes (default: CPU count)")
+
+    for name, func, help_text in (
+        ("ridership-prepare", _cmd_ridership_prepare, "Extract ridership trips and time series from events"),
+        ("otp-prepare", _cmd_otp_prepare, "Extract bus stop arrival/departure delays and time series from events"),
+        ("occupancy-prepare", _cmd_occupancy_prepare, "Bus loads and load factor distribution from events"),
+        ("stop-activity-prepare", _cmd_stop_activity_prepare, "Bus boardings and alightings per stop and hour from events"),
+    ):
+        p = command(name, func, help_text)
+        p.add_argument("--events", required=True, help="Path to events XML (.xml or .xml.gz)")
+        p.add_argument("--vehicles_csv", required=True, help="vehicles.csv from the 'vehicles' command")
+        p.add_argument("--output_dir", required=True)
+        p.add_argument("--time_window", help=TIME_WINDOW_HELP)
+        if name not in ("occupancy-prepare", "stop-activity-prepare"):
+            p.add_argument("--bin_size", type=float, default=3600.0, help="Time series bin size in seconds")
+        if name == "ridership-prepare":
+            p.add_argument("--distinct", choices=["exact", "hll"], default="exact",
+                           help="Distinct bus riders: exact, or HyperLogLog counters in total/per hour/per route")
+
+    p = command("trips-prepare", _cmd_trips_prepare,
+                "Ridership from MATSim's output_trips.csv / output_legs.csv (no events pass)")
+    p.add_argument("--trips", required=True, help="Path to output_trips.csv(.gz)")
+    p.add_argument("--legs", required=True, help="Path to output_legs.csv(.gz)")
+    p.add_argument("--vehicles_csv", required=True, help="vehicles.csv from the 'vehicles' command")
+    p.add_argument("--output_dir", required=True)
+    p.add_argument("--time_window", help=TIME_WINDOW_HELP)
+    p.add_argument("--bin_size", type=float, default=3600.0, help="Time series bin size in seconds")
+    p.add_argument("--distinct", choices=["exact", "hll"], default="exact",
+                   help="Distinct bus riders: exact, or HyperLogLog counters in total/per hour/per route")
+    p.add_argument("--parity_events", help="Events file of the same run: also compare with the events-based ridership")
+
+    p = command("transfers-prepare", _cmd_transfers_prepare,
+                "Transfers and vehicle type sequences of the PT trips in a ridership CSV")
+    p.add_argument("--ridership_csv", required=True)
+    p.add_argument("--output_dir", required=True)
+
+    p = command("distance-prepare", _cmd_distance_prepare, "Bus vehicle-km and passenger-km per route from events")
+    p.add_argument("--events", required=True)
+    p.add_argument("--network", required=True, help="Path to network XML (link lengths)")
+    p.add_argument("--vehicles_csv", required=True)
+    p.add_argument("--output_dir", required=True)
+    p.add_argument("--time_window", help=TIME_WINDOW_HELP)
+
+    p = command("service-hours", _cmd_service_hours_prepare,
+                "Scheduled revenue hours and vehicle-hours per route from the transit schedule")
+    p.add_argument("--schedule", required=True)
+    p.add_argument("--output_dir", required=True)
+    p.add_argument("--all_modes", action="store_true", help="Count all transit modes, not only bus")
+    p.add_argument("--time_window", help=TIME_WINDOW_HELP)
+
+    p = command("od-prepare", _cmd_od_prepare, "Zone-to-zone OD matrices from plan activities and ridership")
+    p.add_argument("--activities_csv", required=True)
+    p.add_argument("--legs_csv", help="plan_legs.csv of the plans command (trip departure times)")
+    p.add_argument("--ridership_csv", required=True)
+    p.add_argument("--network", required=True, help="Path to network XML (zone grid extent)")
+    p.add_argument("--rows", type=int, default=20)
+    p.add_argument("--cols", type=int, default=20)
+    p.add_argument("--output_dir", required=True)
+
+    p = command("score-ridership", _cmd_score_ridership, "Bus ridership score")
+    p.add_argument("--ridership_csv", required=True)
+    p.add_argument("--homes", help="Homes CSV or .npy cache (for total population)")
+    p.add_argument("--riders_sketch", help="distinct_riders.json from 'ridership-prepare --distinct hll' (approximate count)")
+
+    p = command("score-travel-time", _cmd_score_travel_time, "Total car/bus travel time score")
+    p.add_argument("--ridership_csv", required=True)
+    p.add_argument("--sketches", help="travel_time_sketches.json from 'ridership-prepare' (adds percentiles)")
+
+    p = command("score-otp", _cmd_score_otp, "On-time performance score")
+    p.add_argument("--otp_csv", required=True)
+    p.add_argument("--filter_column", default="arrDelay")
+    p.add_argument("--min_threshold", type=float, default=-180.0)
+    p.add_argument("--max_threshold", type=float, default=180.0)
+
+    p = command("score-productivity", _cmd_score_productivity, "Scheduled bus service hours per bus rider score")
+    p.add_argument("--schedule", required=True)
+    p.add_argument("--ridership_csv", required=True)
+    p.add_argument("--time_window", help=TIME_WINDOW_HELP + " (same as the ridership CSV)")
+    p.add_argument("--riders_sketch", help="distinct_riders.json from 'ridership-prepare --distinct hll' (approximate count)")
+
+    p = command("score-coverage", _cmd_score_coverage, "Population within radius of a stop")
+    p.add_argument("--schedule", required=True)
+    p.add_argument("--homes", required=True, help="Homes CSV or .npy cache from the 'plans' command")
+    p.add_argument("--radius", type=float, default=400.0)
+
+    p = command("score-accessibility", _cmd_score_accessibility,
+                "Population/activities reachable by transit within 30/45/60 minutes per zone (RAPTOR)")
+    p.add_argument("--schedule", required=True)
+    p.add_argument("--network", required=True, help="Path to network XML (zone grid bounds)")
+    p.add_argument("--homes", required=True, help="Homes CSV or .npy cache from the 'plans' command")
+    p.add_argument("--activities_csv", help="plan_activities.csv from the 'plans' command (adds reachable activities)")
+    p.add_argument("--rows", type=int, default=20)
+    p.add_argument("--cols", type=int, default=20)
+    p.add_argument("--departure_window", default="07:00-08:00", help="Departures scanned, e.g. 07:00-08:00")
+    p.add_argument("--interval", type=float, default=10.0, help="Minutes between departures")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    p.add_argument("--output_dir", required=True)
+
+    p = command("score-od", _cmd_score_od, "Compare BEFORE/AFTER OD matrices")
+    p.add_argument("--before_npz", required=True)
+    p.add_argument("--after_npz", required=True)
+    p.add_argument("--delta_csv")
+
+    p = command("live", _cmd_live, "Follow a growing events file and publish running scores")
+    p.add_argument("--events", required=True, help="Path to output_events.xml or .xml.gz (may not exist yet)")
+    p.add_argument("--vehicles_csv", required=True)
+    p.add_argument("--output_dir", required=True)
+    p.add_argument("--interval", type=float, default=15.0, help="Publish interval in simulated minutes")
+    p.add_argument("--homes", help="Homes CSV or .npy cache (for the ridership percentage)")
+    p.add_argument("--poll", type=float, default=1.0, help="Seconds between checks for new events")
+    p.add_argument("--idle_timeout", type=float, default=300.0, help="Stop after this many seconds without new events")
+    p.add_argument("--time_window", help=TIME_WINDOW_HELP)
+
+    p = command("iterations", _cmd_iterations, "Score every MATSim iteration (ITERS/it.N) in a process pool")
+    p.add_argument("--matsim_output", required=True, help="MATSim output directory containing ITERS/")
+    p.add_argument("--vehicles_csv", required=True)
+    p.add_argument("--output_dir", required=True)
+    p.add_argument("--network", help="Path to network XML (adds vehicle-km / passenger-km)")
+    p.add_argument("--homes", help="Homes CSV or .npy cache (for the ridership percentage)")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    p.add_argument("--every", type=int, default=1, help="Only score iterations divisible by this")
+    p.add_argument("--time_window", help=TIME_WINDOW_HELP)
+
+    p = command("compare", _cmd_compare, "Full BEFORE/AFTER processing, scoring and comparison")
+    p.add_argument("--config", help="Path to config.yaml (default: conf/config.yaml)")
+    p.add_argument("--output_dir", help="Output directory (default: <test.output>/compare_flow_full)")
+    p.add_argument("--time_window", help=TIME_WINDOW_HELP + " (default: config time_window)")
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.profile or args.metrics_json:
+        from src.utils.metrics_utils import METRICS
+        if args.profile:
+            stages = None if args.profile == "all" else [s.strip() for s in args.profile.split(",")]
+            METRICS.enable_profiling(stages, args.profile_dir)
+
+    args.func(args)
+
+    if args.metrics_json:
+        METRICS.save_json(args.metrics_json)
+
+if __name__ == "__main__":
+    sys.exit(main())
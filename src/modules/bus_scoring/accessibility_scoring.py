@@ -0,0 +1,253 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.modules.core_data_processor.raptor_router import (
+    Timetable, RaptorRouter, walk_time, DEFAULT_MAX_ROUNDS, DEFAULT_TRANSFER_RADIUS)
+from src.modules.core_data_processor.schedule_processor import TransitScheduleData
+from src.modules.core_data_processor.zone_processor import ZoneGrid
+from src.utils.file_utils import load_memmap_array, save_csv_from_columns
+from src.utils.metrics_utils import track_stage, record_stage
+
+# Cumulative opportunity thresholds (minutes)
+DEFAULT_THRESHOLDS = [30, 45, 60]
+# Walk from a zone centroid to the stops within this beeline distance (m)
+DEFAULT_ACCESS_RADIUS = 800.0
+# Travel times are the median over departures every interval seconds in the window
+DEFAULT_DEPARTURE_WINDOW = (7 * 3600.0, 8 * 3600.0)
+DEFAULT_DEPARTURE_INTERVAL = 600.0
+# Origin zones per routing task
+DEFAULT_BATCH_SIZE = 16
+
+def load_points(path: str) -> np.ndarray:
+    """(N, 2) x/y of the homes .npy cache or of a CSV with x and y columns."""
+    if path.endswith('.npy'):
+        return np.asarray(load_memmap_array(path), dtype=np.float64)
+    return pd.read_csv(path, usecols=['x', 'y'])[['x', 'y']].to_numpy(dtype=np.float64)
+
+def _zone_stop_pairs(centroids: np.ndarray, stop_xy: np.ndarray, radius: float):
+    """(zone, stop, walking time) of every stop within radius of a zone centroid, sorted by zone."""
+    from scipy.spatial import cKDTree
+    if len(stop_xy) == 0 or len(centroids) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    neighbours = cKDTree(stop_xy).query_ball_point(centroids, radius)
+    zones = np.repeat(np.arange(len(centroids)), [len(n) for n in neighbours])
+    stops = np.fromiter((s for n in neighbours for s in n), dtype=np.int64, count=len(zones))
+    distance = np.hypot(*(centroids[zones] - stop_xy[stops]).T)
+    return zones, stops, walk_time(distance)
+
+# Routing inputs shared by every task, set once per worker process by _init_worker
+_STATIC: Dict[str, Any] = {}
+
+def _init_worker(static: Dict[str, Any]):
+    _STATIC.update(static)
+    _STATIC["router"] = RaptorRouter(static["timetable"], static["max_rounds"], static["max_travel_time"])
+
+def _reachable_opportunities(origins: np.ndarray) -> np.ndarray:
+    """
+    (origins x thresholds x opportunity types) opportunities reachable from a batch of
+    origin zones (indices into the destination zones), median travel time over the departures.
+    """
+    s = _STATIC
+    departures = s["departure_times"]
+    n_origins, n_deps = len(origins), len(departures)
+    columns = n_origins * n_deps
+    # Column c = origin c // n_deps leaving at departure c % n_deps
+    column_dep = np.tile(departures, n_origins)
+
+    # Access walk: origin zone -> its nearby stops
+    initial = np.full((s["timetable"].num_stops, columns), np.inf)
+    starts, ends = s["access_offsets"][origins], s["access_offsets"][origins + 1]
+    counts = ends - starts
+    entries = np.concatenate([np.arange(a, b) for a, b in zip(starts.tolist(), ends.tolist())]) \
+        if counts.sum() else np.zeros(0, dtype=np.int64)
+    entry_origin = np.repeat(np.arange(n_origins), counts)
+    stops = np.repeat(s["access_stops"][entries], n_deps)
+    cols = (entry_origin[:, None] * n_deps + np.arange(n_deps)).ravel()
+    np.minimum.at(initial, (stops, cols), column_dep[cols] + np.repeat(s["access_walk"][entries], n_deps))
+
+    best = _STATIC["router"].earliest_arrivals(initial, column_dep)
+
+    # Egress walk: nearby stops -> destination zone (pairs sorted by zone)
+    n_dest = s["num_destinations"]
+    arrival = np.full((n_dest, columns), np.inf)
+    if len(s["egress_stops"]):
+        walked = best[s["egress_stops"]] + s["egress_walk"][:, None]
+        arrival[s["egress_zones"][s["egress_starts"]]] = np.minimum.reduceat(walked, s["egress_starts"], axis=0)
+    # Walking only (the origin zone itself at 0 s)
+    direct = np.isin(s["direct_from"], origins)
+    position = np.searchsorted(origins, s["direct_from"][direct])
+    cols = (position[:, None] * n_deps + np.arange(n_deps)).ravel()
+    dest = np.repeat(s["direct_to"][direct], n_deps)
+    np.minimum.at(arrival, (dest, cols), column_dep[cols] + np.repeat(s["direct_walk"][direct], n_deps))
+
+    travel = np.median((arrival - column_dep).reshape(n_dest, n_origins, n_deps), axis=2)
+    reachable = np.stack([travel <= t for t in s["threshold_seconds"]])  # thresholds x dest x origins
+    # opportunities: dest x types -> origins x thresholds x types
+    return np.einsum("tdo,dk->otk", reachable.astype(np.float64), s["opportunities"])
+
+class AccessibilityScoring:
+    """
+    Cumulative-opportunity transit accessibility per zone: the population and activities
+    reachable from each populated zone within 30/45/60 minutes by walking and public
+    transport. Journeys walk from the zone centroid to nearby stops, ride with up to
+    max_rounds vehicles (RAPTOR over the schedule's routes and departures, walking
+    transfers between nearby stops) and walk to the destination zone centroid; the travel
+    time of a zone pair is the median over departures in the departure window.
+
+    Origin zones are routed in batches in a process pool; the timetable is sent to each
+    worker once.
+    """
+    def __init__(self, schedule_path: str, grid: ZoneGrid, homes_path: str, activities_path: Optional[str] = None,
+                 thresholds: Sequence[int] = DEFAULT_THRESHOLDS, access_radius: float = DEFAULT_ACCESS_RADIUS,
+                 departure_window: Tuple[float, float] = DEFAULT_DEPARTURE_WINDOW,
+                 departure_interval: float = DEFAULT_DEPARTURE_INTERVAL, max_rounds: int = DEFAULT_MAX_ROUNDS,
+                 transfer_radius: float = DEFAULT_TRANSFER_RADIUS, num_workers: Optional[int] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.schedule_path = schedule_path
+        self.grid = grid
+        self.homes_path = homes_path
+        self.activities_path = activities_path
+        self.thresholds = list(thresholds)
+        self.access_radius = access_radius
+        self.departure_times = np.arange(departure_window[0], departure_window[1], departure_interval)
+        self.max_rounds = max_rounds
+        self.transfer_radius = transfer_radius
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+        self.population = np.zeros(grid.num_zones)
+        self.activities = np.zeros(grid.num_zones)
+        # (zones x thresholds) reachable opportunities, 0 for zones without population
+        self.reachable_population = np.zeros((grid.num_zones, len(self.thresholds)))
+        self.reachable_activities = np.zeros((grid.num_zones, len(self.thresholds)))
+
+    def _load_opportunities(self):
+        """Population (homes) and activities (non-home plan activities) per zone."""
+        homes = load_points(self.homes_path)
+        zones = self.grid.zone_index(homes[:, 0], homes[:, 1])
+        self.population = np.bincount(zones[zones >= 0], minlength=self.grid.num_zones).astype(np.float64)
+        if self.activities_path and os.path.exists(self.activities_path):
+            acts = pd.read_csv(self.activities_path, usecols=['type', 'x', 'y'])
+            acts = acts[acts['type'] != 'home']
+            zones = self.grid.zone_index(acts['x'].to_numpy(), acts['y'].to_numpy())
+            self.activities = np.bincount(zones[zones >= 0], minlength=self.grid.num_zones).astype(np.float64)
+        return len(homes)
+
+    @track_stage("accessibility.process")
+    def process(self):
+        print(f"Computing transit accessibility from: {self.schedule_path}")
+        schedule = TransitScheduleData(self.schedule_path)
+        schedule.process()
+        timetable = Timetable.from_schedule(schedule, transfer_radius=self.transfer_radius)
+        records_in = self._load_opportunities()
+
+        # Destinations: zones with opportunities; origins: populated zones (indices into destinations)
+        destinations = np.flatnonzero((self.population > 0) | (self.activities > 0))
+        origins = np.flatnonzero(self.population[destinations] > 0)
+        centroids = self.grid.zone_centroids()[destinations]
+
+        access_zones, access_stops, access_walk = _zone_stop_pairs(centroids, timetable.stop_xy, self.access_radius)
+        access_offsets = np.zeros(len(destinations) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(access_zones, minlength=len(destinations)), out=access_offsets[1:])
+        egress_starts = np.concatenate(([0], np.flatnonzero(np.diff(access_zones)) + 1)) if len(access_zones) \
+            else np.zeros(0, dtype=np.int64)
+
+        from scipy.spatial import cKDTree
+        direct = cKDTree(centroids).query_pairs(self.access_radius, output_type="ndarray")
+        own = np.arange(len(destinations))
+        direct_from = np.concatenate([own, direct[:, 0], direct[:, 1]]).astype(np.int64)
+        direct_to = np.concatenate([own, direct[:, 1], direct[:, 0]]).astype(np.int64)
+        direct_walk = walk_time(np.hypot(*(centroids[direct_from] - centroids[direct_to]).T))
+
+        static = {
+            "timetable": timetable,
+            "max_rounds": self.max_rounds,
+            "max_travel_time": max(self.thresholds) * 60.0,
+            "departure_times": self.departure_times,
+            "threshold_seconds": [t * 60.0 for t in self.thresholds],
+            "num_destinations": len(destinations),
+            "access_offsets": access_offsets, "access_stops": access_stops, "access_walk": access_walk,
+            "egress_zones": access_zones, "egress_stops": access_stops, "egress_walk": access_walk,
+            "egress_starts": egress_starts,
+            "direct_from": direct_from, "direct_to": direct_to, "direct_walk": direct_walk,
+            "opportunities": np.column_stack([self.population[destinations], self.activities[destinations]])
+        }
+        batches = [origins[i:i + self.batch_size] for i in range(0, len(origins), self.batch_size)]
+        workers = min(self.num_workers, len(batches))
+        if workers <= 1:
+            _init_worker(static)
+            results = [_reachable_opportunities(batch) for batch in batches]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(static,)) as executor:
+                results = list(executor.map(_reachable_opportunities, batches))
+
+        if results:
+            reached = np.concatenate(results)
+            zones = destinations[origins]
+            self.reachable_population[zones] = reached[:, :, 0]
+            self.reachable_activities[zones] = reached[:, :, 1]
+        record_stage(records_in=records_in, records_out=len(origins), workers=max(workers, 1))
+        print(f"Routed {len(origins)} origin zones x {len(self.departure_times)} departures "
+              f"to {len(destinations)} destination zones.")
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """Opportunities and reachable opportunities per threshold of every populated zone."""
+        zones = np.flatnonzero(self.population > 0)
+        data = {"zoneId": zones, "population": self.population[zones], "activities": self.activities[zones]}
+        for i, t in enumerate(self.thresholds):
+            data[f"reachable_population_{t}"] = self.reachable_population[zones, i]
+        for i, t in enumerate(self.thresholds):
+            data[f"reachable_activities_{t}"] = self.reachable_activities[zones, i]
+        return pd.DataFrame(data)
+
+    def summary(self) -> Dict[str, float]:
+        """Population weighted mean share (%) of all population / activities reachable per threshold."""
+        weights = self.population
+        total_weight = weights.sum()
+        result = {}
+        for name, reached, total in (("population", self.reachable_population, self.population.sum()),
+                                     ("activities", self.reachable_activities, self.activities.sum())):
+            for i, t in enumerate(self.thresholds):
+                mean = float(weights @ reached[:, i] / total_weight) if total_weight > 0 else 0.0
+                result[f"{name}_{t}_percentage"] = float(mean / total * 100) if total > 0 else 0.0
+        return result
+
+    def save_zone_accessibility_to_csv(self, output_path: str):
+        print(f"Saving zone accessibility to: {output_path}")
+        df = self.get_dataframe()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
+
+def main():
+    import argparse
+    from src.modules.core_data_processor.network_processor import NetworkData
+    from src.modules.prepare_bus_score_data.events_stream import parse_time_window
+    parser = argparse.ArgumentParser(description="Transit accessibility (reachable population/activities) per zone")
+    parser.add_argument("--schedule", required=True, help="Path to transit schedule XML")
+    parser.add_argument("--network", required=True, help="Path to network XML (zone grid bounds)")
+    parser.add_argument("--homes", required=True, help="Homes CSV or .npy cache from the 'plans' command")
+    parser.add_argument("--activities_csv", help="plan_activities.csv (adds reachable activities)")
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--cols", type=int, default=20)
+    parser.add_argument("--departure_window", default="07:00-08:00", help="Departures scanned, e.g. 07:00-08:00")
+    parser.add_argument("--interval", type=float, default=10.0, help="Minutes between departures")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    network = NetworkData(args.network)
+    network.process()
+    grid = ZoneGrid.from_points([n.x for n in network.nodes_list], [n.y for n in network.nodes_list],
+                                rows=args.rows, cols=args.cols)
+    scoring = AccessibilityScoring(args.schedule, grid, args.homes, args.activities_csv,
+                                   departure_window=parse_time_window(args.departure_window),
+                                   departure_interval=args.interval * 60, num_workers=args.workers)
+    scoring.process()
+    os.makedirs(args.output_dir, exist_ok=True)
+    scoring.save_zone_accessibility_to_csv(os.path.join(args.output_dir, "zone_accessibility.csv"))
+    print(scoring.summary())
+
+if __name__ == "__main__":
+    main()
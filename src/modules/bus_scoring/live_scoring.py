@@ -0,0 +1,154 @@
+import os
+import json
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.modules.prepare_bus_score_data.events_stream import EventsStream, parse_time_window
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.on_time_performance_prepare_processor import OnTimePerformancePrepareData
+from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+from src.modules.bus_scoring.ridership_scoring import calculate_bus_ridership, count_population
+from src.modules.bus_scoring.travel_time_scoring import calculate_travel_time_scores
+from src.modules.bus_scoring.on_time_performance_scoring import calculate_otp_score
+from src.utils.metrics_utils import track_stage, record_stage
+
+# Running scores published every 15 simulated minutes by default
+DEFAULT_PUBLISH_INTERVAL = 900.0
+LIVE_SCORES_JSON = "live_scores.json"
+LIVE_HISTORY_JSONL = "live_scores_history.jsonl"
+
+class LiveScoring:
+    """
+    Scores a MATSim run while it is still writing output_events.xml(.gz): the file is
+    followed (EventsStream follow mode) and fed to the ridership, OTP and occupancy
+    consumers as events appear. Every publish_interval simulated seconds the running
+    scores are written to live_scores.json (replaced atomically) and appended to
+    live_scores_history.jsonl. When the simulation closes the file, the prepared CSVs
+    are saved and the final scores computed, so they are ready seconds after MATSim ends.
+    """
+    def __init__(self, events_path: str, vehicles_csv_path: str, output_dir: str,
+                 publish_interval: float = DEFAULT_PUBLISH_INTERVAL, homes_path: Optional[str] = None,
+                 poll_interval: float = 1.0, idle_timeout: float = 300.0,
+                 time_window: Optional[Tuple[float, float]] = None):
+        self.events_path = events_path
+        self.output_dir = output_dir
+        self.publish_interval = publish_interval
+        self.homes_path = homes_path
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.time_window = time_window
+        self.total_population = count_population(homes_path) if homes_path and os.path.exists(homes_path) else 0
+        self.history: List[Dict[str, Any]] = []
+
+        self.ridership = RidershipPrepareData(events_path, vehicles_csv_path)
+        self.otp = OnTimePerformancePrepareData(events_path, vehicles_csv_path, min_threshold=-180, max_threshold=180)
+        self.occupancy = BusOccupancyPrepareData(events_path, vehicles_csv_path,
+                                                 vehicle_index=self.ridership.vehicle_index)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def running_scores(self, sim_time: float) -> Dict[str, Any]:
+        """Scores of the events read so far (trips and stop calls completed before sim_time)."""
+        ridership = self.ridership.summary()
+        otp = self.otp.summary()
+        crowding = self.occupancy.summary()
+        scores = {
+            "sim_time": sim_time,
+            "ridership_unique_persons": ridership["unique_persons_bus"],
+            "bus_trips": ridership["bus_trips"],
+            "car_travel_time_total": ridership["total_car_travel_time"],
+            "bus_travel_time_total": ridership["total_bus_travel_time"],
+            "otp_percentage": otp["otp_percentage"],
+            "otp_on_time_count": otp["on_time_records"],
+            "bus_mean_load_factor": crowding["mean_load_factor"],
+            "bus_over_capacity_percentage": crowding["over_capacity_percentage"]
+        }
+        if self.total_population > 0:
+            scores["ridership_percentage"] = ridership["unique_persons_bus"] / self.total_population * 100
+        return scores
+
+    def _write_scores(self, scores: Dict[str, Any]):
+        """Replaces live_scores.json atomically (readers never see a partial file) and appends the history."""
+        live_path = os.path.join(self.output_dir, LIVE_SCORES_JSON)
+        tmp_path = live_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(scores, f, indent=4)
+        os.replace(tmp_path, live_path)
+        with open(os.path.join(self.output_dir, LIVE_HISTORY_JSONL), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(scores) + "\n")
+
+    def _publish(self, sim_time: float):
+        scores = self.running_scores(sim_time)
+        self.history.append(scores)
+        self._write_scores(scores)
+        print(f"[Live {sim_time / 3600:05.2f}h] bus users: {scores['ridership_unique_persons']}, "
+              f"bus trips: {scores['bus_trips']}, OTP: {scores['otp_percentage']:.2f}%, "
+              f"mean load factor: {scores['bus_mean_load_factor']:.3f}")
+
+    @track_stage("live_scoring.run")
+    def run(self) -> Dict[str, Any]:
+        """Follows the events file until it is complete; returns the final scores."""
+        history_path = os.path.join(self.output_dir, LIVE_HISTORY_JSONL)
+        if os.path.exists(history_path):
+            os.remove(history_path)
+
+        stream = EventsStream(self.events_path, [self.ridership, self.otp, self.occupancy],
+                              time_window=self.time_window, follow=True,
+                              poll_interval=self.poll_interval, idle_timeout=self.idle_timeout,
+                              progress_interval=self.publish_interval, on_progress=self._publish)
+        event_count = stream.run()
+        record_stage(records_in=event_count, bytes_read=stream.bytes_read)
+        return self.finalize()
+
+    def finalize(self) -> Dict[str, Any]:
+        """Saves the prepared CSVs and computes the final scores with the regular scoring functions."""
+        ridership_csv = os.path.join(self.output_dir, "ridership_processed.csv")
+        otp_csv = os.path.join(self.output_dir, "otp_processed.csv")
+        self.ridership.save_ridership_to_csv(ridership_csv)
+        self.ridership.save_time_series_to_csv(os.path.join(self.output_dir, "ridership_time_series.csv"))
+        sketches_json = os.path.join(self.output_dir, "travel_time_sketches.json")
+        self.ridership.save_travel_time_sketches_to_json(sketches_json)
+        self.otp.save_otp_data_to_csv(otp_csv)
+        self.otp.save_time_series_to_csv(os.path.join(self.output_dir, "otp_time_series.csv"))
+        self.occupancy.save_loads_to_csv(os.path.join(self.output_dir, "bus_loads.csv"))
+
+        r_res = calculate_bus_ridership(ridership_csv, self.homes_path)
+        tt_res = calculate_travel_time_scores(ridership_csv, sketches_json)
+        otp_res = calculate_otp_score(otp_csv, min_threshold=-180, max_threshold=180)
+        crowd_res = self.occupancy.summary()
+        scores = {
+            "final": True,
+            "ridership_unique_persons": r_res["unique_persons_bus"],
+            "ridership_percentage": r_res["ridership_percentage"],
+            "total_population": r_res["total_population"],
+            "car_travel_time_total": tt_res["total_car_travel_time"],
+            "bus_travel_time_total": tt_res["total_bus_travel_time"],
+            "bus_travel_time_p50": tt_res.get("bus_travel_time_p50"),
+            "bus_travel_time_p90": tt_res.get("bus_travel_time_p90"),
+            "otp_percentage": otp_res["otp_percentage"],
+            "otp_on_time_count": otp_res["on_time_records"],
+            "bus_mean_load_factor": crowd_res["mean_load_factor"],
+            "bus_p95_load_factor": crowd_res["p95_load_factor"],
+            "bus_over_capacity_percentage": crowd_res["over_capacity_percentage"]
+        }
+        self._write_scores(scores)
+        print(f"Final scores saved to: {os.path.join(self.output_dir, LIVE_SCORES_JSON)}")
+        return scores
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a MATSim run while its events file is being written")
+    parser.add_argument("--events", required=True, help="Path to output_events.xml or .xml.gz (may not exist yet)")
+    parser.add_argument("--vehicles_csv", required=True, help="vehicles.csv of the scenario")
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--interval", type=float, default=15.0, help="Publish interval in simulated minutes")
+    parser.add_argument("--homes", help="Homes CSV or .npy cache (for the ridership percentage)")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds between checks for new events")
+    parser.add_argument("--idle_timeout", type=float, default=300.0, help="Stop after this many seconds without new events")
+    parser.add_argument("--time_window", help="Only score events in this period, e.g. 06:00-09:00")
+    args = parser.parse_args()
+
+    live = LiveScoring(args.events, args.vehicles_csv, args.output_dir, args.interval * 60, args.homes,
+                       args.poll, args.idle_timeout, parse_time_window(args.time_window))
+    live.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import numpy as np
+import argparse
+import os
+from typing import Dict, Optional
+
+from src.modules.prepare_bus_score_data.od_matrix_prepare_processor import load_od_matrices, USE_SCIPY
+from src.utils.file_utils import save_csv_from_columns
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+
+def _total(matrix) -> float:
+    return float(matrix.sum())
+
+def _pairs(matrix):
+    """Returns (origin, destination, value) of the non-zero entries of a matrix."""
+    if USE_SCIPY:
+        coo = matrix.tocoo()
+        coo.eliminate_zeros()
+        return coo.row.astype(np.int64), coo.col.astype(np.int64), coo.data
+    origins, destinations = np.nonzero(matrix)
+    return origins, destinations, matrix[origins, destinations]
+
+@track_stage("score.od_changes")
+def calculate_od_changes(before_npz_path: str, after_npz_path: str,
+                         delta_csv_path: Optional[str] = None, top_n: int = 10) -> Dict[str, any]:
+    """
+    Compares BEFORE/AFTER OD matrices (see ODMatrixPrepareData) with sparse matrix arithmetic.
+
+    Returns:
+        Dict: totals and PT share per scenario, the number of OD pairs whose PT demand
+        changed and the top_n pairs with the largest PT trip gains and losses.
+    """
+    print(f"[OD Scoring] Comparing {before_npz_path} -> {after_npz_path}")
+    result = {
+        "total_trips_before": 0.0, "total_trips_after": 0.0,
+        "pt_share_before": 0.0, "pt_share_after": 0.0,
+        "changed_pairs": 0, "top_pt_gains": [], "top_pt_losses": []
+    }
+    for path in (before_npz_path, after_npz_path):
+        if not os.path.exists(path):
+            print(f"Error: File not found at {path}")
+            return result
+
+    try:
+        before = load_od_matrices(before_npz_path)
+        after = load_od_matrices(after_npz_path)
+
+        for label, mats in (("before", before), ("after", after)):
+            trips = _total(mats["trips"])
+            result[f"total_trips_{label}"] = trips
+            result[f"pt_share_{label}"] = (_total(mats["pt_trips"]) / trips * 100) if trips > 0 else 0.0
+
+        trips_delta = after["trips"] - before["trips"]
+        pt_delta = after["pt_trips"] - before["pt_trips"]
+        tt_delta = after["pt_travel_time_sum"] - before["pt_travel_time_sum"]
+
+        origins, destinations, values = _pairs(pt_delta)
+        result["changed_pairs"] = int(len(values))
+        record_stage(records_out=result["changed_pairs"],
+                     bytes_read=(file_size(before_npz_path) or 0) + (file_size(after_npz_path) or 0))
+
+        order = np.argsort(values, kind="stable")
+        def to_records(indices):
+            return [
+                {"origin_zone": int(origins[i]), "destination_zone": int(destinations[i]), "pt_trips_delta": float(values[i])}
+                for i in indices
+            ]
+        result["top_pt_gains"] = to_records([i for i in order[::-1][:top_n] if values[i] > 0])
+        result["top_pt_losses"] = to_records([i for i in order[:top_n] if values[i] < 0])
+
+        if delta_csv_path:
+            # Union of pairs touched by any delta
+            union = abs(trips_delta) + abs(pt_delta) + abs(tt_delta)
+            u_origins, u_destinations, _ = _pairs(union)
+            def at(matrix):
+                return np.asarray(matrix[u_origins, u_destinations]).ravel().tolist()
+            print(f"Saving OD deltas to: {delta_csv_path}")
+            save_csv_from_columns({
+                "origin_zone": u_origins.tolist(),
+                "destination_zone": u_destinations.tolist(),
+                "trips_delta": at(trips_delta),
+                "pt_trips_delta": at(pt_delta),
+                "pt_travel_time_sum_delta": at(tt_delta)
+            }, delta_csv_path)
+
+        print(f"[OD Scoring] PT share: {result['pt_share_before']:.2f}% -> {result['pt_share_after']:.2f}%, "
+              f"{result['changed_pairs']} OD pairs changed PT demand")
+        return result
+
+    except Exception as e:
+        print(f"Error calculating OD changes: {e}")
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BEFORE/AFTER OD matrices")
+    parser.add_argument("--before_npz", required=True, help="Path to the BEFORE OD matrices (.npz)")
+    parser.add_argument("--after_npz", required=True, help="Path to the AFTER OD matrices (.npz)")
+    parser.add_argument("--delta_csv", help="Optional path to save per OD pair deltas")
+    args = parser.parse_args()
+
+    res = calculate_od_changes(args.before_npz, args.after_npz, args.delta_csv)
+    print(f"RESULT={res}")
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ import os
 import sys
 from typing import Dict, Optional, Tuple
 
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+
+@track_stage("score.otp")
 def calculate_otp_score(
     otp_csv_path: str, 
     filter_column: str = "arrDelay", 
@@ -33,6 +36,7 @@ def calculate_otp_score(
         
     try:
         df = pd.read_csv(otp_csv_path)
+        record_stage(records_in=len(df), bytes_read=file_size(otp_csv_path))
         
         if filter_column not in df.columns:
             print(f"Error: Column '{filter_column}' not found in {otp_csv_path}")
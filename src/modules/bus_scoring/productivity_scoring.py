@@ -0,0 +1,52 @@
+import math
+import argparse
+from typing import Dict
+
+from src.modules.bus_scoring.ridership_scoring import calculate_bus_ridership
+from src.modules.prepare_bus_score_data.service_hours_prepare_processor import ServiceHoursPrepareData
+from src.modules.prepare_bus_score_data.events_stream import parse_time_window
+from src.utils.metrics_utils import track_stage
+
+# Service hours per rider when nobody rides (score ~ 0), as in the Kotlin scoring
+NO_RIDERS_HOURS_PER_RIDER = 1e9
+
+@track_stage("score.productivity")
+def calculate_productivity_score(service_hours: float, unique_riders: int) -> Dict[str, float]:
+    """
+    Productivity component of the Kotlin system score: exp(-service hours / distinct bus
+    riders). Fewer scheduled hours per rider give a score closer to 1.
+
+    Returns:
+        Dict: {
+            "service_hours": float,
+            "unique_riders": int,
+            "service_hours_per_rider": float,
+            "productivity": float
+        }
+    """
+    per_rider = service_hours / unique_riders if unique_riders > 0 else NO_RIDERS_HOURS_PER_RIDER
+    productivity = math.exp(-per_rider)
+    print(f"[Productivity Scoring] {service_hours:.1f} service hours / {unique_riders} riders "
+          f"= {per_rider:.4f} h per rider, score {productivity:.4f}")
+    return {
+        "service_hours": service_hours,
+        "unique_riders": unique_riders,
+        "service_hours_per_rider": per_rider,
+        "productivity": productivity
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculate the Productivity Score (service hours per bus rider)")
+    parser.add_argument("--schedule", required=True, help="Path to transit schedule XML")
+    parser.add_argument("--ridership_csv", required=True, help="Path to the prepared ridership CSV file")
+    parser.add_argument("--time_window", help="Period of the ridership CSV, e.g. 06:00-09:00 (default: whole day)")
+    args = parser.parse_args()
+
+    service = ServiceHoursPrepareData(args.schedule, time_window=parse_time_window(args.time_window))
+    service.process()
+    riders = calculate_bus_ridership(args.ridership_csv)["unique_persons_bus"]
+    res = calculate_productivity_score(service.summary()["revenue_hours"], riders)
+    print(f"RESULT={res}")
+
+if __name__ == "__main__":
+    main()
@@ -4,37 +4,78 @@ import sys
 import os
 from typing import Dict
 
+from src.utils.file_utils import read_memmap_meta
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+from src.utils.sketch_utils import load_sketches_json
 
-def calculate_bus_ridership(ridership_csv_path: str, homes_csv_path: str = None) -> Dict[str, any]:
+
+def count_population(homes_csv_path: str) -> int:
+    """
+    Number of persons in the homes file: the row count from the metadata of the .npy
+    homes cache, else the CSV line count minus the header.
+    """
+    if homes_csv_path.endswith('.npy'):
+        # Memory-mapped homes cache: the row count is stored in its metadata
+        return int(read_memmap_meta(homes_csv_path)["count"])
+    # Count lines - 1 (header) to avoid loading everything if only count needed
+    try:
+        with open(homes_csv_path, 'r', encoding='utf-8') as f:
+            row_count = sum(1 for row in f) - 1 # subtracting header
+        return max(0, row_count)
+    except:
+        # Fallback to pandas if simple count fails
+        return len(pd.read_csv(homes_csv_path))
+
+@track_stage("score.ridership")
+def calculate_bus_ridership(ridership_csv_path: str, homes_csv_path: str = None,
+                            riders_sketch_path: str = None) -> Dict[str, any]:
     """
     Calculates the number of unique persons who used a bus based on prepare ridership data.
     If homes_csv_path is provided, calculates percentage of total population using bus.
+    homes_csv_path may be the .npy homes cache, whose row count is read from its metadata.
+    If riders_sketch_path (distinct_riders.json of the "hll" ridership mode) is provided, the
+    count is the HyperLogLog estimate instead of an exact count over the trip table.
     
     Returns:
         Dict: {
             "unique_persons_bus": int,
             "total_population": int,
-            "ridership_percentage": float
+            "ridership_percentage": float,
+            "unique_persons_bus_error": float (relative standard error, HyperLogLog only)
         }
     """
-    print(f"[Ridership Scoring] Loading data from: {ridership_csv_path}")
     result = {"unique_persons_bus": 0, "total_population": 0, "ridership_percentage": 0.0}
     
-    if not os.path.exists(ridership_csv_path):
-        print(f"Error: File not found at {ridership_csv_path}")
-        return result
-        
     try:
         # 1. Count Bus Users
-        df = pd.read_csv(ridership_csv_path)
-        
-        if 'vehTypeList' not in df.columns or 'personId' not in df.columns:
-            print(f"Error: Missing required columns 'personId' or 'vehTypeList'")
-            return result
-            
-        df['vehTypeList'] = df['vehTypeList'].fillna('').astype(str)
-        bus_trips = df[df['vehTypeList'].str.contains("bus", case=False)]
-        unique_persons = bus_trips['personId'].nunique()
+        if riders_sketch_path:
+            print(f"[Ridership Scoring] Loading distinct rider counters from: {riders_sketch_path}")
+            if not os.path.exists(riders_sketch_path):
+                print(f"Error: File not found at {riders_sketch_path}")
+                return result
+            counter = load_sketches_json(riders_sketch_path)["total"]
+            record_stage(bytes_read=file_size(riders_sketch_path))
+            unique_persons = int(round(counter.count()))
+            result["unique_persons_bus_error"] = counter.relative_error
+        else:
+            print(f"[Ridership Scoring] Loading data from: {ridership_csv_path}")
+            if not os.path.exists(ridership_csv_path):
+                print(f"Error: File not found at {ridership_csv_path}")
+                return result
+            df = pd.read_csv(ridership_csv_path)
+            record_stage(records_in=len(df), bytes_read=file_size(ridership_csv_path))
+
+            if 'vehTypeList' not in df.columns or 'personId' not in df.columns:
+                print(f"Error: Missing required columns 'personId' or 'vehTypeList'")
+                return result
+
+            if 'usesBus' in df.columns:
+                # Bus flag precomputed from the vehicle types while preparing the data
+                bus_trips = df[df['usesBus'].fillna(False).astype(bool)]
+            else:
+                df['vehTypeList'] = df['vehTypeList'].fillna('').astype(str)
+                bus_trips = df[df['vehTypeList'].str.contains("bus", case=False)]
+            unique_persons = bus_trips['personId'].nunique()
         result["unique_persons_bus"] = unique_persons
         
         print(f"[Ridership Scoring] Unique persons using bus: {unique_persons}")
@@ -42,17 +83,7 @@ def calculate_bus_ridership(ridership_csv_path: str, homes_csv_path: str = None)
         # 2. Total Population (if provided)
         if homes_csv_path:
             if os.path.exists(homes_csv_path):
-                # Count lines - 1 (header) to avoid loading everything if only count needed
-                # However, PlanInputProcessor output format is CSV.
-                try:
-                    with open(homes_csv_path, 'r', encoding='utf-8') as f:
-                        row_count = sum(1 for row in f) - 1 # subtracting header
-                    result["total_population"] = max(0, row_count)
-                except:
-                    # Fallback to pandas if simple count fails
-                     pop_df = pd.read_csv(homes_csv_path)
-                     result["total_population"] = len(pop_df)
-                     
+                result["total_population"] = count_population(homes_csv_path)
                 if result["total_population"] > 0:
                     result["ridership_percentage"] = (unique_persons / result["total_population"]) * 100
                     print(f"[Ridership Scoring] Total Pop: {result['total_population']}, Usage: {result['ridership_percentage']:.2f}%")
@@ -68,10 +99,11 @@ def calculate_bus_ridership(ridership_csv_path: str, homes_csv_path: str = None)
 def main():
     parser = argparse.ArgumentParser(description="Calculate Bus Ridership Score")
     parser.add_argument("--ridership_csv", required=True, help="Path to the prepared ridership CSV file")
-    parser.add_argument("--homes_csv", help="Path to pre-processed homes CSV (for total population)")
+    parser.add_argument("--homes_csv", help="Path to pre-processed homes CSV or .npy cache (for total population)")
+    parser.add_argument("--riders_sketch", help="distinct_riders.json of the HyperLogLog ridership mode (approximate count)")
     args = parser.parse_args()
     
-    res = calculate_bus_ridership(args.ridership_csv, args.homes_csv)
+    res = calculate_bus_ridership(args.ridership_csv, args.homes_csv, args.riders_sketch)
     print(f"RESULT={res}")
 
 if __name__ == "__main__":
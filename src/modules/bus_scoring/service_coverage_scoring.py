@@ -1,27 +1,78 @@
 
 import xml.etree.ElementTree as ET
+import numpy as np
 import pandas as pd
 import math
 import os
 import argparse
-from typing import Set, List, Dict, Tuple
+from typing import Set, List, Dict, Tuple, Optional
 
 from src.modules.core_data_processor.plan_input_processor import PlanInputData
+from src.utils.file_utils import load_memmap_array
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+
+# Homes per chunk of the dedup and the KD-tree queries (bounds the temporary arrays)
+HOME_CHUNK_SIZE = 1 << 20
+
+def weighted_unique_points(points: np.ndarray, chunk_size: int = HOME_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distinct (x, y) rows of points (in order of first appearance) and how often each occurs.
+    Rows are hashed as complex numbers (pd.factorize) chunk by chunk; the distinct values are
+    merged whenever the pending ones outgrow the merged set, so memory stays at about one
+    chunk plus the distinct points, and a memory-mapped array is read in place.
+    """
+    unique = np.zeros(0, dtype=np.complex128)
+    weights = np.zeros(0, dtype=np.int64)
+    pending = []
+
+    def merge():
+        values = np.concatenate([unique] + [v for v, _ in pending])
+        counts = np.concatenate([weights] + [c for _, c in pending])
+        codes, merged = pd.factorize(values)
+        return merged, np.bincount(codes, weights=counts, minlength=len(merged)).astype(np.int64)
+
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+        codes, values = pd.factorize(chunk[:, 0] + 1j * chunk[:, 1])
+        pending.append((values, np.bincount(codes, minlength=len(values))))
+        if sum(len(v) for v, _ in pending) >= max(len(unique), chunk_size):
+            unique, weights = merge()
+            pending = []
+    if pending:
+        unique, weights = merge()
+    return np.column_stack([unique.real, unique.imag]), weights
 
 class ServiceCoveragePrepareData:
     """
     Extracts bus stop locations from schedule and reads pre-processed population home locations.
+    Homes can be the memory-mapped .npy cache (PlanInputData.save_homes_to_npy) or a CSV.
+
+    Homes sharing coordinates (building or zone centroids) are collapsed to distinct points
+    weighted by their number of persons; these are queried in chunks on all cores and the
+    covered population is the sum of the covered weights.
+
+    calculate_coverage keeps the nearest stop distance per distinct home point (inf beyond
+    the radius), so a second scenario with the same homes can be scored incrementally from
+    it: only the points within the radius of an added or removed stop are queried again.
     """
     def __init__(self, schedule_path: str, homes_csv_path: str):
         self.schedule_path = schedule_path
         self.homes_csv_path = homes_csv_path
         self.stop_locations: List[Tuple[float, float]] = [] # [(x, y)]
-        self.home_locations: List[Tuple[float, float]] = [] # [(x, y)]
+        self.home_locations: np.ndarray = np.empty((0, 2), dtype=np.float64) # (N, 2) of (x, y)
+        self.home_points: Optional[np.ndarray] = None # (U, 2) distinct home coordinates
+        self.home_weights: Optional[np.ndarray] = None # homes per distinct point
+        self.home_distances: Optional[np.ndarray] = None # nearest stop per point, inf beyond coverage_radius
+        self.coverage_radius: Optional[float] = None
+        self._home_cells = None
 
+    @track_stage("coverage.process")
     def process(self):
         print("--- Processing Service Coverage Data ---")
         self._extract_active_stops()
         self._load_population_homes()
+        record_stage(records_out=len(self.stop_locations) + len(self.home_locations),
+                     bytes_read=(file_size(self.schedule_path) or 0) + (file_size(self.homes_csv_path) or 0))
 
     def _extract_active_stops(self):
         """
@@ -82,18 +133,23 @@ class ServiceCoveragePrepareData:
 
     def _load_population_homes(self):
         """
-        Loads home coordinates from the pre-processed CSV file (PlanInputProcessor).
+        Loads home coordinates pre-processed by PlanInputProcessor.
+        The .npy cache is memory-mapped and queried in place (zero copies).
         """
-        print(f"Reading Home Locations CSV: {self.homes_csv_path}")
+        print(f"Reading Home Locations: {self.homes_csv_path}")
         if not os.path.exists(self.homes_csv_path):
-             print(f"Error: Homes CSV file not found at {self.homes_csv_path}")
+             print(f"Error: Homes file not found at {self.homes_csv_path}")
              return
 
         try:
+            if self.homes_csv_path.endswith('.npy'):
+                self.home_locations = load_memmap_array(self.homes_csv_path)
+                print(f"  Mapped {len(self.home_locations)} home locations.")
+                return
+
             df = pd.read_csv(self.homes_csv_path)
             if 'x' in df.columns and 'y' in df.columns:
-                # Convert DataFrame to list of tuples
-                self.home_locations = list(zip(df['x'], df['y']))
+                self.home_locations = df[['x', 'y']].to_numpy(dtype=np.float64)
                 print(f"  Loaded {len(self.home_locations)} home locations.")
             else:
                 print(f"Error: Missing 'x' or 'y' columns in {self.homes_csv_path}")
@@ -101,26 +157,99 @@ class ServiceCoveragePrepareData:
         except Exception as e:
             print(f"Error loading homes CSV: {e}")
 
-    def calculate_coverage(self, radius: float = 400.0) -> Dict[str, any]:
+    def _unique_homes(self):
+        if self.home_points is None:
+            self.home_points, self.home_weights = weighted_unique_points(self.home_locations)
+            print(f"  {len(self.home_locations)} homes at {len(self.home_points)} distinct locations.")
+
+    @staticmethod
+    def _query_distances(tree, points: np.ndarray, radius: float) -> np.ndarray:
+        """Nearest stop distance per point (inf beyond radius), in chunks on all cores."""
+        dists = np.empty(len(points), dtype=np.float64)
+        for start in range(0, len(points), HOME_CHUNK_SIZE):
+            dists[start:start + HOME_CHUNK_SIZE], _ = tree.query(
+                points[start:start + HOME_CHUNK_SIZE], k=1, distance_upper_bound=radius, workers=-1)
+        return dists
+
+    def _can_update_from(self, baseline: Optional["ServiceCoveragePrepareData"], radius: float) -> bool:
+        """True if baseline holds the nearest stop distances of the same homes at this radius."""
+        if baseline is None or baseline.home_distances is None or baseline.coverage_radius != radius:
+            return False
+        if not (np.array_equal(baseline.home_points, self.home_points)
+                and np.array_equal(baseline.home_weights, self.home_weights)):
+            print("  Homes differ from the baseline scenario: full coverage recompute.")
+            return False
+        return True
+
+    def _build_home_cells(self, radius: float):
+        """
+        Home points sorted by radius-sized grid cell: (radius, sorted cell keys, point order, cell
+        origin, rows). Every point within radius of a stop lies in the 3x3 cells around its cell.
+        """
+        cells = np.floor(self.home_points / radius).astype(np.int64)
+        origin = cells.min(axis=0)
+        cells -= origin
+        rows = int(cells[:, 1].max()) + 1
+        keys = cells[:, 0] * rows + cells[:, 1]
+        order = np.argsort(keys, kind="stable")
+        return radius, keys[order], order, origin, rows
+
+    def _changed_homes(self, baseline: "ServiceCoveragePrepareData", radius: float) -> np.ndarray:
+        """Home points (and some neighbours) within radius of a stop added or removed since the baseline."""
+        changed = np.array(list(set(self.stop_locations) ^ set(baseline.stop_locations)), dtype=np.float64)
+        print(f"  {len(changed)} stop locations changed since the baseline scenario.")
+        if len(changed) == 0:
+            return np.zeros(0, dtype=np.int64)
+        # Cell index of the homes: built once by the baseline and shared by every later scenario
+        if baseline._home_cells is None or baseline._home_cells[0] != radius:
+            baseline._home_cells = self._build_home_cells(radius)
+        self._home_cells = baseline._home_cells
+        _, keys, order, origin, rows = self._home_cells
+
+        # Per changed stop and cell column: one key range covering its 3 cells in that column
+        # (ranges running off the grid only add candidates, which are queried exactly anyway)
+        cells = np.floor(changed / radius).astype(np.int64) - origin
+        columns = (cells[:, 0][:, None] + np.arange(-1, 2)).ravel()
+        centre = np.repeat(cells[:, 1], 3)
+        lo = np.searchsorted(keys, columns * rows + centre - 1, side="left")
+        hi = np.searchsorted(keys, columns * rows + centre + 1, side="right")
+        lengths = np.maximum(hi - lo, 0)
+        positions = np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.unique(order[positions])
+
+    @track_stage("coverage.calculate")
+    def calculate_coverage(self, radius: float = 400.0,
+                           baseline: Optional["ServiceCoveragePrepareData"] = None) -> Dict[str, any]:
         """
         Calculates percentage of population covered by active stops.
+        With a baseline (another scenario's coverage of the same homes at the same radius),
+        only the homes near added/removed stops are queried; every other home keeps its
+        baseline distance, so the result equals a full recompute.
         """
         print(f"Calculating coverage with radius {radius}m...")
-        if not self.home_locations or not self.stop_locations:
+        if len(self.home_locations) == 0 or not self.stop_locations:
             return {"covered_pop": 0, "total_pop": 0, "percentage": 0.0}
 
+        self._unique_homes()
         try:
             from scipy.spatial import cKDTree
             tree = cKDTree(self.stop_locations)
-            dists, _ = tree.query(self.home_locations, k=1, distance_upper_bound=radius)
-            import numpy as np
+            if self._can_update_from(baseline, radius):
+                points = self._changed_homes(baseline, radius)
+                dists = baseline.home_distances.copy()
+                if len(points):
+                    dists[points] = self._query_distances(tree, self.home_points[points], radius)
+                print(f"  Re-evaluated {len(points)} of {len(dists)} home locations from the baseline distances.")
+            else:
+                dists = self._query_distances(tree, self.home_points, radius)
+            self.home_distances, self.coverage_radius = dists, radius
             # Note: dists are infinite if unbound, so check against radius explicitly or infinity
-            covered_count = np.sum(dists <= radius)
+            covered_count = int(self.home_weights[dists <= radius].sum())
             
         except ImportError:
             print("Warning: Scipy not found. Using slower naive calculation.")
             covered_count = 0
-            for hx, hy in self.home_locations:
+            for (hx, hy), weight in zip(self.home_points, self.home_weights):
                 is_covered = False
                 for sx, sy in self.stop_locations:
                     dist = math.sqrt((hx - sx)**2 + (hy - sy)**2)
@@ -128,9 +257,10 @@ class ServiceCoveragePrepareData:
                         is_covered = True
                         break
                 if is_covered:
-                    covered_count += 1
+                    covered_count += int(weight)
 
-        total_pop = len(self.home_locations)
+        total_pop = int(self.home_weights.sum())
+        record_stage(records_in=total_pop, records_out=int(covered_count))
         percentage = (covered_count / total_pop * 100) if total_pop > 0 else 0.0
         
         print(f"  Covered Population: {covered_count} / {total_pop}")
@@ -143,14 +273,14 @@ class ServiceCoveragePrepareData:
         }
 
 def start_scoring(schedule_path: str, plans_xml_path: str, output_dir: str, radius: float):
-    # Step 1: Generate Homes CSV from Plans XML
-    homes_csv_path = os.path.join(output_dir, "population_homes.csv")
+    # Step 1: Generate Homes cache from Plans XML
+    homes_npy_path = os.path.join(output_dir, "population_homes.npy")
     print(f"--- Pre-processing Plans Data ---")
     print(f"Plans XML: {plans_xml_path}")
-    print(f"Output CSV: {homes_csv_path}")
+    print(f"Output cache: {homes_npy_path}")
     
-    if os.path.exists(homes_csv_path):
-        print("  Homes CSV already exists. Skipping generation (or overwrite if needed).")
+    if os.path.exists(homes_npy_path):
+        print("  Homes cache already exists. Skipping generation (or overwrite if needed).")
         # You might want to force overwrite or check timestamps here. 
         # For now, let's just use it if it exists to save time, or overwrite if requested.
         # User requested to run it, so let's run it to be safe/correct.
@@ -158,10 +288,10 @@ def start_scoring(schedule_path: str, plans_xml_path: str, output_dir: str, radi
     
     plan_processor = PlanInputData(plans_xml_path)
     plan_processor.process()
-    plan_processor.save_to_csv(homes_csv_path)
+    plan_processor.save_homes_to_npy(homes_npy_path)
     
     # Step 2: Calculate Coverage
-    processor = ServiceCoveragePrepareData(schedule_path, homes_csv_path)
+    processor = ServiceCoveragePrepareData(schedule_path, homes_npy_path)
     processor.process()
     return processor.calculate_coverage(radius)
 
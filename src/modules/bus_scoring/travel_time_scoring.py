@@ -5,17 +5,27 @@ import os
 import sys
 from typing import Dict
 
-def calculate_travel_time_scores(ridership_csv_path: str) -> Dict[str, float]:
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+from src.utils.sketch_utils import load_sketches_json, named_quantiles
+
+# Percentiles reported from the travel time sketches of the prepared ridership data
+TRAVEL_TIME_QUANTILES = [0.5, 0.9, 0.95]
+
+@track_stage("score.travel_time")
+def calculate_travel_time_scores(ridership_csv_path: str, sketches_path: str = None) -> Dict[str, float]:
     """
     Calculates total travel time for Car and Bus trips based on prepared ridership data.
     
     Args:
         ridership_csv_path (str): Path to the CSV file generated by RidershipPrepareData.
+        sketches_path (str, optional): Travel time sketches JSON of the same run
+            (RidershipPrepareData.save_travel_time_sketches_to_json).
         
     Returns:
         Dict[str, float]: Dictionary containing:
             - 'total_car_travel_time': Sum of travel time for mainMode == 'car'
             - 'total_bus_travel_time': Sum of travel time for mainMode == 'pt' AND vehTypeList contains 'bus'
+            - with sketches_path: '<car|pt|bus>_travel_time_p<50|90|95>' percentiles (seconds)
     """
     print(f"[Travel Time Scoring] Loading data from: {ridership_csv_path}")
     if not os.path.exists(ridership_csv_path):
@@ -24,6 +34,7 @@ def calculate_travel_time_scores(ridership_csv_path: str) -> Dict[str, float]:
         
     try:
         df = pd.read_csv(ridership_csv_path)
+        record_stage(records_in=len(df), bytes_read=file_size(ridership_csv_path))
         
         required_cols = ['mainMode', 'travelTime', 'vehTypeList']
         for col in required_cols:
@@ -45,19 +56,29 @@ def calculate_travel_time_scores(ridership_csv_path: str) -> Dict[str, float]:
         # Usually implies mainMode='pt' or just any trip using a bus? 
         # Requirement: "main mode pt và type có chứa string bus"
         # So condition: mainMode == 'pt' AND vehTypeList contains 'bus'
+        if 'usesBus' in df.columns:
+            uses_bus = df['usesBus'].fillna(False).astype(bool)
+        else:
+            uses_bus = df['vehTypeList'].str.contains("bus", case=False)
         bus_trips = df[
             (df['mainMode'] == 'pt') & 
-            (df['vehTypeList'].str.contains("bus", case=False))
+            uses_bus
         ]
         total_bus_time = bus_trips['travelTime'].sum()
         
         print(f"[Travel Time Scoring] Car Trips: {len(car_trips)}, Total Time: {total_car_time}")
         print(f"[Travel Time Scoring] Bus Trips: {len(bus_trips)}, Total Time: {total_bus_time}")
         
-        return {
+        result = {
             "total_car_travel_time": float(total_car_time),
             "total_bus_travel_time": float(total_bus_time)
         }
+
+        # Percentiles from the sketches built in the events pass: no sort of the trips needed
+        if sketches_path and os.path.exists(sketches_path):
+            result.update(named_quantiles(load_sketches_json(sketches_path), TRAVEL_TIME_QUANTILES,
+                                          "{name}_travel_time_p{pct}"))
+        return result
         
     except Exception as e:
         print(f"Error calculating travel time scores: {e}")
@@ -66,9 +87,10 @@ def calculate_travel_time_scores(ridership_csv_path: str) -> Dict[str, float]:
 def main():
     parser = argparse.ArgumentParser(description="Calculate Travel Time Scores")
     parser.add_argument("--ridership_csv", required=True, help="Path to the prepared ridership CSV file")
+    parser.add_argument("--sketches", help="Travel time sketches JSON (adds percentiles)")
     args = parser.parse_args()
     
-    scores = calculate_travel_time_scores(args.ridership_csv)
+    scores = calculate_travel_time_scores(args.ridership_csv, args.sketches)
     print(f"RESULT={scores}")
 
 if __name__ == "__main__":
@@ -0,0 +1,551 @@
+
+import os
+import shutil
+import pandas as pd
+import json
+from enum import Enum
+
+# Project root: relative config paths are resolved against it
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.config_loader import load_config
+from src.utils.metrics_utils import METRICS
+from src.utils.time_bin_utils import DEFAULT_BIN_SIZE, DEFAULT_NUM_BINS
+
+# Import Processors
+from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+from src.modules.core_data_processor.plan_input_processor import PlanInputData
+from src.modules.core_data_processor.network_processor import NetworkData
+from src.modules.core_data_processor.zone_processor import ZoneGrid
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.on_time_performance_prepare_processor import OnTimePerformancePrepareData
+from src.modules.prepare_bus_score_data.od_matrix_prepare_processor import ODMatrixPrepareData
+from src.modules.prepare_bus_score_data.trip_structure_prepare_processor import TripStructurePrepareData
+from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+from src.modules.prepare_bus_score_data.bus_distance_prepare_processor import BusDistancePrepareData
+from src.modules.prepare_bus_score_data.stop_activity_prepare_processor import StopActivityPrepareData
+from src.modules.prepare_bus_score_data.service_hours_prepare_processor import ServiceHoursPrepareData
+from src.modules.prepare_bus_score_data.events_stream import run_events_stream, parse_time_window
+from src.modules.bus_scoring.service_coverage_scoring import ServiceCoveragePrepareData
+from src.modules.bus_scoring.accessibility_scoring import AccessibilityScoring, DEFAULT_THRESHOLDS
+from src.modules.compare_flow.iteration_scoring import IterationScoring
+
+# Import Scoring Functions
+from src.modules.bus_scoring.ridership_scoring import calculate_bus_ridership, count_population
+from src.modules.bus_scoring.travel_time_scoring import calculate_travel_time_scores
+from src.modules.bus_scoring.on_time_performance_scoring import calculate_otp_score
+from src.modules.bus_scoring.od_matrix_scoring import calculate_od_changes
+from src.modules.bus_scoring.productivity_scoring import calculate_productivity_score
+
+class Scenario(Enum):
+    BEFORE = "before"
+    AFTER = "after"
+
+class ScenarioPaths:
+    def __init__(self, config, scenario: Scenario):
+        data_cfg = config.data.matsim
+        scen_cfg = data_cfg.before if scenario == Scenario.BEFORE else data_cfg.after
+        
+        self.vehicle_xml = self._abs(scen_cfg.input.transit_vehicle)
+        self.schedule_xml = self._abs(scen_cfg.input.transit_schedule)
+        self.events_xml = self._abs(scen_cfg.output.events)
+        
+        # Check and append .gz if needed for events
+        if not os.path.exists(self.events_xml) and os.path.exists(self.events_xml + ".gz"):
+            self.events_xml += ".gz"
+            
+        # Static population plan (Same for both usually, but code allows flexibility if needed)
+        self.plans_xml = self._abs(data_cfg.static_input.plan)
+        self.network_xml = self._abs(data_cfg.static_input.network)
+
+    def _abs(self, path):
+         if not os.path.isabs(path):
+             return os.path.join(project_root, path)
+         return path
+
+def load_network(config):
+    """Parses the static network once; both scenarios share it."""
+    paths = ScenarioPaths(config, Scenario.BEFORE)
+    if not os.path.exists(paths.network_xml):
+        print(f"CRITICAL: Network XML not found: {paths.network_xml}")
+        return None
+
+    network = NetworkData(paths.network_xml)
+    network.process()
+    return network
+
+def build_zone_grid(config, network: NetworkData = None):
+    """Builds the OD zone grid once from the static network so both scenarios share it."""
+    data_cfg = config.data.matsim
+    paths = ScenarioPaths(config, Scenario.BEFORE)
+    if network is None:
+        network = load_network(config)
+        if network is None:
+            return None
+
+    grid = ZoneGrid.from_points(
+        [n.x for n in network.nodes_list], [n.y for n in network.nodes_list],
+        rows=data_cfg.static_input.grid.rows, cols=data_cfg.static_input.grid.cols
+    )
+    grid.save_zones_to_json(paths._abs(data_cfg.static_input.zones.output_path))
+    return grid
+
+# Travel time percentiles (from the quantile sketches) scored and compared
+TRAVEL_TIME_PERCENTILES = [f"{mode}_travel_time_p{pct}" for mode in ("car", "bus") for pct in (50, 90, 95)]
+
+# Per time bin series written by the event consumers
+RIDERSHIP_SERIES_CSV = "ridership_time_series.csv"
+# Trip structure summary keys kept in scores.json (prefixed with pt_)
+TRANSFER_SCORES = ["mean_transfers", "transfer_0_percentage", "transfer_1_percentage",
+                   "transfer_2plus_percentage", "bus_with_other_percentage"]
+OTP_SERIES_CSV = "otp_time_series.csv"
+# Series compared between scenarios, bin by bin
+COMPARED_SERIES = ["trips", "pt_trips", "bus_trips", "bus_boardings",
+                   "mean_car_travel_time", "mean_bus_travel_time", "otp_percentage"]
+
+def compare_time_series(output_base_dir: str):
+    """Joins the BEFORE/AFTER time series per bin; returns them as a list of rows and saves a CSV."""
+    frames = {}
+    for scenario in (Scenario.BEFORE, Scenario.AFTER):
+        scen_dir = os.path.join(output_base_dir, scenario.value)
+        paths = [os.path.join(scen_dir, name) for name in (RIDERSHIP_SERIES_CSV, OTP_SERIES_CSV)]
+        if not all(os.path.exists(p) for p in paths):
+            return []
+        ridership, otp = (pd.read_csv(p) for p in paths)
+        frames[scenario.value] = ridership.merge(otp, on=["binStart", "binEnd"])
+
+    before, after = frames[Scenario.BEFORE.value], frames[Scenario.AFTER.value]
+    series = pd.DataFrame({"binStart": before["binStart"], "binEnd": before["binEnd"]})
+    for name in COMPARED_SERIES:
+        series[f"{name}_before"] = before[name]
+        series[f"{name}_after"] = after[name]
+        series[f"{name}_diff"] = after[name] - before[name]
+
+    series_csv = os.path.join(output_base_dir, "time_series_comparison.csv")
+    print(f"Saving time series comparison to: {series_csv}")
+    series.to_csv(series_csv, index=False)
+    # JSON friendly: NaN (empty bins) -> None
+    return series.astype(object).where(series.notna(), None).to_dict("records")
+
+def run_scenario_scoring(config, scenario: Scenario, output_base_dir: str, grid: ZoneGrid = None,
+                         link_lengths=None, time_window=None, shared: dict = None):
+    # shared: state handed from BEFORE to AFTER (the BEFORE coverage distances)
+    shared = shared if shared is not None else {}
+    print(f"\n{'='*20} Running Scenario: {scenario.value.upper()} {'='*20}")
+    
+    paths = ScenarioPaths(config, scenario)
+    
+    # Setup Output Directory for this scenario
+    scen_out_dir = os.path.join(output_base_dir, scenario.value)
+    os.makedirs(scen_out_dir, exist_ok=True)
+    
+    # Intermediate Files
+    VEHICLES_CSV = os.path.join(scen_out_dir, "vehicles.csv")
+    HOMES_NPY = os.path.join(scen_out_dir, "homes_processed.npy")
+    ACTIVITIES_CSV = os.path.join(scen_out_dir, "plan_activities.csv")
+    LEGS_CSV = os.path.join(scen_out_dir, "plan_legs.csv")
+    RIDERSHIP_CSV = os.path.join(scen_out_dir, "ridership_processed.csv")
+    SKETCHES_JSON = os.path.join(scen_out_dir, "travel_time_sketches.json")
+    RIDERS_JSON = os.path.join(scen_out_dir, "distinct_riders.json")
+    OTP_CSV = os.path.join(scen_out_dir, "otp_processed.csv")
+    
+    # exact (default) or hll: approximate distinct bus riders for very large populations
+    distinct_counting = config.get("distinct_riders") or "exact"
+
+    scores = {}
+    # Per-stage metrics of this scenario only
+    METRICS.reset()
+
+    # --- 1. Vehicle Processing ---
+    print("--- 1. Processing Vehicles ---")
+    if os.path.exists(paths.vehicle_xml):
+        v_proc = VehicleData(paths.vehicle_xml)
+        v_proc.process()
+        v_proc.save_vehicles_to_csv(VEHICLES_CSV)
+        # Picked up next to vehicles.csv by the event processors (bus bitmap, capacities)
+        v_proc.save_vehicle_types_to_csv(os.path.join(scen_out_dir, VEHICLE_TYPES_CSV))
+    else:
+        print(f"CRITICAL: Vehicle XML not found: {paths.vehicle_xml}")
+
+    # --- 2. Plan/Population Processing (Homes) ---
+    print("\n--- 2. Processing Population Plans (Homes) ---")
+    if os.path.exists(paths.plans_xml):
+        # Only process if output doesn't exist or force
+        p_proc = PlanInputData(paths.plans_xml)
+        p_proc.process()
+        p_proc.save_homes_to_npy(HOMES_NPY)
+        p_proc.save_activities_to_csv(ACTIVITIES_CSV)
+        p_proc.save_legs_to_csv(LEGS_CSV)
+    else:
+        print(f"CRITICAL: Plans XML not found: {paths.plans_xml}")
+
+
+    # --- 3/4. Ridership, OTP & Bus Occupancy Preparation (one shared events pass) ---
+    print("\n--- 3. Preparing Ridership, OTP & Occupancy Data ---")
+    occupancy = None
+    distance = None
+    structure = None
+    if os.path.exists(paths.events_xml):
+        bins_cfg = config.get("time_bins") or {}
+        bin_size = bins_cfg.get("bin_size") or DEFAULT_BIN_SIZE
+        num_bins = bins_cfg.get("num_bins") or DEFAULT_NUM_BINS
+        r_prep = RidershipPrepareData(paths.events_xml, VEHICLES_CSV, bin_size=bin_size, num_bins=num_bins,
+                                      distinct_counting=distinct_counting)
+        otp_prep = OnTimePerformancePrepareData(paths.events_xml, VEHICLES_CSV, bin_size=bin_size, num_bins=num_bins,
+                                                min_threshold=-180, max_threshold=180)
+        # The shared pass below applies the time window for all handlers
+        occupancy = BusOccupancyPrepareData(paths.events_xml, VEHICLES_CSV, vehicle_index=r_prep.vehicle_index)
+        stop_activity = StopActivityPrepareData(paths.events_xml, VEHICLES_CSV, vehicle_index=r_prep.vehicle_index)
+        handlers = [r_prep, otp_prep, occupancy, stop_activity]
+        if link_lengths is not None:
+            distance = BusDistancePrepareData(paths.events_xml, link_lengths, occupancy)
+            handlers.append(distance)
+        ckpt_cfg = config.get("checkpoints") or {}
+        checkpoint_path = None
+        if ckpt_cfg.get("enabled"):
+            checkpoint_dir = ckpt_cfg.get("dir") or os.path.join(config.test.output, "checkpoints")
+            checkpoint_path = os.path.join(checkpoint_dir, f"{scenario.value}_events.checkpoint")
+        run_events_stream(paths.events_xml, handlers, time_window=time_window, checkpoint_path=checkpoint_path,
+                          checkpoint_interval=int((ckpt_cfg.get("interval_mb") or 256) * (1 << 20)))
+        r_prep.save_ridership_to_csv(RIDERSHIP_CSV)
+        r_prep.save_travel_time_sketches_to_json(SKETCHES_JSON)
+        if distinct_counting == "hll":
+            r_prep.save_distinct_rider_sketches_to_json(RIDERS_JSON)
+            r_prep.save_distinct_riders_to_csv(os.path.join(scen_out_dir, "distinct_riders.csv"))
+        otp_prep.save_otp_data_to_csv(OTP_CSV)
+        # Time series from the same pass
+        r_prep.save_time_series_to_csv(os.path.join(scen_out_dir, RIDERSHIP_SERIES_CSV))
+        otp_prep.save_time_series_to_csv(os.path.join(scen_out_dir, OTP_SERIES_CSV))
+        occupancy.save_loads_to_csv(os.path.join(scen_out_dir, "bus_loads.csv"))
+        occupancy.save_load_factor_distribution_to_csv(os.path.join(scen_out_dir, "bus_load_factor_distribution.csv"))
+        stop_activity.save_stop_activity_to_csv(os.path.join(scen_out_dir, "stop_activity.csv"))
+        stop_activity.save_stop_totals_to_csv(os.path.join(scen_out_dir, "stop_activity_totals.csv"))
+        if distance is not None:
+            distance.save_route_distances_to_csv(os.path.join(scen_out_dir, "bus_route_distances.csv"))
+        # Transfers and vehicle type sequences of the PT trips (from the in-memory records)
+        structure = TripStructurePrepareData(ridership=r_prep)
+        structure.process()
+        structure.save_transfer_distribution_to_csv(os.path.join(scen_out_dir, "pt_transfer_distribution.csv"))
+        structure.save_sequence_distribution_to_csv(os.path.join(scen_out_dir, "pt_vehicle_sequences.csv"))
+    else:
+        print(f"CRITICAL: Events XML not found: {paths.events_xml}")
+
+    # --- 4b. OD Matrices ---
+    print("\n--- 4b. Building OD Matrices ---")
+    if grid is not None and os.path.exists(ACTIVITIES_CSV) and os.path.exists(RIDERSHIP_CSV):
+        od_prep = ODMatrixPrepareData(ACTIVITIES_CSV, RIDERSHIP_CSV, grid, legs_csv_path=LEGS_CSV)
+        od_prep.process()
+        od_prep.save_od_matrices_to_npz(os.path.join(scen_out_dir, "od_matrices.npz"))
+        od_prep.save_od_pairs_to_csv(os.path.join(scen_out_dir, "od_pairs.csv"))
+
+    # --- SCORING ---
+    print("\n--- 5. Calculating Scores ---")
+
+    # A. Ridership Score
+    valid_ridership = os.path.exists(RIDERSHIP_CSV)
+    if valid_ridership:
+        # Now returns Dict with percentage
+        r_res = calculate_bus_ridership(RIDERSHIP_CSV, HOMES_NPY,
+                                        RIDERS_JSON if distinct_counting == "hll" else None)
+        scores['ridership_unique_persons'] = r_res['unique_persons_bus']
+        scores['ridership_percentage'] = r_res['ridership_percentage']
+        scores['total_population'] = r_res['total_population']
+    
+    # B. Travel Time Score
+    if valid_ridership:
+        tt_res = calculate_travel_time_scores(RIDERSHIP_CSV, SKETCHES_JSON)
+        scores['car_travel_time_total'] = tt_res['total_car_travel_time']
+        scores['bus_travel_time_total'] = tt_res['total_bus_travel_time']
+        for key in TRAVEL_TIME_PERCENTILES:
+            if key in tt_res:
+                scores[key] = tt_res[key]
+
+    # C. On-Time Performance Score
+    if os.path.exists(OTP_CSV):
+        # Default threshold: +- 3 mins
+        otp_res = calculate_otp_score(OTP_CSV, min_threshold=-180, max_threshold=180)
+        scores['otp_percentage'] = otp_res['otp_percentage']
+        scores['otp_on_time_count'] = otp_res['on_time_records']
+        # scores['otp_total_count'] = otp_res['total_records']
+        
+    # C2. Bus Crowding (load factors at stop departures)
+    if occupancy is not None:
+        crowd_res = occupancy.summary()
+        scores['bus_mean_load_factor'] = crowd_res['mean_load_factor']
+        scores['bus_p95_load_factor'] = crowd_res['p95_load_factor']
+        scores['bus_over_capacity_percentage'] = crowd_res['over_capacity_percentage']
+
+    # C3. Bus Vehicle-km / Passenger-km
+    if distance is not None:
+        dist_res = distance.summary()
+        scores['bus_vehicle_km'] = dist_res['vehicle_km']
+        scores['bus_passenger_km'] = dist_res['passenger_km']
+        scores['bus_avg_passengers_onboard'] = dist_res['avg_passengers_onboard']
+
+    # C4. PT Transfers
+    if structure is not None:
+        struct_res = structure.summary()
+        for key in TRANSFER_SCORES:
+            scores[f"pt_{key}"] = struct_res[key]
+
+    # C5. Productivity (scheduled bus service hours per bus rider)
+    if os.path.exists(paths.schedule_xml) and valid_ridership:
+        # Same period as the riders counted from the events
+        service = ServiceHoursPrepareData(paths.schedule_xml, time_window=time_window)
+        service.process()
+        service.save_route_service_hours_to_csv(os.path.join(scen_out_dir, "route_service_hours.csv"))
+        service_res = service.summary()
+        prod_res = calculate_productivity_score(service_res['revenue_hours'], scores['ridership_unique_persons'])
+        scores['bus_service_hours'] = service_res['revenue_hours']
+        scores['bus_vehicle_hours'] = service_res['vehicle_hours']
+        scores['service_hours_per_rider'] = prod_res['service_hours_per_rider']
+        scores['productivity_score'] = prod_res['productivity']
+
+    # D. Service Coverage Score
+    # Now uses the memory-mapped HOMES_NPY cache
+    print("\n--- Calculating Service Coverage ---")
+    if os.path.exists(paths.schedule_xml) and os.path.exists(HOMES_NPY):
+        cov_prep = ServiceCoveragePrepareData(paths.schedule_xml, HOMES_NPY)
+        cov_prep.process()
+        # AFTER: incremental from the BEFORE distances when both share the same homes
+        cov_res = cov_prep.calculate_coverage(radius=400.0, baseline=shared.get("coverage"))
+        shared["coverage"] = cov_prep
+        scores['coverage_percentage'] = cov_res['percentage']
+        scores['coverage_pop_covered'] = cov_res['covered_pop']
+        # scores['coverage_pop_total'] = cov_res['total_pop']
+
+    # E. Transit Accessibility (reachable population / activities per zone)
+    acc_cfg = config.get("accessibility") or {}
+    if acc_cfg.get("enabled") and grid is not None and os.path.exists(paths.schedule_xml) and os.path.exists(HOMES_NPY):
+        print("\n--- Calculating Transit Accessibility ---")
+        accessibility = AccessibilityScoring(
+            paths.schedule_xml, grid, HOMES_NPY, ACTIVITIES_CSV,
+            thresholds=acc_cfg.get("thresholds") or DEFAULT_THRESHOLDS,
+            access_radius=acc_cfg.get("access_radius") or 800.0,
+            departure_window=parse_time_window(acc_cfg.get("departure_window") or "07:00-08:00"),
+            departure_interval=(acc_cfg.get("interval") or 10) * 60.0, num_workers=acc_cfg.get("workers"))
+        accessibility.process()
+        accessibility.save_zone_accessibility_to_csv(os.path.join(scen_out_dir, "zone_accessibility.csv"))
+        for key, value in accessibility.summary().items():
+            scores[f"accessibility_{key}"] = value
+    
+    # Save Scenario Score JSON
+    score_json_path = os.path.join(scen_out_dir, "scores.json")
+    with open(score_json_path, 'w', encoding='utf-8') as f:
+        json.dump(scores, f, indent=4)
+
+    # Stage metrics next to scores.json
+    METRICS.save_json(os.path.join(scen_out_dir, "metrics.json"))
+        
+    return scores
+
+def run_iteration_scoring(config, scenario: Scenario, output_base_dir: str, network: NetworkData = None,
+                          time_window=None) -> list:
+    """
+    Scores every ITERS/it.N events file next to the scenario's output events (config
+    iterations: workers, every) with the static inputs prepared by run_scenario_scoring.
+    """
+    iter_cfg = config.get("iterations") or {}
+    paths = ScenarioPaths(config, scenario)
+    scen_out_dir = os.path.join(output_base_dir, scenario.value)
+    homes_npy = os.path.join(scen_out_dir, "homes_processed.npy")
+
+    print(f"\n--- Scoring MATSim iterations: {scenario.value.upper()} ---")
+    scoring = IterationScoring(
+        os.path.dirname(paths.events_xml), os.path.join(scen_out_dir, "vehicles.csv"), scen_out_dir,
+        link_ids=[l.id for l in network.link_list] if network is not None else None,
+        link_lengths=[l.length for l in network.link_list] if network is not None else None,
+        total_population=count_population(homes_npy) if os.path.exists(homes_npy) else 0,
+        num_workers=iter_cfg.get("workers"), every=iter_cfg.get("every") or 1, time_window=time_window
+    )
+    scoring.process()
+    scoring.save_scores()
+    return scoring.iteration_scores
+
+def run_compare_flow(config_path: str = None, output_base_dir: str = None, time_window=None) -> dict:
+    """
+    Runs the full BEFORE/AFTER pipeline (processing, scoring, comparison) and returns
+    the comparison summary. Outputs go to output_base_dir (default: <test.output>/compare_flow_full).
+
+    time_window ('06:00-09:00' or a (start, end) pair in seconds, default: config time_window)
+    restricts the events based scores to that period, e.g. the morning peak.
+    """
+    config = load_config(config_path)
+    time_window = parse_time_window(time_window if time_window is not None else config.get("time_window"))
+    if output_base_dir is None:
+        output_base_dir = os.path.join(config.test.output, "compare_flow_full")
+    
+    # Clean previous run
+    if os.path.exists(output_base_dir):
+        shutil.rmtree(output_base_dir)
+    os.makedirs(output_base_dir, exist_ok=True)
+    
+    # Shared zoning for the OD matrices
+    network = load_network(config)
+    grid = build_zone_grid(config, network) if network is not None else None
+    link_lengths = network.link_length_array() if network is not None else None
+
+    # Run Scenarios (AFTER coverage is updated incrementally from BEFORE)
+    shared = {}
+    before_scores = run_scenario_scoring(config, Scenario.BEFORE, output_base_dir, grid, link_lengths, time_window,
+                                         shared)
+    after_scores = run_scenario_scoring(config, Scenario.AFTER, output_base_dir, grid, link_lengths, time_window,
+                                        shared)
+
+    # Score trajectory over the MATSim iterations (optional: one events pass per iteration)
+    iterations = {}
+    if (config.get("iterations") or {}).get("enabled"):
+        for scenario in (Scenario.BEFORE, Scenario.AFTER):
+            iterations[scenario.value] = run_iteration_scoring(config, scenario, output_base_dir, network, time_window)
+    
+    # JSON Comparison Output
+    print(f"\n{'='*20} COMPARISON RESULTS {'='*20}")
+
+    comparison_json = {
+        "time_window": list(time_window) if time_window else None,
+        "ridership": {},
+        "travel_time": {},
+        "otp": {},
+        "crowding": {},
+        "distance": {},
+        "transfers": {},
+        "productivity": {},
+        "time_series": [],
+        "coverage": {},
+        "accessibility": {},
+        "od": {}
+    }
+
+    # Ridership
+    comparison_json["ridership"]["unique_users"] = {
+        "before": before_scores.get("ridership_unique_persons", 0),
+        "after": after_scores.get("ridership_unique_persons", 0),
+        "diff": after_scores.get("ridership_unique_persons", 0) - before_scores.get("ridership_unique_persons", 0),
+        "percent_change": round((after_scores.get("ridership_unique_persons", 0) - before_scores.get("ridership_unique_persons", 0)) / before_scores.get("ridership_unique_persons", 1) * 100, 2)
+    }
+    comparison_json["ridership"]["usage_percentage"] = {
+        "before": before_scores.get("ridership_percentage", 0),
+        "after": after_scores.get("ridership_percentage", 0),
+        "diff": after_scores.get("ridership_percentage", 0) - before_scores.get("ridership_percentage", 0)
+    }
+    comparison_json["ridership"]["total_population"] = {
+        "before": before_scores.get("total_population", 0),
+        "after": after_scores.get("total_population", 0)
+    }
+
+    # Travel Time
+    comparison_json["travel_time"]["total_bus_time"] = {
+        "before": before_scores.get("bus_travel_time_total", 0),
+        "after": after_scores.get("bus_travel_time_total", 0),
+        "diff": after_scores.get("bus_travel_time_total", 0) - before_scores.get("bus_travel_time_total", 0),
+        "percent_change": round((after_scores.get("bus_travel_time_total", 0) - before_scores.get("bus_travel_time_total", 0)) / before_scores.get("bus_travel_time_total", 1) * 100, 2)
+    }
+    comparison_json["travel_time"]["total_car_time"] = {
+        "before": before_scores.get("car_travel_time_total", 0),
+        "after": after_scores.get("car_travel_time_total", 0),
+        "diff": after_scores.get("car_travel_time_total", 0) - before_scores.get("car_travel_time_total", 0),
+        "percent_change": round((after_scores.get("car_travel_time_total", 0) - before_scores.get("car_travel_time_total", 0)) / before_scores.get("car_travel_time_total", 1) * 100, 2)
+    }
+
+    for key in TRAVEL_TIME_PERCENTILES:
+        if key in before_scores or key in after_scores:
+            comparison_json["travel_time"][key] = {
+                "before": before_scores.get(key),
+                "after": after_scores.get(key),
+                "diff": (after_scores[key] - before_scores[key]) if key in before_scores and key in after_scores else None
+            }
+
+    # OTP
+    comparison_json["otp"]["on_time_percentage"] = {
+        "before": before_scores.get("otp_percentage", 0),
+        "after": after_scores.get("otp_percentage", 0),
+        "diff": after_scores.get("otp_percentage", 0) - before_scores.get("otp_percentage", 0)
+    }
+
+    # Crowding
+    for key, name in (("bus_mean_load_factor", "mean_load_factor"),
+                      ("bus_p95_load_factor", "p95_load_factor"),
+                      ("bus_over_capacity_percentage", "over_capacity_percentage")):
+        comparison_json["crowding"][name] = {
+            "before": before_scores.get(key, 0),
+            "after": after_scores.get(key, 0),
+            "diff": after_scores.get(key, 0) - before_scores.get(key, 0)
+        }
+
+    # Vehicle-km / Passenger-km
+    for key, name in (("bus_vehicle_km", "vehicle_km"),
+                      ("bus_passenger_km", "passenger_km"),
+                      ("bus_avg_passengers_onboard", "avg_passengers_onboard")):
+        comparison_json["distance"][name] = {
+            "before": before_scores.get(key, 0),
+            "after": after_scores.get(key, 0),
+            "diff": after_scores.get(key, 0) - before_scores.get(key, 0)
+        }
+    
+    # PT transfers
+    for key in TRANSFER_SCORES:
+        comparison_json["transfers"][key] = {
+            "before": before_scores.get(f"pt_{key}", 0),
+            "after": after_scores.get(f"pt_{key}", 0),
+            "diff": after_scores.get(f"pt_{key}", 0) - before_scores.get(f"pt_{key}", 0)
+        }
+
+    # Productivity
+    for key, name in (("bus_service_hours", "service_hours"),
+                      ("bus_vehicle_hours", "vehicle_hours"),
+                      ("service_hours_per_rider", "service_hours_per_rider"),
+                      ("productivity_score", "score")):
+        comparison_json["productivity"][name] = {
+            "before": before_scores.get(key, 0),
+            "after": after_scores.get(key, 0),
+            "diff": after_scores.get(key, 0) - before_scores.get(key, 0)
+        }
+
+    # Coverage
+    comparison_json["coverage"]["population_covered_percent"] = {
+        "before": before_scores.get("coverage_percentage", 0),
+        "after": after_scores.get("coverage_percentage", 0),
+        "diff": after_scores.get("coverage_percentage", 0) - before_scores.get("coverage_percentage", 0)
+    }
+    comparison_json["coverage"]["population_covered_count"] = {
+        "before": before_scores.get("coverage_pop_covered", 0),
+        "after": after_scores.get("coverage_pop_covered", 0),
+        "diff": after_scores.get("coverage_pop_covered", 0) - before_scores.get("coverage_pop_covered", 0)
+    }
+
+    # Accessibility
+    for key in sorted(set(before_scores) | set(after_scores)):
+        if key.startswith("accessibility_"):
+            comparison_json["accessibility"][key[len("accessibility_"):]] = {
+                "before": before_scores.get(key, 0),
+                "after": after_scores.get(key, 0),
+                "diff": after_scores.get(key, 0) - before_scores.get(key, 0)
+            }
+
+    if iterations:
+        comparison_json["iterations"] = iterations
+
+    # Time series (per bin before/after)
+    comparison_json["time_series"] = compare_time_series(output_base_dir)
+
+    # OD Matrices
+    comparison_json["od"] = calculate_od_changes(
+        os.path.join(output_base_dir, Scenario.BEFORE.value, "od_matrices.npz"),
+        os.path.join(output_base_dir, Scenario.AFTER.value, "od_matrices.npz"),
+        delta_csv_path=os.path.join(output_base_dir, "od_deltas.csv")
+    )
+
+    # Save Comparison JSON
+    comp_json_path = os.path.join(output_base_dir, "comparison_summary.json")
+    with open(comp_json_path, 'w', encoding='utf-8') as f:
+        json.dump(comparison_json, f, indent=4)
+    
+    print(json.dumps(comparison_json, indent=4))
+    print(f"\nFull results saved to: {output_base_dir}")
+    return comparison_json
+
+def main():
+    run_compare_flow()
+
+if __name__ == "__main__":
+    main()
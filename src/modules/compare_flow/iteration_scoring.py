@@ -0,0 +1,153 @@
+import os
+import re
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.modules.core_data_processor.vehicle_processor import VehicleTypeIndex
+from src.modules.prepare_bus_score_data.events_stream import EventsStream
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.on_time_performance_prepare_processor import OnTimePerformancePrepareData
+from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+from src.modules.prepare_bus_score_data.bus_distance_prepare_processor import BusDistancePrepareData
+from src.utils.id_dictionary import ID_DICTIONARY
+from src.utils.metrics_utils import track_stage, record_stage
+
+# MATSim layout: <output>/ITERS/it.N/N.events.xml.gz
+ITERS_DIR = "ITERS"
+_ITERATION_EVENTS = re.compile(r"^(\d+)\.events\.xml(\.gz)?$")
+ITERATION_SCORES_CSV = "iteration_scores.csv"
+
+def find_iteration_events(matsim_output_dir: str, every: int = 1) -> List[Tuple[int, str]]:
+    """(iteration, events path) of every ITERS/it.N/N.events.xml(.gz), sorted by iteration."""
+    iters_dir = os.path.join(matsim_output_dir, ITERS_DIR)
+    found = []
+    if not os.path.isdir(iters_dir):
+        return found
+    for entry in os.listdir(iters_dir):
+        it_dir = os.path.join(iters_dir, entry)
+        if not entry.startswith("it.") or not os.path.isdir(it_dir):
+            continue
+        for name in os.listdir(it_dir):
+            match = _ITERATION_EVENTS.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(it_dir, name)))
+                break
+    found.sort()
+    return [(it, path) for it, path in found if it % every == 0]
+
+# Static inputs parsed once per worker process by _init_worker, reused for every iteration it scores
+_STATIC: Dict[str, Any] = {}
+
+def _init_worker(vehicles_csv_path: str, link_ids: Optional[List[str]], link_lengths: Optional[List[float]],
+                 total_population: int, time_window: Optional[Tuple[float, float]]):
+    _STATIC["vehicle_index"] = VehicleTypeIndex.from_csv(vehicles_csv_path, id_dictionary=ID_DICTIONARY)
+    _STATIC["link_lengths"] = None
+    if link_ids:
+        # Codes of this process' ID dictionary (a spawned worker starts with an empty one)
+        codes = ID_DICTIONARY.link.encode_many(link_ids)
+        lengths = np.zeros(len(ID_DICTIONARY.link), dtype=np.float64)
+        lengths[codes] = link_lengths
+        _STATIC["link_lengths"] = lengths
+    _STATIC["total_population"] = total_population
+    _STATIC["time_window"] = time_window
+
+def _score_iteration(iteration: int, events_path: str) -> Dict[str, Any]:
+    """One shared events pass over an iteration's events; returns its scores."""
+    index = _STATIC["vehicle_index"]
+    ridership = RidershipPrepareData(events_path, None, vehicle_index=index)
+    otp = OnTimePerformancePrepareData(events_path, None, vehicle_index=index,
+                                       min_threshold=-180, max_threshold=180)
+    occupancy = BusOccupancyPrepareData(events_path, None, vehicle_index=index)
+    handlers = [ridership, otp, occupancy]
+    distance = None
+    if _STATIC["link_lengths"] is not None:
+        distance = BusDistancePrepareData(events_path, _STATIC["link_lengths"], occupancy)
+        handlers.append(distance)
+
+    event_count = EventsStream(events_path, handlers, time_window=_STATIC["time_window"]).run()
+
+    r_res, otp_res, crowd_res = ridership.summary(), otp.summary(), occupancy.summary()
+    population = _STATIC["total_population"]
+    scores = {
+        "iteration": iteration,
+        "events": event_count,
+        "ridership_unique_persons": r_res["unique_persons_bus"],
+        "ridership_percentage": r_res["unique_persons_bus"] / population * 100 if population > 0 else 0.0,
+        "bus_trips": r_res["bus_trips"],
+        "car_travel_time_total": r_res["total_car_travel_time"],
+        "bus_travel_time_total": r_res["total_bus_travel_time"],
+        "otp_percentage": otp_res["otp_percentage"],
+        "bus_mean_load_factor": crowd_res["mean_load_factor"],
+        "bus_p95_load_factor": crowd_res["p95_load_factor"],
+        "bus_over_capacity_percentage": crowd_res["over_capacity_percentage"]
+    }
+    scores.update(ridership.get_travel_time_quantiles())
+    if distance is not None:
+        dist_res = distance.summary()
+        scores["bus_vehicle_km"] = dist_res["vehicle_km"]
+        scores["bus_passenger_km"] = dist_res["passenger_km"]
+    print(f"Scored iteration {iteration}: {event_count} events.")
+    return scores
+
+class IterationScoring:
+    """
+    Scores the events of every MATSim iteration (ITERS/it.N/N.events.xml.gz) in a process
+    pool, one iteration per task, giving a score trajectory that shows convergence.
+
+    Static inputs (vehicle classification, link lengths, population size) are prepared once
+    in the parent and parsed once per worker, not per iteration. Iterations are independent
+    single-file passes, so throughput grows close to linearly with the number of workers.
+    """
+    def __init__(self, matsim_output_dir: str, vehicles_csv_path: str, output_dir: str,
+                 link_ids: Optional[List[str]] = None, link_lengths: Optional[List[float]] = None,
+                 total_population: int = 0, num_workers: Optional[int] = None, every: int = 1,
+                 time_window: Optional[Tuple[float, float]] = None):
+        self.matsim_output_dir = matsim_output_dir
+        self.vehicles_csv_path = vehicles_csv_path
+        self.output_dir = output_dir
+        self.link_ids = link_ids
+        self.link_lengths = link_lengths
+        self.total_population = total_population
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.every = every
+        self.time_window = time_window
+        self.iteration_scores: List[Dict[str, Any]] = []
+
+    @track_stage("iteration_scoring.process")
+    def process(self):
+        iterations = find_iteration_events(self.matsim_output_dir, self.every)
+        print(f"Found {len(iterations)} iteration event files in: {os.path.join(self.matsim_output_dir, ITERS_DIR)}")
+        if not iterations:
+            return
+
+        init_args = (self.vehicles_csv_path, self.link_ids, self.link_lengths, self.total_population, self.time_window)
+        numbers = [it for it, _ in iterations]
+        paths = [path for _, path in iterations]
+        workers = min(self.num_workers, len(iterations))
+        if workers <= 1:
+            _init_worker(*init_args)
+            self.iteration_scores = [_score_iteration(it, path) for it, path in iterations]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as executor:
+                # map keeps the iteration order
+                self.iteration_scores = list(executor.map(_score_iteration, numbers, paths))
+
+        record_stage(records_in=sum(s["events"] for s in self.iteration_scores),
+                     records_out=len(self.iteration_scores),
+                     bytes_read=sum(os.path.getsize(p) for p in paths), workers=workers)
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """One row per iteration with its scores."""
+        return pd.DataFrame(self.iteration_scores)
+
+    def save_scores(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        csv_path = os.path.join(self.output_dir, ITERATION_SCORES_CSV)
+        print(f"Saving iteration scores to: {csv_path}")
+        self.get_dataframe().to_csv(csv_path, index=False)
+        with open(os.path.join(self.output_dir, "iteration_scores.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.iteration_scores, f, indent=4)
@@ -1,7 +1,10 @@
 import os
 import xml.etree.ElementTree as ET
-from typing import List
+import numpy as np
+from typing import List, Optional
 from src.utils.file_utils import save_csv_from_list
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY
+from src.utils.metrics_utils import track_stage, record_stage, file_size
 
 class Node:
     def __init__(self, id: str, x: float, y: float):
@@ -10,19 +13,22 @@ class Node:
         self.y: float = y
 
 class Link:
-    def __init__(self, id: str, from_node: str, to_node: str, modes: str):
+    def __init__(self, id: str, from_node: str, to_node: str, modes: str, length: float = 0.0):
         self.id: str = id
         self.from_node: str = from_node
         self.to_node: str = to_node
         self.modes: str = modes
+        self.length: float = length
 
 
 class NetworkData:
-    def __init__(self, network_path: str):
+    def __init__(self, network_path: str, id_dictionary: Optional[IdDictionary] = None):
         self.network_path: str = network_path
+        self.ids = id_dictionary or ID_DICTIONARY
         self.nodes_list: List[Node] = []
         self.link_list: List[Link] = []
 
+    @track_stage("network.process")
     def process(self):
         """
         Trích xuất thông tin node và link trong network
@@ -33,6 +39,7 @@ class NetworkData:
 
             # Extract Nodes
             for node in root.findall('nodes/node'):
+                self.ids.node.encode(node.get('id'))
                 self.nodes_list.append(Node(
                     id=node.get('id'),
                     x=float(node.get('x')),
@@ -40,20 +47,31 @@ class NetworkData:
                 ))
             # Extract Links
             for link in root.findall('links/link'):
+                self.ids.link.encode(link.get('id'))
                 self.link_list.append(Link(
                     id=link.get('id'),
                     from_node=link.get('from'),
                     to_node=link.get('to'),
-                    modes=link.get('modes')
+                    modes=link.get('modes'),
+                    length=float(link.get('length') or 0.0)
                 ))
             
             print(f"Extracted {len(self.nodes_list)} nodes and {len(self.link_list)} links.")
+            record_stage(records_out=len(self.nodes_list) + len(self.link_list),
+                         bytes_read=file_size(self.network_path))
             
         except Exception as e:
             print(f"Error processing network: {e}")
             raise
 
     
+    def link_length_array(self) -> np.ndarray:
+        """Link lengths in meters indexed by link code (0 for codes not in this network)."""
+        codes = self.ids.link.encode_many([l.id for l in self.link_list])
+        lengths = np.zeros(len(self.ids.link), dtype=np.float64)
+        lengths[codes] = [l.length for l in self.link_list]
+        return lengths
+
     def save_nodes_to_csv(self, nodes_csv_path: str):
         print(f"Saving processed nodes to: {nodes_csv_path}")
         save_csv_from_list(self.nodes_list, nodes_csv_path)
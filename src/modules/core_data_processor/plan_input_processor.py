@@ -1,8 +1,22 @@
-
 import xml.etree.ElementTree as ET
+import gzip
+import math
 import os
-from typing import List
-from src.utils.file_utils import save_csv_from_list
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from src.utils.file_utils import save_csv_from_list, save_csv_from_columns, save_memmap_array
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+
+# Columns of the selected-plan tables (columnar output, one list per column)
+ACTIVITY_COLUMNS = ["person_id", "act_index", "type", "x", "y", "link", "facility", "start_time", "end_time"]
+LEG_COLUMNS = ["person_id", "leg_index", "mode", "routing_mode", "dep_time", "trav_time",
+               "route_type", "start_link", "end_link", "distance"]
+
+# A shard always starts on a person element, e.g. <person id="1"> (but not <personAttributes>)
+PERSON_START_PATTERN = re.compile(rb"<person[\s>]")
+POPULATION_END_TAG = b"</population>"
+DEFAULT_SHARD_SIZE_MB = 64
 
 class PlanHomeLocation:
     def __init__(self, person_id: str, x: float, y: float):
@@ -10,74 +24,281 @@ class PlanHomeLocation:
         self.x = x
         self.y = y
 
+def _tag_name(elem) -> str:
+    return elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
+
+def _parse_time(value: Optional[str]) -> float:
+    """Converts a MATSim time ('HH:MM:SS' or seconds) to seconds, NaN if missing."""
+    if not value or value == "undefined":
+        return math.nan
+    try:
+        if ':' in value:
+            parts = value.split(':')
+            seconds = 0.0
+            for part in parts:
+                seconds = seconds * 60 + float(part)
+            return seconds
+        return float(value)
+    except ValueError:
+        return math.nan
+
+def _parse_float(value: Optional[str]) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return math.nan
+
+class _ShardReader:
+    """
+    File-like object exposing the byte range [start, end) of the plans file
+    wrapped in a <population> element, so every shard is a well-formed document.
+    """
+    def __init__(self, path: str, start: int, end: int):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+        self._prefix = b"<population>"
+        self._suffix = POPULATION_END_TAG
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = 1 << 20
+        if self._prefix:
+            chunk, self._prefix = self._prefix, b""
+            return chunk
+        if self._remaining > 0:
+            chunk = self._file.read(min(size, self._remaining))
+            self._remaining -= len(chunk)
+            if chunk:
+                return chunk
+            self._remaining = 0
+        chunk, self._suffix = self._suffix, b""
+        return chunk
+
+    def close(self):
+        self._file.close()
+
+def _new_columns(names: List[str]) -> Dict[str, List[Any]]:
+    return {name: [] for name in names}
+
+def _extract_person(person, activities: Dict[str, List[Any]], legs: Dict[str, List[Any]]):
+    """Appends every activity and leg of the person's selected plan to the column lists."""
+    person_id = person.get("id")
+    for plan in person:
+        if _tag_name(plan) != "plan" or plan.get("selected") != "yes":
+            continue
+
+        act_index = 0
+        leg_index = 0
+        for element in plan:
+            tag = _tag_name(element)
+            if tag in ("act", "activity"):
+                activities["person_id"].append(person_id)
+                activities["act_index"].append(act_index)
+                activities["type"].append(element.get("type"))
+                activities["x"].append(_parse_float(element.get("x")))
+                activities["y"].append(_parse_float(element.get("y")))
+                activities["link"].append(element.get("link"))
+                activities["facility"].append(element.get("facility"))
+                activities["start_time"].append(_parse_time(element.get("start_time")))
+                activities["end_time"].append(_parse_time(element.get("end_time")))
+                act_index += 1
+
+            elif tag == "leg":
+                routing_mode = None
+                route_type = start_link = end_link = None
+                distance = math.nan
+                for child in element:
+                    child_tag = _tag_name(child)
+                    if child_tag == "attributes":
+                        for attribute in child:
+                            if attribute.get("name") == "routingMode":
+                                routing_mode = (attribute.text or "").strip()
+                    elif child_tag == "route":
+                        route_type = child.get("type")
+                        start_link = child.get("start_link")
+                        end_link = child.get("end_link")
+                        distance = _parse_float(child.get("distance"))
+
+                legs["person_id"].append(person_id)
+                legs["leg_index"].append(leg_index)
+                legs["mode"].append(element.get("mode"))
+                legs["routing_mode"].append(routing_mode)
+                legs["dep_time"].append(_parse_time(element.get("dep_time")))
+                legs["trav_time"].append(_parse_time(element.get("trav_time")))
+                legs["route_type"].append(route_type)
+                legs["start_link"].append(start_link)
+                legs["end_link"].append(end_link)
+                legs["distance"].append(distance)
+                leg_index += 1
+        # Only one plan per person is selected
+        break
+
+def _parse_plans_stream(source) -> Tuple[Dict[str, List[Any]], Dict[str, List[Any]]]:
+    activities = _new_columns(ACTIVITY_COLUMNS)
+    legs = _new_columns(LEG_COLUMNS)
+
+    context = iter(ET.iterparse(source, events=("start", "end")))
+    event, root = next(context) # get root element
+
+    for event, elem in context:
+        if event == "end" and _tag_name(elem) == "person":
+            _extract_person(elem, activities, legs)
+            # Drop the finished person from the root as well, otherwise the root
+            # keeps a reference to every (cleared) person element of the file.
+            root.clear()
+
+    return activities, legs
+
+def _parse_plans_shard(plans_path: str, start: int, end: int) -> Tuple[Dict[str, List[Any]], Dict[str, List[Any]]]:
+    """Worker entry point: parses the persons located in the byte range [start, end)."""
+    reader = _ShardReader(plans_path, start, end)
+    try:
+        return _parse_plans_stream(reader)
+    finally:
+        reader.close()
+
+def _find_person_boundary(f, offset: int, file_size: int, block_size: int = 1 << 20) -> int:
+    """Returns the offset of the first '<person' tag at or after offset (file_size if none)."""
+    f.seek(offset)
+    overlap = len(b"<person ")
+    position = offset
+    while position < file_size:
+        block = f.read(block_size + overlap)
+        if not block:
+            break
+        match = PERSON_START_PATTERN.search(block)
+        if match:
+            return position + match.start()
+        position += block_size
+        f.seek(position)
+    return file_size
+
+def split_plans_into_shards(plans_path: str, shard_size_mb: float = DEFAULT_SHARD_SIZE_MB) -> List[Tuple[int, int]]:
+    """
+    Splits an uncompressed plans XML into byte ranges that each start on a '<person' tag.
+    The last range stops before the closing </population> tag.
+    """
+    file_size = os.path.getsize(plans_path)
+    shard_size = max(1, int(shard_size_mb * 1024 * 1024))
+
+    with open(plans_path, "rb") as f:
+        first = _find_person_boundary(f, 0, file_size)
+        if first >= file_size:
+            return []
+
+        # Locate the closing tag in the tail of the file
+        tail_start = max(first, file_size - 4096)
+        f.seek(tail_start)
+        tail = f.read()
+        end_tag_pos = tail.rfind(POPULATION_END_TAG)
+        data_end = tail_start + end_tag_pos if end_tag_pos >= 0 else file_size
+
+        boundaries = [first]
+        offset = first + shard_size
+        while offset < data_end:
+            boundary = _find_person_boundary(f, offset, data_end)
+            if boundary >= data_end:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+            offset = boundary + shard_size
+
+    boundaries.append(data_end)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
 class PlanInputData:
-    def __init__(self, plans_path: str):
+    def __init__(self, plans_path: str, num_workers: Optional[int] = None,
+                 shard_size_mb: float = DEFAULT_SHARD_SIZE_MB):
         self.plans_path = plans_path
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.shard_size_mb = shard_size_mb
+        # Columnar output of the selected plans
+        self.activities: Dict[str, List[Any]] = _new_columns(ACTIVITY_COLUMNS)
+        self.legs: Dict[str, List[Any]] = _new_columns(LEG_COLUMNS)
+        # Derived view: first home activity of each person
         self.home_locations: List[PlanHomeLocation] = []
 
+    @track_stage("plans.process")
     def process(self):
         """
-        Parses the plans XML to find Home activity locations for each person.
-        Only considers the 'selected' plan.
+        Parses every activity and leg of each person's 'selected' plan.
+        Uncompressed files are split on '<person' boundaries and parsed in a worker pool.
+        Home locations are derived from the activities afterwards.
         """
         print(f"Processing plans from: {self.plans_path}")
         if not os.path.exists(self.plans_path):
             raise FileNotFoundError(f"Plans file not found: {self.plans_path}")
 
         try:
-            # Use iterparse with start/end events to track context (person -> selected plan -> act)
-            context = ET.iterparse(self.plans_path, events=("start", "end"))
-            context = iter(context)
-            event, root = next(context) # get root element
-
-            current_person_id = None
-            in_selected_plan = False
-            
-            # We only need one home location per person (usually they are the same in one plan)
-            # This flag ensures we don't capture multiple 'home' acts for the same person if not needed
-            # Or we can capture the first one we find in the selected plan.
-            found_home_for_current_person = False
-
-            for event, elem in context:
-                if event == "start":
-                    if elem.tag == "person" or elem.tag.endswith("person"):
-                        current_person_id = elem.get("id")
-                        found_home_for_current_person = False
-                    
-                    elif elem.tag == "plan" or elem.tag.endswith("plan"):
-                        if elem.get("selected") == "yes":
-                            in_selected_plan = True
-                        else:
-                            in_selected_plan = False
-                            
-                    elif elem.tag == "act" or elem.tag.endswith("act"):
-                        if in_selected_plan and not found_home_for_current_person:
-                            act_type = elem.get("type")
-                            if act_type == "home":
-                                try:
-                                    x = float(elem.get("x"))
-                                    y = float(elem.get("y"))
-                                    self.home_locations.append(PlanHomeLocation(current_person_id, x, y))
-                                    found_home_for_current_person = True # Stop looking for home for this person
-                                except (ValueError, TypeError):
-                                    # Handle missing or invalid x/y
-                                    pass
-
-                elif event == "end":
-                    if elem.tag == "plan" or elem.tag.endswith("plan"):
-                        in_selected_plan = False
-                    
-                    elif elem.tag == "person" or elem.tag.endswith("person"):
-                        current_person_id = None
-                        found_home_for_current_person = False
-                        elem.clear() # Clear memory
-                        
+            if self.plans_path.endswith('.gz'):
+                # Compressed streams cannot be seeked into, parse serially
+                with gzip.open(self.plans_path, "rb") as f:
+                    self._append_columns(*_parse_plans_stream(f))
+            else:
+                shards = split_plans_into_shards(self.plans_path, self.shard_size_mb)
+                print(f"  Split plans into {len(shards)} shards.")
+                workers = min(self.num_workers, len(shards))
+
+                if workers <= 1:
+                    for start, end in shards:
+                        self._append_columns(*_parse_plans_shard(self.plans_path, start, end))
+                else:
+                    paths = [self.plans_path] * len(shards)
+                    starts = [start for start, _ in shards]
+                    ends = [end for _, end in shards]
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        # map keeps the shard order, so the output order matches the file
+                        for activities, legs in executor.map(_parse_plans_shard, paths, starts, ends):
+                            self._append_columns(activities, legs)
+
+            self._derive_home_locations()
+            print(f"Extracted {len(self.activities['person_id'])} activities and {len(self.legs['person_id'])} legs.")
             print(f"Extracted home locations for {len(self.home_locations)} persons.")
+            record_stage(records_out=len(self.activities["person_id"]) + len(self.legs["person_id"]),
+                         bytes_read=file_size(self.plans_path), persons_with_home=len(self.home_locations))
 
         except Exception as e:
             print(f"Error processing plans: {e}")
             raise
 
+    def _append_columns(self, activities: Dict[str, List[Any]], legs: Dict[str, List[Any]]):
+        for name in ACTIVITY_COLUMNS:
+            self.activities[name].extend(activities[name])
+        for name in LEG_COLUMNS:
+            self.legs[name].extend(legs[name])
+
+    def _derive_home_locations(self):
+        """Keeps the first 'home' activity with valid coordinates of each person."""
+        self.home_locations = []
+        last_person = None
+        acts = self.activities
+        for person_id, act_type, x, y in zip(acts["person_id"], acts["type"], acts["x"], acts["y"]):
+            if person_id == last_person or act_type != "home":
+                continue
+            if math.isnan(x) or math.isnan(y):
+                continue
+            self.home_locations.append(PlanHomeLocation(person_id, x, y))
+            last_person = person_id
+
     def save_to_csv(self, output_path: str):
         print(f"Saving home locations to: {output_path}")
         save_csv_from_list(self.home_locations, output_path)
+
+    def save_homes_to_npy(self, output_path: str):
+        """
+        Saves home locations as a memory-mappable float64 (N, 2) array of (x, y),
+        with a person id sidecar and the row count in a metadata file.
+        """
+        print(f"Saving home locations cache to: {output_path}")
+        coords = [(home.x, home.y) for home in self.home_locations]
+        ids = [home.person_id for home in self.home_locations]
+        save_memmap_array(coords, output_path, ids=ids, columns=["x", "y"])
+
+    def save_activities_to_csv(self, output_path: str):
+        print(f"Saving selected plan activities to: {output_path}")
+        save_csv_from_columns(self.activities, output_path)
+
+    def save_legs_to_csv(self, output_path: str):
+        print(f"Saving selected plan legs to: {output_path}")
+        save_csv_from_columns(self.legs, output_path)
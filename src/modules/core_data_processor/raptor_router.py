@@ -0,0 +1,198 @@
+import math
+import numpy as np
+from typing import List, Optional, Sequence
+from src.modules.core_data_processor.schedule_processor import TransitScheduleData, parse_schedule_time, parse_schedule_times
+
+# MATSim defaults for teleported walk: 0.833 m/s over the beeline distance x 1.3
+WALK_SPEED = 0.833
+BEELINE_FACTOR = 1.3
+# Walking transfers between stops up to this beeline distance (m)
+DEFAULT_TRANSFER_RADIUS = 300.0
+# Rounds = vehicle trips per journey (4: up to 3 transfers)
+DEFAULT_MAX_ROUNDS = 4
+# Column offset of the per-position departure keys; larger than any schedule time (s)
+_SPAN = 1e7
+
+def walk_time(distance):
+    """Walking time (s) for a beeline distance (m)."""
+    return np.asarray(distance, dtype=np.float64) * BEELINE_FACTOR / WALK_SPEED
+
+class TimetableRoute:
+    """
+    One transit route as (trips x stop positions) departure and arrival time matrices.
+    MATSim trips of a route share its stop offsets, so trips never overtake and every
+    column is sorted: the earliest trip at a position is one searchsorted over the
+    departure keys (column i shifted by i * _SPAN, flattened column by column).
+    """
+    def __init__(self, route_id: str, stops: np.ndarray, departures: np.ndarray, arrivals: np.ndarray):
+        self.route_id = route_id
+        self.stops = stops
+        self.num_trips, self.num_stops = departures.shape
+        self.departures = departures
+        # Extra all-inf row: "no trip boarded yet"
+        self.arrivals = np.vstack([arrivals, np.full((1, self.num_stops), np.inf)])
+        positions = np.arange(self.num_stops)
+        self.position_shift = (positions * _SPAN)[:, None]
+        self.trip_shift = (positions * self.num_trips)[:, None]
+        self.departure_keys = (departures + positions * _SPAN).T.ravel()
+        self.has_loop = len(np.unique(stops)) < len(stops)
+
+    def earliest_trips(self, ready: np.ndarray, first: int = 0) -> np.ndarray:
+        """
+        (positions x origins) index of the first trip leaving positions first.. at or after
+        the ready times (num_trips: none).
+        """
+        keys = np.minimum(ready, _SPAN - 1) + self.position_shift[first:]
+        return np.searchsorted(self.departure_keys, keys, side="left") - self.trip_shift[first:]
+
+class Timetable:
+    """
+    Routes, stops and walking transfers of a transit schedule in the arrays RAPTOR scans.
+    Stops are renumbered 0..num_stops-1 (stop_codes maps back to the shared ID dictionary);
+    transfers are all stop pairs within transfer_radius, found with the stop KD-tree.
+    """
+    def __init__(self, routes: List[TimetableRoute], stop_codes: np.ndarray, stop_xy: np.ndarray,
+                 transfer_radius: float = DEFAULT_TRANSFER_RADIUS):
+        self.routes = routes
+        self.stop_codes = stop_codes
+        self.stop_xy = stop_xy
+        self.transfer_radius = transfer_radius
+
+        # Stop -> routes calling there (flat entry per route stop)
+        self.entry_stops = np.concatenate([r.stops for r in routes]) if routes else np.zeros(0, dtype=np.int64)
+        self.entry_routes = np.repeat(np.arange(len(routes)), [r.num_stops for r in routes])
+
+        self.transfer_from, self.transfer_to, self.transfer_time = self._build_transfers()
+
+    @property
+    def num_stops(self) -> int:
+        return len(self.stop_codes)
+
+    @classmethod
+    def from_schedule(cls, schedule: TransitScheduleData, modes: Optional[Sequence[str]] = None,
+                      transfer_radius: float = DEFAULT_TRANSFER_RADIUS) -> "Timetable":
+        """Timetable of the routes with departures (of the given transport modes, default all)."""
+        index = schedule.get_route_stop_index()
+        used = [r for r in schedule.routes_list
+                if len(r.stops) >= 2 and r.departures and (modes is None or r.transport_mode in modes)]
+        stop_codes = np.unique(np.concatenate([[rs.stop_code for rs in r.stops] for r in used])) if used \
+            else np.zeros(0, dtype=np.int64)
+        local = np.full(len(index.stop_x), -1, dtype=np.int64)
+        local[stop_codes] = np.arange(len(stop_codes))
+        stop_xy = np.column_stack([index.stop_x[stop_codes], index.stop_y[stop_codes]])
+
+        routes = []
+        for route in used:
+            arrival = np.array([parse_schedule_time(rs.arrival_offset) for rs in route.stops])
+            departure = np.array([parse_schedule_time(rs.departure_offset) for rs in route.stops])
+            # A stop gives either offset: the other one is the same
+            arrival = np.where(np.isnan(arrival), departure, arrival)
+            departure = np.where(np.isnan(departure), arrival, departure)
+            starts = np.sort(parse_schedule_times([d.departure_time for d in route.departures]))
+            starts = starts[~np.isnan(starts)]
+            if np.isnan(arrival).any() or len(starts) == 0:
+                print(f"Warning: Route {route.route_id} has incomplete offsets or departures, skipped.")
+                continue
+            stops = local[[rs.stop_code for rs in route.stops]]
+            routes.append(TimetableRoute(route.route_id, stops, starts[:, None] + departure[None, :],
+                                         starts[:, None] + arrival[None, :]))
+        timetable = cls(routes, stop_codes, stop_xy, transfer_radius)
+        print(f"Timetable: {len(routes)} routes, {sum(r.num_trips for r in routes)} trips, "
+              f"{timetable.num_stops} stops, {len(timetable.transfer_from)} walking transfers.")
+        return timetable
+
+    def _build_transfers(self):
+        """Both directions of every stop pair within transfer_radius, with walking times."""
+        if self.num_stops < 2:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        from scipy.spatial import cKDTree
+        pairs = cKDTree(self.stop_xy).query_pairs(self.transfer_radius, output_type="ndarray")
+        source = np.concatenate([pairs[:, 0], pairs[:, 1]]).astype(np.int64)
+        target = np.concatenate([pairs[:, 1], pairs[:, 0]]).astype(np.int64)
+        distance = np.hypot(*(self.stop_xy[source] - self.stop_xy[target]).T)
+        return source, target, walk_time(distance)
+
+class RaptorRouter:
+    """
+    Round-based public transit routing (RAPTOR, Delling, Pajor, Werneck 2012) over a
+    Timetable, for a batch of origins at once. Labels are (stops x origins) earliest
+    arrival times; round k scans every route with a stop improved in round k-1 and
+    relaxes the walking transfers of the stops it improved, so after k rounds the labels
+    are the earliest arrivals with at most k vehicle trips.
+
+    Each route is scanned for the whole batch with NumPy: the earliest catchable trip per
+    stop position (searchsorted), the trip carried along the route (running minimum over
+    the earlier positions) and its arrival times at every later position.
+    """
+    def __init__(self, timetable: Timetable, max_rounds: int = DEFAULT_MAX_ROUNDS,
+                 max_travel_time: Optional[float] = None):
+        self.timetable = timetable
+        self.max_rounds = max_rounds
+        self.max_travel_time = max_travel_time # seconds; later arrivals are pruned
+
+    def earliest_arrivals(self, initial: np.ndarray, departure_times) -> np.ndarray:
+        """
+        Earliest arrival time at every stop (stops x origins). initial holds the time each
+        origin reaches each stop without a vehicle (its departure time plus access walk,
+        inf if not reachable); departure_times is the departure time per origin.
+        """
+        tt = self.timetable
+        best = np.array(initial, dtype=np.float64)
+        limit = np.asarray(departure_times, dtype=np.float64) + (
+            self.max_travel_time if self.max_travel_time is not None else math.inf)
+        best[best > limit] = np.inf
+        # Round 1 boards at the origin/access stops and at the stops walked to from them
+        marked = np.isfinite(best) | self._relax_transfers(best, np.isfinite(best), limit)
+
+        for _ in range(self.max_rounds):
+            marked_stops = marked.any(axis=1)
+            if not marked_stops.any():
+                break
+            previous = best.copy()
+            for row in np.unique(tt.entry_routes[marked_stops[tt.entry_stops]]).tolist():
+                self._scan_route(tt.routes[row], previous, best, marked_stops, limit)
+            improved = best < previous
+            marked = improved | self._relax_transfers(best, improved, limit)
+        return best
+
+    @staticmethod
+    def _scan_route(route: TimetableRoute, previous: np.ndarray, best: np.ndarray,
+                    marked_stops: np.ndarray, limit: np.ndarray):
+        # Nothing to board before the first marked position
+        first = int(np.argmax(marked_stops[route.stops]))
+        stops = route.stops[first:]
+        trips = route.earliest_trips(previous[stops], first)
+        # Trip on board at each position: the earliest one boarded at an earlier position
+        on_board = np.empty_like(trips)
+        on_board[0] = route.num_trips
+        np.minimum.accumulate(trips[:-1], axis=0, out=on_board[1:])
+        arrivals = route.arrivals[on_board, np.arange(first, route.num_stops)[:, None]]
+        arrivals[arrivals > limit] = np.inf
+        if route.has_loop:
+            np.minimum.at(best, stops, arrivals)
+        else:
+            best[stops] = np.minimum(best[stops], arrivals)
+
+    def _relax_transfers(self, best: np.ndarray, improved: np.ndarray, limit: np.ndarray) -> np.ndarray:
+        """Walks from the improved labels to the nearby stops; returns the labels it improved."""
+        tt = self.timetable
+        changed = np.zeros_like(improved)
+        edges = np.flatnonzero(improved.any(axis=1)[tt.transfer_from])
+        if len(edges) == 0:
+            return changed
+        source, target = tt.transfer_from[edges], tt.transfer_to[edges]
+        walked = np.where(improved[source], best[source] + tt.transfer_time[edges][:, None], np.inf)
+        walked[walked > limit] = np.inf
+        targets = np.unique(target)
+        before = best[targets]
+        np.minimum.at(best, target, walked)
+        changed[targets] = best[targets] < before
+        return changed
+
+    def from_stops(self, origin_stops, departure_time: float) -> np.ndarray:
+        """Travel times (s) from each origin stop (local index) to every stop: (stops x origins)."""
+        origin_stops = np.asarray(origin_stops, dtype=np.int64)
+        initial = np.full((self.timetable.num_stops, len(origin_stops)), np.inf)
+        initial[origin_stops, np.arange(len(origin_stops))] = departure_time
+        return self.earliest_arrivals(initial, np.full(len(origin_stops), departure_time)) - departure_time
@@ -1,7 +1,13 @@
 import xml.etree.ElementTree as ET
 import os
-from typing import List, Optional, Dict
-from src.utils.file_utils import save_csv_from_list
+import math
+from itertools import chain
+from typing import List, Optional, Dict, Sequence
+import numpy as np
+import pandas as pd
+from src.utils.file_utils import save_csv_from_list, save_csv_from_columns
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY, UNKNOWN_CODE
+from src.utils.metrics_utils import track_stage, record_stage, file_size
 
 class Stop:
     def __init__(self, id: str, x: float, y: float, link_ref_id: str, name: Optional[str] = None):
@@ -21,6 +27,8 @@ class RouteStop:
         self.departure_offset: Optional[str] = departure_offset
         self.arrival_offset: Optional[str] = arrival_offset
         self.await_departure: Optional[str] = await_departure
+        # Integer code of stop_ref_id in the shared ID dictionary (set while parsing)
+        self.stop_code: int = -1
 
 class RouteLink:
     def __init__(self, route_id: str, sequence_id: int, link_ref_id: str):
@@ -28,6 +36,14 @@ class RouteLink:
         self.sequence_id: int = sequence_id
         self.link_ref_id: str = link_ref_id
 
+class TransitDeparture:
+    def __init__(self, route_id: str, departure_id: str, departure_time: Optional[str] = None,
+                 vehicle_ref_id: Optional[str] = None):
+        self.route_id: str = route_id
+        self.departure_id: str = departure_id
+        self.departure_time: Optional[str] = departure_time
+        self.vehicle_ref_id: Optional[str] = vehicle_ref_id
+
 class TransitRoute:
     def __init__(self, id: str, transport_mode: str, line_id: str):
         self.route_id: str = id
@@ -35,17 +51,188 @@ class TransitRoute:
         self.line_id: str = line_id
         self.stops: List[RouteStop] = []
         self.links: List[RouteLink] = []
+        self.departures: List[TransitDeparture] = []
+
+def parse_schedule_time(value: Optional[str]) -> float:
+    """Seconds from a schedule time or offset ('HH:MM:SS', hours may pass 24); NaN if missing."""
+    if not value:
+        return math.nan
+    seconds = 0.0
+    for part in value.split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def parse_schedule_times(values: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    parse_schedule_time over many values. When all are 'HH:MM:SS' (the usual case) they are
+    decoded as one (N x 8) byte array instead of one Python call per value.
+    """
+    values = list(values)
+    if values and all(isinstance(v, str) and len(v) == 8 for v in values):
+        chars = np.frombuffer("".join(values).encode("ascii", "replace"), dtype=np.uint8).reshape(-1, 8)
+        if (chars[:, 2] == ord(':')).all() and (chars[:, 5] == ord(':')).all():
+            digits = chars.astype(np.int64) - ord('0')
+            return ((digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 3] * 10 + digits[:, 4]) * 60
+                    + digits[:, 6] * 10 + digits[:, 7]).astype(np.float64)
+    return np.array([parse_schedule_time(v) for v in values], dtype=np.float64)
+
+def _csr_offsets(lengths: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+class RouteStopIndex:
+    """
+    Compact CSR layout of the schedule, built once: route row -> slice of its stop codes
+    (route_offsets / route_stop_codes, in stop sequence order) and the inverse stop code ->
+    slice of the route rows serving it (stop_offsets / stop_route_rows). Inter-stop distances
+    (straight line between consecutive stops, 0 at the first stop) and the cumulative
+    distance along each route are precomputed as flat arrays aligned with route_stop_codes,
+    so "stops of route R", "routes at stop X" or "stop spacing along R" are array slices.
+    """
+    def __init__(self, id_dictionary: Optional[IdDictionary] = None):
+        self.ids = id_dictionary or ID_DICTIONARY
+        self.route_ids: List[str] = []
+        self.line_ids: List[str] = []
+        self.transport_modes: List[str] = []
+        self._row_of_route: Dict[str, int] = {}
+        self.route_offsets = np.zeros(1, dtype=np.int64)
+        self.route_stop_codes = np.zeros(0, dtype=np.int32)
+        self.route_link_offsets = np.zeros(1, dtype=np.int64)
+        self.route_link_codes = np.zeros(0, dtype=np.int32)
+        self.stop_offsets = np.zeros(1, dtype=np.int64)
+        self.stop_route_rows = np.zeros(0, dtype=np.int32)
+        self.stop_x = np.zeros(0, dtype=np.float64)
+        self.stop_y = np.zeros(0, dtype=np.float64)
+        self.stop_spacing = np.zeros(0, dtype=np.float64)
+        self.cumulative_distance = np.zeros(0, dtype=np.float64)
+
+    @classmethod
+    def from_schedule(cls, schedule: "TransitScheduleData") -> "RouteStopIndex":
+        index = cls(schedule.ids)
+        ids = index.ids
+        routes = schedule.routes_list
+        index.route_ids = [r.route_id for r in routes]
+        index.line_ids = [r.line_id for r in routes]
+        index.transport_modes = [r.transport_mode for r in routes]
+        index._row_of_route = {route_id: row for row, route_id in enumerate(index.route_ids)}
+
+        # Route -> stops / links (CSR)
+        index.route_offsets = _csr_offsets(np.fromiter((len(r.stops) for r in routes), dtype=np.int64, count=len(routes)))
+        index.route_stop_codes = np.fromiter((rs.stop_code for rs in chain.from_iterable(r.stops for r in routes)),
+                                             dtype=np.int32, count=int(index.route_offsets[-1]))
+        index.route_link_offsets = _csr_offsets(np.fromiter((len(r.links) for r in routes), dtype=np.int64, count=len(routes)))
+        index.route_link_codes = ids.link.encode_many(rl.link_ref_id for rl in chain.from_iterable(r.links for r in routes))
+
+        # Stop coordinates by stop code (NaN for stops without a facility)
+        n_stops = len(ids.stop)
+        index.stop_x = np.full(n_stops, np.nan)
+        index.stop_y = np.full(n_stops, np.nan)
+        stop_codes = ids.stop.encode_many(s.stop_id for s in schedule.stops_list)
+        index.stop_x[stop_codes] = [s.x for s in schedule.stops_list]
+        index.stop_y[stop_codes] = [s.y for s in schedule.stops_list]
+
+        index._build_inverse(n_stops)
+        index._build_distances()
+        return index
+
+    def _build_inverse(self, n_stops: int):
+        """Stop code -> route rows: the route row of every route stop, grouped by stop code."""
+        lengths = np.diff(self.route_offsets)
+        row_of_entry = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+        order = np.argsort(self.route_stop_codes, kind="stable")
+        self.stop_offsets = _csr_offsets(np.bincount(self.route_stop_codes, minlength=n_stops))
+        self.stop_route_rows = row_of_entry[order]
+
+    def _build_distances(self):
+        """Straight-line spacing between consecutive stops and cumulative distance per route."""
+        codes = self.route_stop_codes
+        spacing = np.zeros(len(codes), dtype=np.float64)
+        if len(codes) > 1:
+            spacing[1:] = np.hypot(np.diff(self.stop_x[codes]), np.diff(self.stop_y[codes]))
+        starts = self.route_offsets[:-1]
+        # The first stop of each route has no predecessor on that route
+        spacing[starts[starts < len(codes)]] = 0.0
+        self.stop_spacing = np.nan_to_num(spacing)
+        cumulative = np.cumsum(self.stop_spacing)
+        base = np.concatenate(([0.0], cumulative))[starts]
+        self.cumulative_distance = cumulative - np.repeat(base, np.diff(self.route_offsets))
+
+    @property
+    def num_routes(self) -> int:
+        return len(self.route_ids)
+
+    def route_row(self, route_id: str) -> int:
+        return self._row_of_route.get(route_id, UNKNOWN_CODE)
+
+    def _route_slice(self, route_id: str) -> slice:
+        row = self.route_row(route_id)
+        if row < 0:
+            return slice(0, 0)
+        return slice(int(self.route_offsets[row]), int(self.route_offsets[row + 1]))
+
+    def stops_of_route(self, route_id: str) -> np.ndarray:
+        """Stop codes of the route in sequence order."""
+        return self.route_stop_codes[self._route_slice(route_id)]
+
+    def stop_spacing_of_route(self, route_id: str) -> np.ndarray:
+        return self.stop_spacing[self._route_slice(route_id)]
+
+    def cumulative_distance_of_route(self, route_id: str) -> np.ndarray:
+        return self.cumulative_distance[self._route_slice(route_id)]
+
+    def route_lengths(self) -> np.ndarray:
+        """First to last stop distance (sum of the stop spacings) per route row."""
+        return np.add.reduceat(np.append(self.stop_spacing, 0.0), self.route_offsets[:-1]) * (np.diff(self.route_offsets) > 0)
+
+    def network_route_lengths(self, link_lengths: np.ndarray) -> np.ndarray:
+        """Length of each route's network path, link_lengths indexed by link code (0 for unknown links)."""
+        lengths = np.zeros(len(self.route_link_codes), dtype=np.float64)
+        known = self.route_link_codes < len(link_lengths)
+        lengths[known] = link_lengths[self.route_link_codes[known]]
+        rows = np.repeat(np.arange(self.num_routes), np.diff(self.route_link_offsets))
+        return np.bincount(rows, weights=lengths, minlength=self.num_routes)
+
+    def route_rows_at_stop(self, stop_id: str) -> np.ndarray:
+        """Route rows serving the stop (a row repeats if the route calls at the stop twice)."""
+        code = self.ids.stop.lookup(stop_id)
+        if code < 0 or code + 1 >= len(self.stop_offsets):
+            return self.stop_route_rows[0:0]
+        return self.stop_route_rows[self.stop_offsets[code]:self.stop_offsets[code + 1]]
+
+    def routes_at_stop(self, stop_id: str) -> List[str]:
+        return [self.route_ids[row] for row in np.unique(self.route_rows_at_stop(stop_id)).tolist()]
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """One row per route stop: route, sequence, stop, spacing to the previous stop and distance from the first."""
+        lengths = np.diff(self.route_offsets)
+        rows = np.repeat(np.arange(self.num_routes), lengths)
+        return pd.DataFrame({
+            "route_id": np.asarray(self.route_ids, dtype=object)[rows] if len(rows) else [],
+            "sequence_id": np.arange(len(rows)) - np.repeat(self.route_offsets[:-1], lengths),
+            "stop_id": self.ids.stop.decode_array(self.route_stop_codes),
+            "spacing": self.stop_spacing,
+            "cumulative_distance": self.cumulative_distance
+        })
+
+    def save_route_stop_distances_to_csv(self, output_path: str):
+        print(f"Saving route stop distances to: {output_path}")
+        df = self.get_dataframe()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
 
 class TransitScheduleData:
-    def __init__(self, schedule_path: str):
+    def __init__(self, schedule_path: str, id_dictionary: Optional[IdDictionary] = None):
         self.schedule_path: str = schedule_path
+        self.ids = id_dictionary or ID_DICTIONARY
         self.stops_list: List[Stop] = []
         self.routes_list: List[TransitRoute] = [] # Stores route metadata
         
         # Flattened lists for CSV export
         self.flat_route_stops: List[RouteStop] = []
         self.flat_route_links: List[RouteLink] = []
+        self.flat_departures: List[TransitDeparture] = []
 
+    @track_stage("schedule.process")
     def process(self):
         if not os.path.exists(self.schedule_path):
             raise FileNotFoundError(f"Transit schedule file not found at: {self.schedule_path}")
@@ -64,6 +251,7 @@ class TransitScheduleData:
             # but findall with wildcard namespace is safer if structure is known
             for elem in root.iter():
                 if get_tag_name(elem) == 'stopFacility':
+                    self.ids.stop.encode(elem.get('id'))
                     self.stops_list.append(Stop(
                         id=elem.get('id'),
                         x=float(elem.get('x')),
@@ -83,6 +271,7 @@ class TransitScheduleData:
                     for route in line.iter():
                         if get_tag_name(route) == 'transitRoute':
                             route_id = route.get('id')
+                            self.ids.route.encode(route_id)
                             
                             # Find transport mode
                             transport_mode = "unknown"
@@ -108,6 +297,7 @@ class TransitScheduleData:
                                                 arrival_offset=stop.get('arrivalOffset'),
                                                 await_departure=stop.get('awaitDeparture')
                                             )
+                                            r_stop.stop_code = self.ids.stop.encode(r_stop.stop_ref_id)
                                             transit_route.stops.append(r_stop)
                                             self.flat_route_stops.append(r_stop)
                                             seq += 1
@@ -129,12 +319,33 @@ class TransitScheduleData:
                                             seq += 1
                                     break
 
-            print(f"Extracted {len(self.routes_list)} routes.")
+                            # Departures (trips of the route)
+                            for child in route:
+                                if get_tag_name(child) == 'departures':
+                                    for dep in child:
+                                        if get_tag_name(dep) == 'departure':
+                                            departure = TransitDeparture(
+                                                route_id=route_id,
+                                                departure_id=dep.get('id'),
+                                                departure_time=dep.get('departureTime'),
+                                                vehicle_ref_id=dep.get('vehicleRefId')
+                                            )
+                                            transit_route.departures.append(departure)
+                                            self.flat_departures.append(departure)
+                                    break
+
+            print(f"Extracted {len(self.routes_list)} routes with {len(self.flat_departures)} departures.")
+            record_stage(records_out=len(self.stops_list) + len(self.flat_route_stops) + len(self.flat_route_links),
+                         bytes_read=file_size(self.schedule_path))
             
         except Exception as e:
             print(f"Error processing transit schedule: {e}")
             raise
 
+    def get_route_stop_index(self) -> RouteStopIndex:
+        """CSR route/stop index of the parsed schedule (see RouteStopIndex)."""
+        return RouteStopIndex.from_schedule(self)
+
     def save_stops_to_csv(self, output_path: str):
         print(f"Saving stops to: {output_path}")
         save_csv_from_list(self.stops_list, output_path)
@@ -156,8 +367,14 @@ class TransitScheduleData:
 
     def save_route_stops_to_csv(self, output_path: str):
         print(f"Saving route stops to: {output_path}")
-        save_csv_from_list(self.flat_route_stops, output_path)
+        # Codes are run specific, the CSV keeps the string IDs only
+        data = [{k: v for k, v in rs.__dict__.items() if k != 'stop_code'} for rs in self.flat_route_stops]
+        save_csv_from_list(data, output_path)
 
     def save_route_links_to_csv(self, output_path: str):
         print(f"Saving route links to: {output_path}")
         save_csv_from_list(self.flat_route_links, output_path)
+
+    def save_departures_to_csv(self, output_path: str):
+        print(f"Saving departures to: {output_path}")
+        save_csv_from_list(self.flat_departures, output_path)
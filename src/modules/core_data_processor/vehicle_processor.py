@@ -1,40 +1,210 @@
-
 import xml.etree.ElementTree as ET
 import json
 import os
 import logging
-from typing import List
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Dict
 from src.utils.file_utils import save_csv_from_list
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY, UNKNOWN_CODE
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+
+# Default file name of the vehicle types table, saved next to vehicles.csv
+VEHICLE_TYPES_CSV = "vehicle_types.csv"
+
+def is_bus_type(type_id: str, mode: Optional[str]) -> bool:
+    """
+    A vehicle type is a bus if its network mode is 'bus' or its id contains 'bus'
+    (MATSim transit buses usually run on the 'car' network mode).
+    """
+    return (mode or "").lower() == "bus" or "bus" in (type_id or "").lower()
 
 class Vehicle:
     def __init__(self, id: str, type_id: str):
         self.id: str = id
         self.type_id: str = type_id
 
+class VehicleType:
+    def __init__(self, id: str, mode: Optional[str] = None, seats: int = 0, standing_room: int = 0):
+        self.id: str = id
+        self.mode: Optional[str] = mode
+        self.seats: int = seats
+        self.standing_room: int = standing_room
+        self.capacity: int = seats + standing_room
+        self.is_bus: bool = is_bus_type(id, mode)
+
+def _tag_name(element) -> str:
+    return element.tag.split('}')[-1] if '}' in element.tag else element.tag
+
+def _persons(value: Optional[str]) -> int:
+    try:
+        return int(float(value)) if value is not None else 0
+    except ValueError:
+        return 0
+
+def _parse_vehicle_type(elem) -> VehicleType:
+    """Parses a <vehicleType> of the v1 (nested capacity elements) or v2 (attributes) format."""
+    mode = None
+    seats = 0
+    standing = 0
+    for child in elem:
+        tag = _tag_name(child)
+        if tag == 'capacity':
+            # v2: <capacity seats="40" standingRoomInPersons="30"/>
+            seats = _persons(child.get('seats'))
+            standing = _persons(child.get('standingRoomInPersons'))
+            # v1: <capacity><seats persons="40"/><standingRoom persons="30"/></capacity>
+            for cap in child:
+                cap_tag = _tag_name(cap)
+                if cap_tag == 'seats':
+                    seats = _persons(cap.get('persons'))
+                elif cap_tag == 'standingRoom':
+                    standing = _persons(cap.get('persons'))
+        elif tag == 'networkMode':
+            mode = child.get('networkMode')
+    return VehicleType(elem.get('id'), mode, seats, standing)
+
+class VehicleTypeIndex:
+    """
+    Precomputed vehicle classification indexed by vehicle code (see IdDictionary):
+    vehicle code -> type code, a bus bitmap and the capacity per vehicle. Event handlers
+    check a vehicle with an array index instead of string matching or dict lookups.
+    """
+    def __init__(self, id_dictionary: Optional[IdDictionary] = None):
+        self.ids = id_dictionary or ID_DICTIONARY
+        self.vehicle_type_codes: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.is_bus: np.ndarray = np.zeros(0, dtype=np.bool_)
+        self.capacity: np.ndarray = np.zeros(0, dtype=np.int32)
+        # Python-level copies for per-event scalar access (faster than NumPy scalar indexing)
+        self.type_code_list: List[int] = []
+        self.bus_flags: bytearray = bytearray()
+
+    def build(self, vehicle_ids, type_ids, vehicle_types: Optional[List[VehicleType]] = None) -> "VehicleTypeIndex":
+        types_by_id: Dict[str, VehicleType] = {t.id: t for t in (vehicle_types or [])}
+        unknown = self.ids.vehicle_type.encode("unknown")
+        veh_codes = self.ids.vehicle.encode_many(vehicle_ids)
+        type_ids = ["unknown" if pd.isna(t) else str(t) for t in type_ids]
+        type_codes = self.ids.vehicle_type.encode_many(type_ids)
+
+        # Per type code attributes
+        n_types = len(self.ids.vehicle_type)
+        type_is_bus = np.zeros(n_types, dtype=np.bool_)
+        type_capacity = np.zeros(n_types, dtype=np.int32)
+        for type_id, type_code in zip(type_ids, type_codes.tolist()):
+            vt = types_by_id.get(type_id)
+            type_is_bus[type_code] = vt.is_bus if vt else is_bus_type(type_id, None)
+            type_capacity[type_code] = vt.capacity if vt else 0
+
+        n = int(veh_codes.max()) + 1 if len(veh_codes) else 0
+        self.vehicle_type_codes = np.full(n, unknown, dtype=np.int32)
+        self.vehicle_type_codes[veh_codes] = type_codes
+        known = np.zeros(n, dtype=np.bool_)
+        known[veh_codes] = True
+        self.is_bus = type_is_bus[self.vehicle_type_codes] & known
+        self.capacity = np.where(known, type_capacity[self.vehicle_type_codes], 0).astype(np.int32)
+
+        self.type_code_list = self.vehicle_type_codes.tolist()
+        self.bus_flags = bytearray(self.is_bus.astype(np.uint8).tobytes())
+        return self
+
+    @classmethod
+    def from_vehicle_data(cls, vehicle_data: "VehicleData") -> "VehicleTypeIndex":
+        return cls(vehicle_data.ids).build(
+            [v.id for v in vehicle_data.vehicle_list],
+            [v.type_id for v in vehicle_data.vehicle_list],
+            vehicle_data.vehicle_types
+        )
+
+    @classmethod
+    def from_csv(cls, vehicles_csv_path: str, vehicle_types_csv_path: Optional[str] = None,
+                 id_dictionary: Optional[IdDictionary] = None) -> "VehicleTypeIndex":
+        """
+        Builds the index from vehicles.csv and (if available) vehicle_types.csv. Without the
+        types table, bus-ness falls back to the type id containing 'bus'.
+        """
+        index = cls(id_dictionary)
+        if not os.path.exists(vehicles_csv_path):
+            print(f"Warning: Vehicle file not found at {vehicles_csv_path}. Vehicle types will be empty.")
+            return index
+
+        df = pd.read_csv(vehicles_csv_path, dtype=str)
+        if 'id' in df.columns and 'type_id' in df.columns:
+            veh_ids, type_ids = df['id'], df['type_id']
+        elif df.shape[1] >= 2:
+            print(f"Warning: Columns 'id' and 'type_id' not found in {vehicles_csv_path}. Using first two columns.")
+            veh_ids, type_ids = df.iloc[:, 0], df.iloc[:, 1]
+        else:
+            return index
+
+        if vehicle_types_csv_path is None:
+            vehicle_types_csv_path = os.path.join(os.path.dirname(vehicles_csv_path), VEHICLE_TYPES_CSV)
+        vehicle_types = load_vehicle_types_csv(vehicle_types_csv_path) if os.path.exists(vehicle_types_csv_path) else []
+        return index.build(veh_ids.tolist(), type_ids.tolist(), vehicle_types)
+
+    def type_code(self, vehicle_code: int) -> int:
+        return self.type_code_list[vehicle_code] if 0 <= vehicle_code < len(self.type_code_list) else -1
+
+    def is_bus_vehicle(self, vehicle_code: int) -> bool:
+        return 0 <= vehicle_code < len(self.bus_flags) and bool(self.bus_flags[vehicle_code])
+
+    def bus_code(self, vehicle_id: str) -> int:
+        """Vehicle code if vehicle_id is a known bus, else UNKNOWN_CODE (event handler hot path)."""
+        code = self.ids.vehicle.lookup(vehicle_id)
+        if 0 <= code < len(self.bus_flags) and self.bus_flags[code]:
+            return code
+        return UNKNOWN_CODE
+
+    @property
+    def num_bus_vehicles(self) -> int:
+        return int(self.is_bus.sum())
+
+def load_vehicle_types_csv(path: str) -> List[VehicleType]:
+    df = pd.read_csv(path, dtype={"id": str, "mode": str})
+    types = []
+    for row in df.itertuples(index=False):
+        mode = None if pd.isna(row.mode) else row.mode
+        types.append(VehicleType(row.id, mode, int(row.seats), int(row.standing_room)))
+    return types
+
 class VehicleData:
-    def __init__(self, vehicle_path: str):
+    def __init__(self, vehicle_path: str, id_dictionary: Optional[IdDictionary] = None):
         self.vehicle_path = vehicle_path
+        self.ids = id_dictionary or ID_DICTIONARY
         self.vehicle_list: List[Vehicle] = []
+        self.vehicle_types: List[VehicleType] = []
 
+    @track_stage("vehicles.process")
     def process(self):
         tree = ET.parse(self.vehicle_path)
         root = tree.getroot()
-        
+
         # Handle namespaces by inspecting the tag name
         # MATSim XML files usually have namespaces, causing findall('vehicle') to fail
         for child in root:
             # Extract tag name without namespace (e.g., {url}vehicle -> vehicle)
             tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-            
+
             if tag == 'vehicle':
                 veh_id = child.get('id')
                 veh_type_id = child.get('type')
+                self.ids.vehicle.encode(veh_id)
+                self.ids.vehicle_type.encode(veh_type_id)
                 self.vehicle_list.append(Vehicle(veh_id, veh_type_id))
-            
-        # Save Outputs
-        
-    
+            elif tag == 'vehicleType':
+                vehicle_type = _parse_vehicle_type(child)
+                self.ids.vehicle_type.encode(vehicle_type.id)
+                self.vehicle_types.append(vehicle_type)
+
+        print(f"Extracted {len(self.vehicle_list)} vehicles and {len(self.vehicle_types)} vehicle types.")
+        record_stage(records_out=len(self.vehicle_list) + len(self.vehicle_types), bytes_read=file_size(self.vehicle_path))
+
+    def get_type_index(self) -> VehicleTypeIndex:
+        return VehicleTypeIndex.from_vehicle_data(self)
+
     def save_vehicles_to_csv(self, vehicles_csv_path: str):
         print(f"Saving processed vehicles to: {vehicles_csv_path}")
         save_csv_from_list(self.vehicle_list, vehicles_csv_path)
 
+    def save_vehicle_types_to_csv(self, vehicle_types_csv_path: str):
+        print(f"Saving vehicle types to: {vehicle_types_csv_path}")
+        save_csv_from_list(self.vehicle_types, vehicle_types_csv_path)
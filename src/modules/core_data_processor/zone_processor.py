@@ -0,0 +1,94 @@
+import numpy as np
+from typing import List, Dict, Any
+from src.utils.file_utils import save_json
+
+class Zone:
+    def __init__(self, zone_id: int, row: int, col: int, min_x: float, min_y: float, max_x: float, max_y: float):
+        self.zone_id: int = zone_id
+        self.row: int = row
+        self.col: int = col
+        self.min_x: float = min_x
+        self.min_y: float = min_y
+        self.max_x: float = max_x
+        self.max_y: float = max_y
+
+class ZoneGrid:
+    """
+    Regular rows x cols grid over a bounding box (config: data.matsim.static_input.grid).
+    Zone ids are row-major: zone_id = row * cols + col, row 0 at min_y.
+    """
+    def __init__(self, rows: int, cols: int, min_x: float, min_y: float, max_x: float, max_y: float):
+        if rows <= 0 or cols <= 0:
+            raise ValueError(f"Grid must have at least one row and column, got {rows}x{cols}")
+        self.rows = int(rows)
+        self.cols = int(cols)
+        self.min_x = float(min_x)
+        self.min_y = float(min_y)
+        # Avoid zero-sized cells for degenerate bounds
+        self.max_x = float(max_x) if max_x > min_x else float(min_x) + 1.0
+        self.max_y = float(max_y) if max_y > min_y else float(min_y) + 1.0
+        self.cell_width = (self.max_x - self.min_x) / self.cols
+        self.cell_height = (self.max_y - self.min_y) / self.rows
+
+    @classmethod
+    def from_points(cls, xs, ys, rows: int, cols: int) -> "ZoneGrid":
+        """Builds a grid covering all given coordinates (e.g. network nodes)."""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        valid = ~(np.isnan(xs) | np.isnan(ys))
+        if not valid.any():
+            raise ValueError("Cannot build a zone grid without valid coordinates")
+        return cls(rows, cols, xs[valid].min(), ys[valid].min(), xs[valid].max(), ys[valid].max())
+
+    @property
+    def num_zones(self) -> int:
+        return self.rows * self.cols
+
+    def zone_index(self, xs, ys) -> np.ndarray:
+        """Maps coordinates to zone ids (vectorized). Points outside the grid get -1."""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            col = np.floor((xs - self.min_x) / self.cell_width)
+            row = np.floor((ys - self.min_y) / self.cell_height)
+            # Points on the max edge belong to the last row/col
+            col = np.where(xs == self.max_x, self.cols - 1, col)
+            row = np.where(ys == self.max_y, self.rows - 1, row)
+            inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        zone = np.full(xs.shape, -1, dtype=np.int64)
+        zone[inside] = row[inside].astype(np.int64) * self.cols + col[inside].astype(np.int64)
+        return zone
+
+    def zone_centroids(self) -> np.ndarray:
+        """Returns a (num_zones, 2) array of zone centre coordinates."""
+        zone_ids = np.arange(self.num_zones)
+        cx = self.min_x + (zone_ids % self.cols + 0.5) * self.cell_width
+        cy = self.min_y + (zone_ids // self.cols + 0.5) * self.cell_height
+        return np.column_stack([cx, cy])
+
+    def get_zones(self) -> List[Zone]:
+        zones = []
+        for zone_id in range(self.num_zones):
+            row, col = divmod(zone_id, self.cols)
+            zones.append(Zone(
+                zone_id=zone_id,
+                row=row,
+                col=col,
+                min_x=self.min_x + col * self.cell_width,
+                min_y=self.min_y + row * self.cell_height,
+                max_x=self.min_x + (col + 1) * self.cell_width,
+                max_y=self.min_y + (row + 1) * self.cell_height
+            ))
+        return zones
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "cols": self.cols,
+            "bounds": [self.min_x, self.min_y, self.max_x, self.max_y],
+            "zones": [zone.__dict__ for zone in self.get_zones()]
+        }
+
+    def save_zones_to_json(self, output_path: str):
+        print(f"Saving {self.num_zones} zones to: {output_path}")
+        save_json(self.to_dict(), output_path)
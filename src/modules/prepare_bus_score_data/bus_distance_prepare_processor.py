@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+from src.modules.prepare_bus_score_data.events_stream import EventsStream
+from src.utils.array_utils import grow_array
+from src.utils.file_utils import save_csv_from_columns
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY
+from src.utils.metrics_utils import track_stage, record_stage
+
+# Link entries buffered before one vectorized NumPy accumulation
+BUFFER_SIZE = 1 << 16
+
+class BusDistancePrepareData:
+    """
+    Accumulates bus vehicle-km and passenger-km per route while buses enter links:
+    each 'entered link' event of a bus adds the link length (vehicle-km) and the link
+    length times the passengers on board (passenger-km).
+
+    On-board counts and the route of each vehicle come from a BusOccupancyPrepareData
+    handler running in the same events pass. Link lengths are looked up in a NumPy array
+    indexed by link code, in buffered batches: link_ids is the ID dictionary the array is
+    indexed by (the network's, NetworkData.ids; the shared ID_DICTIONARY by default).
+    """
+    # Event types routed to _process_event by EventsStream
+    event_types = ("entered link",)
+
+    def __init__(self, events_path: str, link_lengths: np.ndarray, occupancy: BusOccupancyPrepareData,
+                 buffer_size: int = BUFFER_SIZE, time_window: Optional[Tuple[float, float]] = None,
+                 link_ids: Optional[IdDictionary] = None):
+        self.events_path = events_path
+        self.time_window = time_window # (start, end) seconds; None = whole day
+        self.link_lengths = np.asarray(link_lengths, dtype=np.float64)
+        self.link_ids = link_ids or ID_DICTIONARY
+        self.occupancy = occupancy
+        self.ids = occupancy.ids # vehicle and route codes
+        self.buffer_size = buffer_size
+
+        # Accumulators indexed by route code (grown on demand)
+        self.vehicle_m = np.zeros(0, dtype=np.float64)
+        self.passenger_m = np.zeros(0, dtype=np.float64)
+        self.link_entries = 0
+
+        self._links: List[int] = []
+        self._routes: List[int] = []
+        self._onboard: List[int] = []
+
+    @track_stage("bus_distance_prepare.process")
+    def process(self):
+        """
+        Runs the occupancy handler and this accumulator in one pass over the events.
+        """
+        print(f"Processing events from: {self.events_path}")
+        stream = EventsStream(self.events_path, [self.occupancy, self], time_window=self.time_window)
+        event_count = stream.run()
+        record_stage(records_in=event_count, records_out=self.link_entries, bytes_read=stream.bytes_read)
+        print(f"Accumulated {self.link_entries} bus link entries.")
+
+    def _process_event(self, elem):
+        occupancy = self.occupancy
+        code = occupancy.vehicle_index.bus_code(elem.get("vehicle"))
+        if code < 0: return
+        self._links.append(self.link_ids.link.lookup(elem.get("link")))
+        self._routes.append(occupancy.route_code(code))
+        self._onboard.append(occupancy.passengers_onboard(code))
+        if len(self._links) >= self.buffer_size:
+            self._flush()
+
+    def finish(self):
+        self._flush()
+
+    def _flush(self):
+        if not self._links:
+            return
+        links = np.asarray(self._links, dtype=np.int64)
+        routes = np.asarray(self._routes, dtype=np.int64)
+        onboard = np.asarray(self._onboard, dtype=np.float64)
+        self._links, self._routes, self._onboard = [], [], []
+
+        # Unknown links (not in the network) and unknown routes contribute nothing
+        valid = (links >= 0) & (links < len(self.link_lengths)) & (routes >= 0)
+        links, routes, onboard = links[valid], routes[valid], onboard[valid]
+        lengths = self.link_lengths[links]
+
+        n_routes = max(len(self.ids.route), len(self.vehicle_m))
+        self.vehicle_m = grow_array(self.vehicle_m, n_routes)
+        self.passenger_m = grow_array(self.passenger_m, n_routes)
+        self.vehicle_m += np.bincount(routes, weights=lengths, minlength=n_routes)
+        self.passenger_m += np.bincount(routes, weights=lengths * onboard, minlength=n_routes)
+        self.link_entries += int(valid.sum())
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """Vehicle-km, passenger-km and average load per route."""
+        self._flush()
+        routes = np.flatnonzero(self.vehicle_m > 0)
+        vehicle_km = self.vehicle_m[routes] / 1000.0
+        passenger_km = self.passenger_m[routes] / 1000.0
+        return pd.DataFrame({
+            "routeId": self.ids.route.decode_array(routes),
+            "vehicleKm": vehicle_km,
+            "passengerKm": passenger_km,
+            "avgPassengersOnboard": passenger_km / vehicle_km
+        })
+
+    def summary(self) -> Dict[str, float]:
+        """Scenario totals over all bus routes."""
+        self._flush()
+        vehicle_km = float(self.vehicle_m.sum() / 1000.0)
+        passenger_km = float(self.passenger_m.sum() / 1000.0)
+        return {
+            "vehicle_km": vehicle_km,
+            "passenger_km": passenger_km,
+            "avg_passengers_onboard": passenger_km / vehicle_km if vehicle_km > 0 else 0.0
+        }
+
+    def save_route_distances_to_csv(self, output_path: str):
+        print(f"Saving bus route distances to: {output_path}")
+        df = self.get_dataframe()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from src.modules.core_data_processor.vehicle_processor import VehicleTypeIndex
+from src.modules.prepare_bus_score_data.events_stream import EventsStream
+from src.utils.file_utils import save_csv_from_columns
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY, UNKNOWN_CODE
+from src.utils.metrics_utils import track_stage, record_stage
+
+# Load factor bins (passengers / capacity) of the per route and hour distribution
+LOAD_FACTOR_BINS = [0.0, 0.25, 0.5, 0.75, 1.0, 1.25]
+LOAD_FACTOR_BIN_LABELS = ["lf_0_25", "lf_25_50", "lf_50_75", "lf_75_100", "lf_100_125", "lf_125_plus"]
+
+class BusOccupancyPrepareData:
+    """
+    Tracks passengers on board of every bus (array-backed counters indexed by vehicle code)
+    and records the load when the bus departs a stop (VehicleDepartsAtFacility). Combined
+    with the vehicle capacities this gives load factors per route and hour of day.
+
+    Can run alone (process) or as an extra handler of a shared EventsStream pass. Within a
+    time window, departures of buses that started their run before the window are skipped:
+    their passengers on board are unknown.
+    """
+    # Event types routed to _process_event by EventsStream
+    event_types = ("TransitDriverStarts", "PersonEntersVehicle", "PersonLeavesVehicle", "VehicleDepartsAtFacility")
+    RECORD_COLUMNS = ["vehicleCode", "routeCode", "stopCode", "departureTime", "passengers"]
+
+    def __init__(self, events_path: str, vehicle_path: str, id_dictionary: Optional[IdDictionary] = None,
+                 vehicle_types_path: Optional[str] = None, vehicle_index: Optional[VehicleTypeIndex] = None,
+                 time_window: Optional[Tuple[float, float]] = None):
+        self.events_path = events_path
+        self.time_window = time_window # (start, end) seconds; None = whole day
+        self.vehicle_path = vehicle_path
+        self.ids = id_dictionary or ID_DICTIONARY
+        self.vehicle_index = vehicle_index or VehicleTypeIndex.from_csv(vehicle_path, vehicle_types_path, self.ids)
+        self.records: Dict[str, List] = {c: [] for c in self.RECORD_COLUMNS}
+
+        n = len(self.vehicle_index.bus_flags)
+        # Per vehicle code counters (plain lists: faster than NumPy for scalar updates)
+        self._onboard: List[int] = [0] * n
+        self._route_of_vehicle: List[int] = [UNKNOWN_CODE] * n
+        print(f"Tracking occupancy of {self.vehicle_index.num_bus_vehicles} bus vehicles.")
+
+    @property
+    def onboard(self) -> np.ndarray:
+        """Current passengers on board per vehicle code."""
+        return np.asarray(self._onboard, dtype=np.int32)
+
+    @track_stage("bus_occupancy_prepare.process")
+    def process(self):
+        """
+        Extracts bus loads at every stop departure from MATSim events.
+        """
+        print(f"Processing events from: {self.events_path}")
+        stream = EventsStream(self.events_path, [self], time_window=self.time_window)
+        event_count = stream.run()
+        record_stage(records_in=event_count, records_out=len(self.records["vehicleCode"]),
+                     bytes_read=stream.bytes_read)
+        print(f"Extracted {len(self.records['vehicleCode'])} bus load records.")
+
+    def route_code(self, bus_code: int) -> int:
+        """Route code of the departure the bus currently serves (UNKNOWN_CODE if not seen yet)."""
+        return self._route_of_vehicle[bus_code]
+
+    def passengers_onboard(self, bus_code: int) -> int:
+        """Current passengers on board of the bus."""
+        return self._onboard[bus_code]
+
+    def _process_event(self, elem):
+        e_type = elem.get("type")
+
+        if e_type == "PersonEntersVehicle":
+            code = self.vehicle_index.bus_code(elem.get("vehicle"))
+            # The transit driver also enters the vehicle
+            if code >= 0 and not elem.get("person").startswith("pt_"):
+                self._onboard[code] += 1
+
+        elif e_type == "PersonLeavesVehicle":
+            code = self.vehicle_index.bus_code(elem.get("vehicle"))
+            if code >= 0 and not elem.get("person").startswith("pt_"):
+                self._onboard[code] -= 1
+
+        elif e_type == "VehicleDepartsAtFacility":
+            code = self.vehicle_index.bus_code(elem.get("vehicle"))
+            # No TransitDriverStarts seen (run started before the time window): load unknown
+            if code < 0 or self._route_of_vehicle[code] < 0: return
+            records = self.records
+            records["vehicleCode"].append(code)
+            records["routeCode"].append(self._route_of_vehicle[code])
+            records["stopCode"].append(self.ids.stop.encode(elem.get("facility")))
+            records["departureTime"].append(float(elem.get("time")))
+            records["passengers"].append(self._onboard[code])
+
+        elif e_type == "TransitDriverStarts":
+            code = self.vehicle_index.bus_code(elem.get("vehicleId"))
+            if code < 0: return
+            # A vehicle serves one departure at a time: new departure, empty bus
+            self._route_of_vehicle[code] = self.ids.route.encode(elem.get("transitRouteId"))
+            self._onboard[code] = 0
+
+    def _load_arrays(self):
+        """Returns (vehicle, route, hour, passengers, capacity, load factor) arrays of the load records."""
+        records = self.records
+        vehicle = np.asarray(records["vehicleCode"], dtype=np.int64)
+        route = np.asarray(records["routeCode"], dtype=np.int64)
+        hour = (np.asarray(records["departureTime"], dtype=np.float64) // 3600).astype(np.int64)
+        passengers = np.asarray(records["passengers"], dtype=np.float64)
+        capacity = self.vehicle_index.capacity[vehicle].astype(np.float64) if len(vehicle) else np.zeros(0)
+        # Unknown capacity (0) gives NaN load factors, excluded from the distribution
+        load_factor = np.divide(passengers, capacity, out=np.full(len(passengers), np.nan), where=capacity > 0)
+        return vehicle, route, hour, passengers, capacity, load_factor
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """Load records with string IDs, hour of day, capacity and load factor."""
+        vehicle, route, hour, passengers, capacity, load_factor = self._load_arrays()
+        return pd.DataFrame({
+            "vehicleId": self.ids.vehicle.decode_array(vehicle),
+            "routeId": self.ids.route.decode_array(route),
+            "stopId": self.ids.stop.decode_array(self.records["stopCode"]),
+            "departureTime": self.records["departureTime"],
+            "hour": hour,
+            "passengers": passengers.astype(np.int64),
+            "capacity": capacity.astype(np.int64),
+            "loadFactor": load_factor
+        })
+
+    def get_load_factor_distribution(self) -> pd.DataFrame:
+        """
+        Load factor distribution per route and hour: number of stop departures, mean/max
+        load factor and the count of departures in each LOAD_FACTOR_BINS bin.
+        """
+        _, route, hour, _, _, load_factor = self._load_arrays()
+        valid = ~np.isnan(load_factor)
+        route, hour, load_factor = route[valid], hour[valid], load_factor[valid]
+        columns = ["routeId", "hour", "departures", "meanLoadFactor", "maxLoadFactor"] + LOAD_FACTOR_BIN_LABELS
+        if len(route) == 0:
+            return pd.DataFrame(columns=columns)
+
+        # One group per (route, hour) pair, vectorized with unique/bincount
+        hours_span = int(hour.max()) + 1
+        keys = route * hours_span + hour
+        groups, group_idx = np.unique(keys, return_inverse=True)
+        n_groups = len(groups)
+        departures = np.bincount(group_idx, minlength=n_groups)
+        mean_lf = np.bincount(group_idx, weights=load_factor, minlength=n_groups) / departures
+        max_lf = np.full(n_groups, -np.inf)
+        np.maximum.at(max_lf, group_idx, load_factor)
+
+        bins = np.digitize(load_factor, LOAD_FACTOR_BINS[1:])
+        bin_counts = np.bincount(group_idx * len(LOAD_FACTOR_BIN_LABELS) + bins,
+                                 minlength=n_groups * len(LOAD_FACTOR_BIN_LABELS)).reshape(n_groups, -1)
+
+        data = {
+            "routeId": self.ids.route.decode_array(groups // hours_span),
+            "hour": groups % hours_span,
+            "departures": departures,
+            "meanLoadFactor": mean_lf,
+            "maxLoadFactor": max_lf
+        }
+        for i, label in enumerate(LOAD_FACTOR_BIN_LABELS):
+            data[label] = bin_counts[:, i]
+        return pd.DataFrame(data, columns=columns)
+
+    def summary(self) -> Dict[str, float]:
+        """Network wide crowding indicators over all bus stop departures."""
+        _, _, _, passengers, _, load_factor = self._load_arrays()
+        load_factor = load_factor[~np.isnan(load_factor)]
+        if len(load_factor) == 0:
+            return {"departures": 0, "mean_load_factor": 0.0, "p95_load_factor": 0.0, "over_capacity_percentage": 0.0}
+        return {
+            "departures": int(len(load_factor)),
+            "mean_load_factor": float(load_factor.mean()),
+            "p95_load_factor": float(np.percentile(load_factor, 95)),
+            "over_capacity_percentage": float((load_factor > 1.0).mean() * 100)
+        }
+
+    def save_loads_to_csv(self, output_path: str):
+        print(f"Saving bus loads to: {output_path}")
+        df = self.get_dataframe()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
+
+    def save_load_factor_distribution_to_csv(self, output_path: str):
+        print(f"Saving load factor distribution to: {output_path}")
+        df = self.get_load_factor_distribution()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
@@ -0,0 +1,478 @@
+import gzip
+import os
+import pickle
+import re
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+
+# Check if lxml is available for faster parsing, otherwise use standard ElementTree
+try:
+    from lxml import etree
+    USE_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as etree
+    USE_LXML = False
+
+# Bytes read from the events file per parser feed
+CHUNK_SIZE = 1 << 20
+# Time attribute of an <event> start tag, read from raw bytes while skipping to a time window
+_EVENT_TIME = re.compile(rb'<event\s[^>]*?time="([^"]*)"')
+# Replaces the skipped file header when parsing starts in the middle of the file
+_EVENTS_HEADER = b'<?xml version="1.0" encoding="utf-8"?><events>'
+# Decompressed bytes of events between two checkpoints of a checkpointed run
+CHECKPOINT_INTERVAL = 1 << 28
+_CHECKPOINT_VERSION = 1
+
+def open_events(events_path: str):
+    """Opens a plain or gzip compressed events file in binary mode."""
+    return gzip.open(events_path, "rb") if events_path.endswith('.gz') else open(events_path, "rb")
+
+def _parse_clock(value: Union[str, float, int]) -> float:
+    """Seconds from a number or a 'HH:MM[:SS]' clock time (hours may exceed 24)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = [float(p) for p in str(value).strip().split(":")]
+    if len(parts) == 1:
+        return parts[0]
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) > 2 else 0.0)
+
+def parse_time_window(value) -> Optional[Tuple[float, float]]:
+    """
+    (start, end) in seconds from '06:00-09:00', a [start, end] pair (seconds or clock
+    times) or None (whole day).
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = value.split("-")
+    if len(value) != 2:
+        raise ValueError(f"Invalid time window: {value} (expected start-end)")
+    start, end = _parse_clock(value[0]), _parse_clock(value[1])
+    if end <= start:
+        raise ValueError(f"Invalid time window: end {end} is not after start {start}")
+    return start, end
+
+class _FollowReader:
+    """
+    Reads a file that is still being written (tail -f). read() blocks, polling every
+    poll_interval seconds, until new bytes arrive; it returns b"" only once the closing
+    </events> tag has been read or nothing was appended for idle_timeout seconds.
+    Gzip files are decompressed incrementally with zlib, so blocks flushed by the writer
+    are parsed before the gzip stream is complete.
+    """
+    def __init__(self, path: str, poll_interval: float, idle_timeout: float):
+        self.raw = open(path, "rb")
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self._gunzip = zlib.decompressobj(wbits=31) if path.endswith(".gz") else None
+        self._tail = b""
+        self.finished = False
+        self.timed_out = False
+
+    def read(self, size: int = -1) -> bytes:
+        idle = 0.0
+        while not self.finished:
+            data = self.raw.read(size)
+            if self._gunzip is not None and data:
+                data = self._gunzip.decompress(data)
+                self.finished = self._gunzip.eof
+                if not data:
+                    # Only part of a compressed block so far: read on without waiting
+                    idle = 0.0
+                    continue
+            if data:
+                # The closing tag may straddle two reads
+                self.finished = self.finished or b"</events>" in self._tail + data
+                self._tail = data[-16:]
+                return data
+            if idle >= self.idle_timeout:
+                self.timed_out = True
+                break
+            time.sleep(self.poll_interval)
+            idle += self.poll_interval
+        return b""
+
+    def tell(self) -> int:
+        return self.raw.tell()
+
+    def close(self):
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class _CheckpointPickler(pickle.Pickler):
+    """Pickles handler state with the live handlers and ID dictionaries stored as references."""
+    def __init__(self, file, live: Dict[tuple, object]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._keys = {id(obj): key for key, obj in live.items()}
+
+    def persistent_id(self, obj):
+        return self._keys.get(id(obj))
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    """Resolves the references of _CheckpointPickler to the handlers and ID dictionaries of this run."""
+    def __init__(self, file, live: Dict[tuple, object]):
+        super().__init__(file)
+        self._live = live
+
+    def persistent_load(self, key):
+        return self._live[key]
+
+class _WindowEnd(Exception):
+    """Raised by the dispatcher at the first event past the time window to stop reading."""
+
+class _EventTarget:
+    """
+    Parser target receiving each <event> start tag with its attribute dict. No element tree is
+    built, so memory stays flat however large the file is. Handlers get the attribute dict,
+    which supports the same .get(name) calls as an element.
+    """
+    def __init__(self, stream: "EventsStream"):
+        timed = stream.time_window or stream.on_progress is not None
+        self.dispatch = stream._dispatch_timed if timed else stream._dispatch
+
+    def start(self, tag, attrib):
+        if tag == "event" or tag.endswith("}event"):
+            self.dispatch(attrib)
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+    def close(self):
+        return None
+
+class EventsStream:
+    """
+    Single pass over a MATSim events file feeding every registered handler.
+
+    A handler implements _process_event(event) (event supports .get(attr)); it may declare
+    an `event_types` collection to only receive those event types, and a finish() method
+    called once the file has been read. Several prepare processors can therefore share one
+    pass over the events instead of parsing the file once each.
+
+    With a time_window (start, end) only events with start <= time < end are dispatched.
+    Events are time ordered, so the stream skips to the window start on raw bytes without
+    XML parsing (binary search by seeking in uncompressed files), stops reading at the first
+    event past the end, and calls close_window(end) on the handlers that define it so they
+    can close trips still open at the window end.
+
+    With follow=True the file is tailed while MATSim is still writing it (see _FollowReader).
+    on_progress(sim_time) is called every progress_interval simulated seconds, before the
+    first event of each new interval, e.g. to publish running scores.
+
+    With a checkpoint_path the state of the pass is saved every checkpoint_interval bytes of
+    the (decompressed) stream: the offset of the next event, the handlers' attributes (open
+    trips and vehicles, flushed output batches) and the ID dictionaries they encode into.
+    A run with the same handlers over the same file resumes from that checkpoint and gives
+    the results of an uninterrupted run; the checkpoint is removed once the pass completes.
+    """
+    def __init__(self, events_path: str, handlers: Optional[List] = None, chunk_size: int = CHUNK_SIZE,
+                 time_window: Optional[Tuple[float, float]] = None, follow: bool = False,
+                 poll_interval: float = 1.0, idle_timeout: float = 300.0,
+                 progress_interval: Optional[float] = None, on_progress: Optional[Callable[[float], None]] = None,
+                 checkpoint_path: Optional[str] = None, checkpoint_interval: int = CHECKPOINT_INTERVAL):
+        if checkpoint_path and follow:
+            raise ValueError("Checkpoints are not supported when following a file that is still written")
+        self.events_path = events_path
+        # Reads no larger than the checkpoint interval, so small intervals still get checkpoints
+        self.chunk_size = min(chunk_size, checkpoint_interval) if checkpoint_path else chunk_size
+        self.time_window = time_window
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress if progress_interval else None
+        self._next_progress = 0.0
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.handlers: List = []
+        self.event_count = 0
+        # Raw (compressed for .gz) bytes of the file consumed by the last run
+        self.bytes_read = 0
+        # event type -> handler callbacks; handlers without event_types get every event
+        self._by_type: Dict[str, List[Callable]] = {}
+        self._catch_all: List[Callable] = []
+        for handler in handlers or []:
+            self.add_handler(handler)
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+        event_types = getattr(handler, "event_types", None)
+        if event_types is None:
+            self._catch_all.append(handler._process_event)
+            for callbacks in self._by_type.values():
+                callbacks.append(handler._process_event)
+        else:
+            for e_type in event_types:
+                if e_type not in self._by_type:
+                    self._by_type[e_type] = list(self._catch_all)
+                self._by_type[e_type].append(handler._process_event)
+        return handler
+
+    def _dispatch(self, event):
+        self.event_count += 1
+        for callback in self._by_type.get(event.get("type"), self._catch_all):
+            callback(event)
+
+    def _dispatch_timed(self, event):
+        """Dispatch with the event time checked against the time window and progress interval."""
+        sim_time = float(event.get("time"))
+        if self.time_window:
+            if sim_time >= self.time_window[1]:
+                raise _WindowEnd()
+            if sim_time < self.time_window[0]:
+                return
+        if self.on_progress is not None and sim_time >= self._next_progress:
+            if self.event_count:
+                self.on_progress(sim_time)
+            self._next_progress = (sim_time // self.progress_interval + 1) * self.progress_interval
+        self._dispatch(event)
+
+    def _seek_near(self, f, start: float):
+        """Binary search on byte offsets of an uncompressed file for a position shortly before start."""
+        lo, hi = 0, os.fstat(f.fileno()).st_size
+        while hi - lo > self.chunk_size:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            match = _EVENT_TIME.search(f.read(1 << 16))
+            if match is None or float(match.group(1)) >= start:
+                hi = mid
+            else:
+                lo = mid
+        f.seek(lo)
+
+    def _skip_to(self, f, start: float) -> bytes:
+        """
+        Reads raw chunks, dropping whole chunks of events before start, and returns the
+        bytes from the first event at or after start (b"" if there is none).
+        """
+        buffer = b""
+        while True:
+            chunk = f.read(self.chunk_size)
+            if not chunk:
+                return b""
+            buffer += chunk
+            last = buffer.rfind(b"<event ")
+            if last < 0:
+                continue
+            match = _EVENT_TIME.match(buffer, last)
+            if match is not None and float(match.group(1)) < start:
+                # Every event before the last one is earlier still
+                buffer = buffer[last:]
+                continue
+            for match in _EVENT_TIME.finditer(buffer):
+                if float(match.group(1)) >= start:
+                    return buffer[match.start():]
+
+    def _id_dictionaries(self) -> List[IdDictionary]:
+        """The shared ID dictionary and any other one the handlers encode into."""
+        dictionaries = [ID_DICTIONARY]
+        for handler in self.handlers:
+            ids = getattr(handler, "ids", None)
+            if isinstance(ids, IdDictionary) and all(ids is not d for d in dictionaries):
+                dictionaries.append(ids)
+        return dictionaries
+
+    def _live_objects(self) -> Dict[tuple, object]:
+        """Objects a checkpoint refers to instead of copying: handlers, ID dictionaries and namespaces."""
+        live: Dict[tuple, object] = {("handler", i): h for i, h in enumerate(self.handlers)}
+        for j, ids in enumerate(self._id_dictionaries()):
+            live[("ids", j)] = ids
+            for name, ns in ids._namespaces.items():
+                live[("namespace", j, name)] = ns
+        return live
+
+    def _checkpoint_identity(self) -> dict:
+        """What a checkpoint must match to be resumed: file, time window and handlers."""
+        stat = os.stat(self.events_path)
+        return {
+            "version": _CHECKPOINT_VERSION,
+            "events_path": os.path.abspath(self.events_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "time_window": tuple(self.time_window) if self.time_window else None,
+            "handlers": [type(h).__name__ for h in self.handlers]
+        }
+
+    def _save_checkpoint(self, offset: int):
+        """Writes the state after every event before offset (atomically: temp file + rename)."""
+        meta = dict(self._checkpoint_identity(), offset=offset, event_count=self.event_count,
+                    next_progress=self._next_progress)
+        id_lists = [{name: ns._ids for name, ns in ids._namespaces.items()} for ids in self._id_dictionaries()]
+        tmp_path = self.checkpoint_path + ".tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(tmp_path)), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(id_lists, f, protocol=pickle.HIGHEST_PROTOCOL)
+            _CheckpointPickler(f, self._live_objects()).dump([h.__dict__ for h in self.handlers])
+        os.replace(tmp_path, self.checkpoint_path)
+        print(f"Checkpoint at byte {offset} ({self.event_count} events): {self.checkpoint_path}")
+
+    def _load_checkpoint(self) -> Optional[int]:
+        """Restores a matching checkpoint; returns the stream offset to resume from (None: start over)."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "rb") as f:
+            meta = pickle.load(f)
+            identity = self._checkpoint_identity()
+            if any(meta.get(key) != value for key, value in identity.items()):
+                print(f"Warning: checkpoint {self.checkpoint_path} is for other inputs, starting over.")
+                return None
+            # IDs encoded before the pass must be the ones the checkpointed run had encoded
+            id_lists = pickle.load(f)
+            dictionaries = self._id_dictionaries()
+            if len(id_lists) != len(dictionaries) or any(
+                    ids.namespace(name)._ids != saved[:len(ids.namespace(name))]
+                    for ids, lists in zip(dictionaries, id_lists) for name, saved in lists.items()):
+                print(f"Warning: checkpoint {self.checkpoint_path} has other ID codes, starting over.")
+                return None
+            for ids, lists in zip(dictionaries, id_lists):
+                for name, saved in lists.items():
+                    ns = ids.namespace(name)
+                    for id_ in saved[len(ns):]:
+                        ns.encode(id_)
+            states = _CheckpointUnpickler(f, self._live_objects()).load()
+        for handler, state in zip(self.handlers, states):
+            handler.__dict__.clear()
+            handler.__dict__.update(state)
+        self.event_count = meta["event_count"]
+        self._next_progress = meta["next_progress"]
+        print(f"Resuming {self.events_path} from checkpoint at byte {meta['offset']} ({self.event_count} events).")
+        return meta["offset"]
+
+    def _feed_with_checkpoints(self, f, parser, chunk: bytes):
+        """
+        Feeds the parser like _parse, but every piece ends right before an <event> start tag,
+        so the events fed can be counted exactly. Once checkpoint_interval bytes have passed
+        and the parser has dispatched every event fed, the state is saved with the stream
+        offset of the rest of the buffer.
+        """
+        read = f.read
+        fed_events = 0
+        count_at_start = self.event_count
+        next_checkpoint = f.tell() + self.checkpoint_interval
+        buffer = chunk
+        while buffer:
+            # The buffer always ends at the stream position f.tell()
+            position = f.tell()
+            more = read(self.chunk_size)
+            if not more:
+                cut = len(buffer)
+            else:
+                cut = buffer.rfind(b"<event ")
+                if cut < 0:
+                    # No event starts here: hold back a possibly split start tag
+                    cut = max(len(buffer) - len(b"<event "), 0)
+            head, buffer = buffer[:cut], buffer[cut:]
+            parser.feed(head)
+            fed_events += head.count(b"<event ")
+            if more and position >= next_checkpoint and self.event_count - count_at_start == fed_events:
+                self._save_checkpoint(position - len(buffer))
+                next_checkpoint = position + self.checkpoint_interval
+            buffer += more
+
+    def _parse(self, f, offset: Optional[int] = None):
+        parser = etree.XMLParser(target=_EventTarget(self))
+        read = f.read
+        if offset is not None:
+            # Resume at the first event after the checkpoint (GzipFile seeks the decompressed stream)
+            f.seek(offset)
+            parser.feed(_EVENTS_HEADER)
+            chunk = read(self.chunk_size)
+        elif self.time_window:
+            if not self.follow and not self.events_path.endswith(".gz"):
+                self._seek_near(f, self.time_window[0])
+            chunk = self._skip_to(f, self.time_window[0])
+            if not chunk:
+                return
+            parser.feed(_EVENTS_HEADER)
+        else:
+            chunk = read(self.chunk_size)
+        try:
+            if self.checkpoint_path:
+                self._feed_with_checkpoints(f, parser, chunk)
+            else:
+                while chunk:
+                    parser.feed(chunk)
+                    chunk = read(self.chunk_size)
+        except _WindowEnd:
+            return
+        if getattr(f, "timed_out", False):
+            # Writer stopped before </events>: keep what was parsed, the document is incomplete
+            print(f"Warning: no new events for {self.idle_timeout:.0f}s, stopped following {self.events_path}")
+            return
+        parser.close()
+
+    def _open(self):
+        if not self.follow:
+            return open_events(self.events_path)
+        # The simulation may not have created the file yet
+        waited = 0.0
+        while not os.path.exists(self.events_path) and waited < self.idle_timeout:
+            time.sleep(self.poll_interval)
+            waited += self.poll_interval
+        if not os.path.exists(self.events_path):
+            raise FileNotFoundError(f"Events file not found at: {self.events_path}")
+        print(f"Following events file: {self.events_path}")
+        return _FollowReader(self.events_path, self.poll_interval, self.idle_timeout)
+
+    def run(self) -> int:
+        """
+        Reads the file (or the time window), then calls close_window()/finish() on the
+        handlers. Returns the number of events dispatched.
+        """
+        if not self.follow and not os.path.exists(self.events_path):
+            raise FileNotFoundError(f"Events file not found at: {self.events_path}")
+
+        self.event_count = 0
+        self._next_progress = 0.0
+        offset = self._load_checkpoint()
+        try:
+            with self._open() as f:
+                self._parse(f, offset)
+                # Position in the file on disk (GzipFile.tell() is the uncompressed offset)
+                self.bytes_read = getattr(f, "fileobj", f).tell()
+        except Exception as e:
+            print(f"Error processing events: {e}")
+            raise
+
+        if self.time_window:
+            print(f"Time window {self.time_window[0]:.0f}-{self.time_window[1]:.0f}s: "
+                  f"{self.event_count} events, read {self.bytes_read} of {file_size(self.events_path)} bytes.")
+            for handler in self.handlers:
+                close_window = getattr(handler, "close_window", None)
+                if close_window is not None:
+                    close_window(self.time_window[1])
+
+        for handler in self.handlers:
+            finish = getattr(handler, "finish", None)
+            if finish is not None:
+                finish()
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return self.event_count
+
+@track_stage("events.stream")
+def run_events_stream(events_path: str, handlers: List, time_window: Optional[Tuple[float, float]] = None,
+                      checkpoint_path: Optional[str] = None, checkpoint_interval: int = CHECKPOINT_INTERVAL) -> int:
+    """
+    Runs one shared EventsStream pass over events_path (or its time window) for all handlers,
+    resuming from checkpoint_path if an interrupted pass left one there.
+    """
+    print(f"Streaming events from: {events_path} ({len(handlers)} handlers)")
+    stream = EventsStream(events_path, handlers, time_window=time_window,
+                          checkpoint_path=checkpoint_path, checkpoint_interval=checkpoint_interval)
+    event_count = stream.run()
+    record_stage(records_in=event_count, bytes_read=stream.bytes_read)
+    print(f"Streamed {event_count} events.")
+    return event_count
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import os
+from typing import Dict, Optional
+from src.modules.core_data_processor.zone_processor import ZoneGrid
+from src.utils.file_utils import save_csv_from_columns
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+
+# scipy is optional: fall back to dense NumPy matrices if missing
+try:
+    import scipy.sparse as sparse
+    USE_SCIPY = True
+except ImportError:
+    sparse = None
+    USE_SCIPY = False
+
+# Matrices accumulated per origin/destination zone pair
+OD_MATRIX_NAMES = ["trips", "pt_trips", "bus_trips", "travel_time_sum", "pt_travel_time_sum"]
+
+def build_od_matrix(origins: np.ndarray, destinations: np.ndarray, weights: Optional[np.ndarray], num_zones: int):
+    """
+    Accumulates weights into a num_zones x num_zones matrix in one vectorized pass
+    (duplicate pairs are summed). Returns a CSR matrix, or a dense array without scipy.
+    """
+    if weights is None:
+        weights = np.ones(len(origins), dtype=np.float64)
+    if USE_SCIPY:
+        return sparse.coo_matrix(
+            (weights, (origins, destinations)), shape=(num_zones, num_zones)
+        ).tocsr()
+    flat = np.bincount(origins * num_zones + destinations, weights=weights, minlength=num_zones * num_zones)
+    return flat.reshape(num_zones, num_zones)
+
+def load_od_matrices(npz_path: str) -> Dict[str, object]:
+    """Loads matrices saved by ODMatrixPrepareData.save_od_matrices_to_npz."""
+    with np.load(npz_path) as data:
+        num_zones = int(data["num_zones"])
+        origins = data["origin_zone"]
+        destinations = data["destination_zone"]
+        return {
+            name: build_od_matrix(origins, destinations, data[name], num_zones)
+            for name in OD_MATRIX_NAMES
+        }
+
+class ODMatrixPrepareData:
+    """
+    Builds zone-to-zone OD matrices from plan activity coordinates (origin/destination)
+    and trip modes/travel times from the prepared ridership data.
+    """
+    def __init__(self, activities_csv_path: str, ridership_csv_path: str, grid: ZoneGrid,
+                 legs_csv_path: Optional[str] = None):
+        self.activities_csv_path = activities_csv_path
+        self.ridership_csv_path = ridership_csv_path
+        self.legs_csv_path = legs_csv_path # plan legs: departure times of the plan trips
+        self.grid = grid
+        self.matrices: Dict[str, object] = {}
+        self.unmatched_trips = 0
+
+    def _load_plan_trips(self) -> pd.DataFrame:
+        """
+        Pairs consecutive (non 'interaction') activities of each selected plan into trips.
+        The departure time is the dep_time of the first leg of the trip (plan legs CSV), else
+        the origin end_time, else the destination start_time (e.g. max_dur activities).
+        """
+        acts = pd.read_csv(
+            self.activities_csv_path,
+            usecols=["person_id", "act_index", "type", "x", "y", "start_time", "end_time"],
+            dtype={"person_id": str}
+        )
+        acts = acts[~acts["type"].fillna("").str.endswith("interaction")]
+        acts = acts.sort_values(["person_id", "act_index"], kind="stable")
+
+        person = acts["person_id"].to_numpy()
+        same_person = person[:-1] == person[1:]
+        origin_idx = np.flatnonzero(same_person)
+        dest_idx = origin_idx + 1
+
+        zones = self.grid.zone_index(acts["x"].to_numpy(), acts["y"].to_numpy())
+        trips = pd.DataFrame({
+            "personId": person[origin_idx],
+            "originAct": acts["act_index"].to_numpy()[origin_idx],
+            "depTime": acts["end_time"].to_numpy(dtype=np.float64)[origin_idx],
+            "originZone": zones[origin_idx],
+            "destinationZone": zones[dest_idx]
+        })
+
+        if self.legs_csv_path and os.path.exists(self.legs_csv_path):
+            # Leg k follows activity k in a plan
+            legs = pd.read_csv(self.legs_csv_path, usecols=["person_id", "leg_index", "dep_time"],
+                               dtype={"person_id": str, "dep_time": np.float64})
+            legs = legs.rename(columns={"person_id": "personId", "leg_index": "originAct", "dep_time": "legDepTime"})
+            trips = trips.merge(legs, on=["personId", "originAct"], how="left")
+            trips["depTime"] = trips["legDepTime"].fillna(trips["depTime"])
+            trips = trips.drop(columns="legDepTime")
+        arrival = acts["start_time"].to_numpy(dtype=np.float64)[dest_idx]
+        trips["depTime"] = trips["depTime"].fillna(pd.Series(arrival, index=trips.index))
+        return trips.drop(columns="originAct")
+
+    @track_stage("od_matrix.process")
+    def process(self):
+        print(f"Building OD matrices from: {self.activities_csv_path} and {self.ridership_csv_path}")
+        if self.legs_csv_path and not os.path.exists(self.legs_csv_path):
+            print(f"Warning: plan legs not found at {self.legs_csv_path}, using activity end times.")
+        for path in (self.activities_csv_path, self.ridership_csv_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"OD input file not found at: {path}")
+
+        plan_trips = self._load_plan_trips()
+        trips = pd.read_csv(
+            self.ridership_csv_path,
+            usecols=lambda c: c in ("personId", "mainMode", "startTime", "travelTime", "vehTypeList", "usesBus"),
+            dtype={"personId": str}
+        )
+        print(f"  Plan trips: {len(plan_trips)}, ridership trips: {len(trips)}")
+
+        # Each executed trip is located at the plan trip of the same person departing
+        # closest to its start; a plan trip takes at most one executed trip (the closest),
+        # the others are counted as unmatched.
+        plan_trips = plan_trips.dropna(subset=["depTime"]).sort_values("depTime", kind="stable")
+        plan_trips["planTrip"] = np.arange(len(plan_trips))
+        trips["startTime"] = pd.to_numeric(trips["startTime"], errors="coerce").astype(np.float64)
+        trips = trips.dropna(subset=["startTime"]).sort_values("startTime", kind="stable")
+        joined = pd.merge_asof(
+            trips, plan_trips,
+            left_on="startTime", right_on="depTime",
+            by="personId", direction="nearest"
+        )
+        closest_first = (joined["startTime"] - joined["depTime"]).abs().sort_values(kind="stable").index
+        taken = joined.loc[closest_first, "planTrip"].duplicated()
+        joined.loc[taken.index[taken.to_numpy()], ["originZone", "destinationZone"]] = np.nan
+
+        origins = joined["originZone"].to_numpy(dtype=np.float64)
+        destinations = joined["destinationZone"].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(origins) & ~np.isnan(destinations) & (origins >= 0) & (destinations >= 0)
+        self.unmatched_trips = int((~valid).sum())
+
+        o = origins[valid].astype(np.int64)
+        d = destinations[valid].astype(np.int64)
+        travel_time = pd.to_numeric(joined["travelTime"], errors="coerce").fillna(0.0).to_numpy()[valid]
+        is_pt = (joined["mainMode"].fillna("").to_numpy() == "pt")[valid]
+        if "usesBus" in joined.columns:
+            uses_bus = joined["usesBus"].fillna(False).astype(bool).to_numpy()[valid]
+        else:
+            uses_bus = joined["vehTypeList"].fillna("").astype(str).str.contains("bus", case=False).to_numpy()[valid]
+
+        n = self.grid.num_zones
+        self.matrices = {
+            "trips": build_od_matrix(o, d, None, n),
+            "pt_trips": build_od_matrix(o, d, is_pt.astype(np.float64), n),
+            "bus_trips": build_od_matrix(o, d, uses_bus.astype(np.float64), n),
+            "travel_time_sum": build_od_matrix(o, d, travel_time, n),
+            "pt_travel_time_sum": build_od_matrix(o, d, travel_time * is_pt, n)
+        }
+        record_stage(records_in=len(trips) + len(plan_trips), records_out=len(o),
+                     bytes_read=(file_size(self.activities_csv_path) or 0) + (file_size(self.ridership_csv_path) or 0))
+        print(f"Accumulated {len(o)} trips into {n}x{n} OD matrices ({self.unmatched_trips} trips outside the grid or unmatched).")
+
+    def _nonzero_pairs(self):
+        """Returns (origin, destination) of every pair with at least one trip, sorted."""
+        trips = self.matrices["trips"]
+        if USE_SCIPY:
+            coo = trips.tocoo()
+            order = np.lexsort((coo.col, coo.row))
+            return coo.row[order].astype(np.int64), coo.col[order].astype(np.int64)
+        return np.nonzero(trips)
+
+    def _pair_values(self, name: str, origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+        values = self.matrices[name][origins, destinations]
+        return np.asarray(values).ravel()
+
+    def save_od_matrices_to_npz(self, output_path: str):
+        print(f"Saving OD matrices to: {output_path}")
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        origins, destinations = self._nonzero_pairs()
+        np.savez_compressed(
+            output_path,
+            num_zones=self.grid.num_zones,
+            origin_zone=origins,
+            destination_zone=destinations,
+            **{name: self._pair_values(name, origins, destinations) for name in OD_MATRIX_NAMES}
+        )
+
+    def save_od_pairs_to_csv(self, output_path: str):
+        print(f"Saving OD pairs to: {output_path}")
+        origins, destinations = self._nonzero_pairs()
+        columns = {"origin_zone": origins, "destination_zone": destinations}
+        for name in OD_MATRIX_NAMES:
+            columns[name] = self._pair_values(name, origins, destinations)
+        trips = columns["trips"]
+        columns["pt_share"] = np.divide(columns["pt_trips"], trips, out=np.zeros_like(trips), where=trips > 0)
+        columns["mean_travel_time"] = np.divide(columns["travel_time_sum"], trips, out=np.zeros_like(trips), where=trips > 0)
+        save_csv_from_columns({k: v.tolist() for k, v in columns.items()}, output_path)
@@ -1,50 +1,51 @@
 
-import gzip
-import xml.etree.ElementTree as ET
 import pandas as pd
 import os
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
+from src.modules.core_data_processor.vehicle_processor import VehicleTypeIndex
+from src.modules.prepare_bus_score_data.events_stream import EventsStream
 from src.utils.file_utils import save_csv_from_list
-
-# Check if lxml is available for faster parsing, otherwise use standard ElementTree
-try:
-    from lxml import etree
-    USE_LXML = True
-except ImportError:
-    import xml.etree.ElementTree as etree
-    USE_LXML = False
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY
+from src.utils.metrics_utils import track_stage, record_stage
+from src.utils.time_bin_utils import TimeBinAccumulator, DEFAULT_BIN_SIZE, DEFAULT_NUM_BINS
 
 class OnTimePerformancePrepareData:
-    def __init__(self, events_path: str, vehicle_path: str):
+    # Event types routed to _process_event by EventsStream
+    event_types = ("VehicleArrivesAtFacility", "VehicleDepartsAtFacility")
+    # Time series accumulated per bin (stop calls binned by their arrival time)
+    TIME_SERIES = ["stop_calls", "on_time_calls"]
+
+    def __init__(self, events_path: str, vehicle_path: str, id_dictionary: Optional[IdDictionary] = None,
+                 vehicle_types_path: Optional[str] = None, bin_size: float = DEFAULT_BIN_SIZE,
+                 num_bins: int = DEFAULT_NUM_BINS, min_threshold: float = -180.0, max_threshold: float = 180.0,
+                 time_window: Optional[Tuple[float, float]] = None, vehicle_index: Optional[VehicleTypeIndex] = None):
         self.events_path = events_path
         self.vehicle_path = vehicle_path
-        self.otp_data: List[Dict] = []
-        self.bus_vehicles: Set[str] = set()
-        self._temp_bus_map: Dict[str, Dict] = {} # Map vehicle_id -> partial data
-        self._load_bus_vehicles()
+        self.time_window = time_window # (start, end) seconds; None = whole day
+        self.ids = id_dictionary or ID_DICTIONARY
+        self.otp_data: List[Dict] = [] # stopId/vehicleId stored as stop/vehicle codes
+        self.vehicle_types_path = vehicle_types_path
+        self.vehicle_index = vehicle_index or VehicleTypeIndex(self.ids)
+        self._bus_flags = self.vehicle_index.bus_flags # is_bus bitmap by vehicle code
+        self._temp_bus_map: Dict[int, Dict] = {} # Map vehicle code -> partial data
+        # On-time window of the arrival delay, for the per bin OTP rate
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.time_bins = TimeBinAccumulator(self.TIME_SERIES, bin_size, num_bins)
+        if vehicle_index is None:
+            self._load_bus_vehicles()
 
     def _load_bus_vehicles(self):
-        """Loads vehicle IDs that are buses from the CSV file."""
+        """Loads the bus bitmap (indexed by vehicle code) from the vehicles CSV."""
         print(f"Loading bus vehicles from: {self.vehicle_path}")
-        if not os.path.exists(self.vehicle_path):
-            print(f"Warning: Vehicle file not found at {self.vehicle_path}.")
-            return
-            
         try:
-            df = pd.read_csv(self.vehicle_path)
-            # We expect 'id' and 'type_id'
-            # Filter where type_id contains 'bus'
-            if 'id' in df.columns and 'type_id' in df.columns:
-                df['type_id'] = df['type_id'].fillna('').astype(str)
-                bus_df = df[df['type_id'].str.contains("bus", case=False)]
-                self.bus_vehicles = set(bus_df['id'].astype(str).values)
-            else:
-                 print(f"Warning: Columns 'id' and 'type_id' not found in {self.vehicle_path}.")
-                 
-            print(f"Loaded {len(self.bus_vehicles)} bus vehicles.")
+            self.vehicle_index = VehicleTypeIndex.from_csv(self.vehicle_path, self.vehicle_types_path, self.ids)
+            self._bus_flags = self.vehicle_index.bus_flags
+            print(f"Loaded {self.vehicle_index.num_bus_vehicles} bus vehicles.")
         except Exception as e:
             print(f"Error loading bus vehicles: {e}")
 
+    @track_stage("otp_prepare.process")
     def process(self):
         """
         Extracts Arrival/Departure events for OTP calculation.
@@ -54,23 +55,10 @@ class OnTimePerformancePrepareData:
         if not os.path.exists(self.events_path):
              raise FileNotFoundError(f"Events file not found at: {self.events_path}")
 
-        # Determine open function based on extension
-        open_func = gzip.open if self.events_path.endswith('.gz') else open
-        mode = "rb" if self.events_path.endswith('.gz') else "rb" 
-        
-        try:
-            with open_func(self.events_path, mode) as f:
-                context = etree.iterparse(f, events=('end',))
-                
-                for event, elem in context:
-                    if elem.tag == "event" or elem.tag.endswith("event"):
-                        self._process_event(elem)
-                        elem.clear()
-                            
-        except Exception as e:
-            print(f"Error processing events: {e}")
-            raise
+        stream = EventsStream(self.events_path, [self], time_window=self.time_window)
+        event_count = stream.run()
 
+        record_stage(records_in=event_count, records_out=len(self.otp_data), bytes_read=stream.bytes_read)
         print(f"Extracted {len(self.otp_data)} OTP records.")
 
     def _process_event(self, elem):
@@ -78,8 +66,8 @@ class OnTimePerformancePrepareData:
         
         # 1. VehicleArrivesAtFacility
         if e_type == "VehicleArrivesAtFacility":
-            veh_id = elem.get("vehicle")
-            if veh_id not in self.bus_vehicles: return
+            veh_code = self.ids.vehicle.lookup(elem.get("vehicle"))
+            if not (0 <= veh_code < len(self._bus_flags) and self._bus_flags[veh_code]): return
             
             # Extract delay if present. Standard MATSim might not have it unless extended.
             # If delay is missing, we might need schedule data, but assuming it exists as per Kotlin equivalent.
@@ -90,11 +78,11 @@ class OnTimePerformancePrepareData:
                 # For now, let's treat it as 0.0 if missing, but typically it should be there if this is the intent.
                 delay = "0.0"
                 
-            facility_id = elem.get("facility")
+            facility_code = self.ids.stop.encode(elem.get("facility"))
             time = elem.get("time")
 
-            self._temp_bus_map[veh_id] = {
-                "stopId": facility_id,
+            self._temp_bus_map[veh_code] = {
+                "stopId": facility_code,
                 "arrDelay": float(delay),
                 "arrivalTime": float(time), # Good to keep reference
                 "depDelay": 0.0 # Initialize
@@ -102,20 +90,20 @@ class OnTimePerformancePrepareData:
 
         # 2. VehicleDepartsAtFacility
         elif e_type == "VehicleDepartsAtFacility":
-            veh_id = elem.get("vehicle")
-            if veh_id not in self._temp_bus_map: return
+            veh_code = self.ids.vehicle.lookup(elem.get("vehicle"))
+            if veh_code not in self._temp_bus_map: return
             
             delay = elem.get("delay")
             if delay is None:
                 delay = "0.0"
 
             # Retrieve stored arrival data
-            data = self._temp_bus_map[veh_id]
+            data = self._temp_bus_map[veh_code]
             
             # Verify it's the same facility? (Ideally yes, but let's assume sequence)
             # data has stopId. The departure event also has facility.
-            facility_id = elem.get("facility")
-            if facility_id != data["stopId"]:
+            facility_code = self.ids.stop.lookup(elem.get("facility"))
+            if facility_code != data["stopId"]:
                 # Mismatch or missed event? 
                 # If facility differs, maybe the bus didn't stop long or something weird.
                 # But let's just proceed or ignore.
@@ -123,18 +111,53 @@ class OnTimePerformancePrepareData:
             
             data["depDelay"] = float(delay)
             data["departureTime"] = float(elem.get("time"))
-            data["vehicleId"] = veh_id
+            data["vehicleId"] = veh_code
             
             # Save record
             self.otp_data.append(data)
+            self.time_bins.add("stop_calls", data["arrivalTime"])
+            if self.min_threshold <= data["arrDelay"] <= self.max_threshold:
+                self.time_bins.add("on_time_calls", data["arrivalTime"])
             
             # Clean up map? 
             # In simple logic, yes. A vehicle calls at one stop then leaves.
-            del self._temp_bus_map[veh_id]
+            del self._temp_bus_map[veh_code]
+
+    def close_window(self, end_time: float):
+        """Stop calls whose departure falls after the time window end are not recorded."""
+        self._temp_bus_map.clear()
+
+    def finish(self):
+        self.time_bins.flush()
+
+    def summary(self) -> Dict[str, float]:
+        """Arrival delay OTP of the stop calls recorded so far (usable while streaming)."""
+        total = int(self.time_bins.get("stop_calls").sum())
+        on_time = int(self.time_bins.get("on_time_calls").sum())
+        return {
+            "total_records": total,
+            "on_time_records": on_time,
+            "otp_percentage": (on_time / total * 100) if total > 0 else 0.0
+        }
+
+    def get_time_series(self) -> pd.DataFrame:
+        """Per bin bus stop calls, on-time calls and OTP percentage."""
+        return self.time_bins.get_dataframe({
+            "otp_percentage": self.time_bins.ratio("on_time_calls", "stop_calls", scale=100.0)
+        })
+
+    def save_time_series_to_csv(self, output_path: str):
+        print(f"Saving OTP time series to: {output_path}")
+        save_csv_from_list(self.get_time_series().to_dict("records"), output_path)
+
+    def get_dataframe(self, decode: bool = True) -> pd.DataFrame:
+        """OTP records; with decode=False stopId/vehicleId stay as integer codes."""
+        df = pd.DataFrame(self.otp_data)
+        if decode and not df.empty:
+            df["stopId"] = self.ids.stop.decode_array(df["stopId"].to_numpy())
+            df["vehicleId"] = self.ids.vehicle.decode_array(df["vehicleId"].to_numpy())
+        return df
 
     def save_otp_data_to_csv(self, output_path: str):
         print(f"Saving OTP data to: {output_path}")
-        save_csv_from_list(self.otp_data, output_path)
-    
-    def get_dataframe(self) -> pd.DataFrame:
-        return pd.DataFrame(self.otp_data)
+        save_csv_from_list(self.get_dataframe().to_dict("records"), output_path)
@@ -1,156 +1,332 @@
-
-import gzip
-import xml.etree.ElementTree as ET
 import pandas as pd
+import numpy as np
 import os
-from typing import Dict, List, Optional
-from src.utils.file_utils import save_csv_from_list
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+from src.modules.core_data_processor.vehicle_processor import VehicleTypeIndex
+from src.modules.prepare_bus_score_data.events_stream import EventsStream
+from src.utils.file_utils import save_csv_from_columns
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY
+from src.utils.metrics_utils import track_stage, record_stage
+from src.utils.time_bin_utils import TimeBinAccumulator, DEFAULT_BIN_SIZE, DEFAULT_NUM_BINS
+from src.utils.sketch_utils import (KLLSketch, HyperLogLog, DEFAULT_HLL_PRECISION, stable_hash64,
+                                    named_quantiles, save_sketches_json)
 
-# Check if lxml is available for faster parsing, otherwise use standard ElementTree
-try:
-    from lxml import etree
-    USE_LXML = True
-except ImportError:
-    import xml.etree.ElementTree as etree
-    USE_LXML = False
+# Key of a travel time percentile, e.g. bus_travel_time_p90
+TRAVEL_TIME_QUANTILE_NAME = "{name}_travel_time_p{pct}"
+# Distinct bus riders: exact (set of person codes) or approximate (HyperLogLog counters)
+DISTINCT_COUNTING_MODES = ("exact", "hll")
+# Name of the distinct riders counter of all bus riders (others: hour_07, route_<routeId>)
+TOTAL_RIDERS = "total"
 
 class QTripData:
-    def __init__(self, person_id: str, start_time: float, main_mode: str):
-        self.person_id = person_id
+    def __init__(self, person_code: int, start_time: float, main_mode: str):
+        self.person_code = person_code
         self.start_time = start_time
         self.main_mode = main_mode
-        self.veh_id_list: List[str] = []
-        self.veh_type_list: List[str] = []
-
-    def to_dict(self, travel_time: float):
-        return {
-            "personId": self.person_id,
-            "vehTypeList": "|".join(self.veh_type_list),
-            "vehIDList": "|".join(self.veh_id_list),
-            "mainMode": self.main_mode,
-            "startTime": self.start_time,
-            "travelTime": travel_time
-           
-            
-            
-        }
+        self.veh_codes: List[int] = []
+        self.veh_type_codes: List[int] = []
+        self.uses_bus: bool = False
+        self.person_hash: Optional[int] = None # stable hash of the person ID (HyperLogLog mode)
 
 class RidershipPrepareData:
-    def __init__(self, events_path: str, vehicle_type_path: str):
+    # Columns of the records kept in memory (IDs as integer codes)
+    RECORD_COLUMNS = ["personCode", "vehCodes", "vehTypeCodes", "mainMode", "startTime", "travelTime", "usesBus"]
+    # Event types routed to _process_event by EventsStream
+    event_types = ("departure", "PersonEntersVehicle", "actstart")
+    # Time series accumulated per bin (trips binned by their start time)
+    TIME_SERIES = ["trips", "car_trips", "pt_trips", "bus_trips", "bus_boardings",
+                   "car_travel_time", "pt_travel_time", "bus_travel_time"]
+    # Travel time distributions kept as quantile sketches (bus = pt trips using a bus)
+    SKETCH_MODES = ["car", "pt", "bus"]
+    QUANTILES = [0.5, 0.9, 0.95]
+
+    def __init__(self, events_path: str, vehicle_type_path: str, id_dictionary: Optional[IdDictionary] = None,
+                 vehicle_types_path: Optional[str] = None, bin_size: float = DEFAULT_BIN_SIZE,
+                 num_bins: int = DEFAULT_NUM_BINS, time_window: Optional[Tuple[float, float]] = None,
+                 vehicle_index: Optional[VehicleTypeIndex] = None, distinct_counting: str = "exact",
+                 hll_precision: int = DEFAULT_HLL_PRECISION):
+        if distinct_counting not in DISTINCT_COUNTING_MODES:
+            raise ValueError(f"distinct_counting must be one of {DISTINCT_COUNTING_MODES}, got {distinct_counting!r}")
         self.events_path = events_path
         self.vehicle_path = vehicle_type_path
-        self.ridership_data: List[Dict] = []
-        self._trip_map: Dict[str, QTripData] = {}
-        self.veh_id_to_type_map: Dict[str, str] = {}
-        self._load_vehicle_types()
+        self.time_window = time_window # (start, end) seconds; None = whole day
+        self.truncated_trips = 0
+        self.ids = id_dictionary or ID_DICTIONARY
+        self.records: Dict[str, List] = {c: [] for c in self.RECORD_COLUMNS}
+        self._trip_map: Dict[int, QTripData] = {} # person code -> open trip
+        self._bus_persons = set() # person codes with at least one bus trip (exact mode)
+        self.distinct_counting = distinct_counting
+        self.hll_precision = hll_precision
+        # HyperLogLog mode: distinct riders in total, per boarding hour and per route, a few KB each
+        self.distinct_riders: Dict[str, HyperLogLog] = {}
+        self._route_of_vehicle: Dict[int, str] = {} # vehicle code -> route of its current departure
+        if distinct_counting == "hll":
+            self.distinct_riders[TOTAL_RIDERS] = HyperLogLog(hll_precision)
+            # The route of a boarding comes from the departure the vehicle serves
+            self.event_types = self.event_types + ("TransitDriverStarts",)
+        self.time_bins = TimeBinAccumulator(self.TIME_SERIES, bin_size, num_bins)
+        self.travel_time_sketches: Dict[str, KLLSketch] = {mode: KLLSketch() for mode in self.SKETCH_MODES}
+        self.vehicle_types_path = vehicle_types_path
+        self.vehicle_index = vehicle_index or VehicleTypeIndex(self.ids)
+        self._unknown_type_code = self.ids.vehicle_type.encode("unknown")
+        # An index parsed once (e.g. shared by several event passes) is reused as is
+        if vehicle_index is None:
+            self._load_vehicle_types()
+        self._type_codes = self.vehicle_index.type_code_list
+        self._bus_flags = self.vehicle_index.bus_flags
 
     def _load_vehicle_types(self):
-        """Loads vehicle types from the CSV file into a dictionary."""
+        """Builds the vehicle code -> type code / bus bitmap index from the vehicles CSV."""
         print(f"Loading vehicle types from: {self.vehicle_path}")
-        if not os.path.exists(self.vehicle_path):
-            print(f"Warning: Vehicle type file not found at {self.vehicle_path}. Vehicle types will be empty.")
-            return
-            
         try:
-            df = pd.read_csv(self.vehicle_path)
-            # Ensure columns exist. Assuming columns are 'id' and 'type_id' or similar based on previous context, 
-            # but let's check standard names usually produced. 
-            # The previous tool output showed keys from Vehicle class: 'id', 'type_id'.
-            if 'id' in df.columns and 'type_id' in df.columns:
-                 self.veh_id_to_type_map = pd.Series(df.type_id.values, index=df.id).to_dict()
-            else:
-                 print(f"Warning: Columns 'id' and 'type_id' not found in {self.vehicle_path}. Finding first two columns.")
-                 if df.shape[1] >= 2:
-                     self.veh_id_to_type_map = pd.Series(df.iloc[:, 1].values, index=df.iloc[:, 0]).to_dict()
-                 
-            print(f"Loaded {len(self.veh_id_to_type_map)} vehicle mappings.")
+            self.vehicle_index = VehicleTypeIndex.from_csv(self.vehicle_path, self.vehicle_types_path, self.ids)
+            print(f"Loaded {len(self.vehicle_index.type_code_list)} vehicle mappings "
+                  f"({self.vehicle_index.num_bus_vehicles} buses).")
         except Exception as e:
             print(f"Error loading vehicle types: {e}")
 
+    @property
+    def ridership_data(self) -> List[Dict]:
+        """Ridership records with string IDs (decoded on demand)."""
+        return self.get_dataframe().to_dict("records")
+
+    @track_stage("ridership_prepare.process")
     def process(self):
         """
         Extracts ridership trip data from MATSim events.
         """
         print(f"Processing events from: {self.events_path}")
-        
+
         if not os.path.exists(self.events_path):
              raise FileNotFoundError(f"Events file not found at: {self.events_path}")
 
-        # Determine open function based on extension
-        open_func = gzip.open if self.events_path.endswith('.gz') else open
-        mode = "rb" if self.events_path.endswith('.gz') else "rb" 
-        
-        try:
-            with open_func(self.events_path, mode) as f:
-                # Use iterparse
-                # Standard ET.iterparse does not support 'tag' argument
-                context = etree.iterparse(f, events=('end',))
-                
-                for event, elem in context:
-                    if elem.tag == "event" or elem.tag.endswith("event"):
-                        self._process_event(elem)
-                        elem.clear()
-                            
-        except Exception as e:
-            print(f"Error processing events: {e}")
-            raise
+        stream = EventsStream(self.events_path, [self], time_window=self.time_window)
+        event_count = stream.run()
 
-        print(f"Extracted {len(self.ridership_data)} ridership records.")
+        record_count = len(self.records["personCode"])
+        record_stage(records_in=event_count, records_out=record_count, bytes_read=stream.bytes_read)
+        print(f"Extracted {record_count} ridership records.")
 
     def _process_event(self, elem):
         e_type = elem.get("type")
-        
+
         # 1. PersonDepartureEvent -> type="departure"
         if e_type == "departure":
             person_id = elem.get("person")
-            if person_id.startswith("pt_"): return 
-            
-            if person_id in self._trip_map: return
-            
+            if person_id.startswith("pt_"): return
+
+            person_code = self.ids.person.encode(person_id)
+            if person_code in self._trip_map: return
+
             time = float(elem.get("time"))
             main_mode = elem.get("computationalRoutingMode")
-                
-            self._trip_map[person_id] = QTripData(person_id, time, main_mode)
+
+            self._trip_map[person_code] = QTripData(person_code, time, main_mode)
 
         # 2. PersonEntersVehicleEvent -> type="PersonEntersVehicle"
         elif e_type == "PersonEntersVehicle":
             person_id = elem.get("person")
             if person_id.startswith("pt_"): return
-            
-            if person_id in self._trip_map:
-                veh_id = elem.get("vehicle")
-                self._trip_map[person_id].veh_id_list.append(veh_id)
-                
-                # Lookup vehicle type
-                veh_type = self.veh_id_to_type_map.get(str(veh_id), "unknown")
-                self._trip_map[person_id].veh_type_list.append(veh_type)
+
+            qtrip = self._trip_map.get(self.ids.person.lookup(person_id))
+            if qtrip:
+                veh_code = self.ids.vehicle.encode(elem.get("vehicle"))
+                qtrip.veh_codes.append(veh_code)
+
+                # Lookup vehicle type and bus flag by array index
+                if veh_code < len(self._type_codes):
+                    qtrip.veh_type_codes.append(self._type_codes[veh_code])
+                    if self._bus_flags[veh_code]:
+                        qtrip.uses_bus = True
+                        time = float(elem.get("time"))
+                        self.time_bins.add("bus_boardings", time)
+                        if self.distinct_riders:
+                            self._count_boarding(qtrip, person_id, veh_code, time)
+                else:
+                    qtrip.veh_type_codes.append(self._unknown_type_code)
 
         # 3. ActivityStartEvent -> type="actstart"
         elif e_type == "actstart":
             person_id = elem.get("person")
             if person_id.startswith("pt_"): return
-            
+
             act_type = elem.get("actType")
             if act_type == "pt interaction": return
-            
-            qtrip = self._trip_map.get(person_id)
+
+            person_code = self.ids.person.lookup(person_id)
+            qtrip = self._trip_map.get(person_code)
             if not qtrip: return
-            
-            # If vehIDList is empty (pure walking), remove and don't write
-            if not qtrip.veh_id_list:
-                del self._trip_map[person_id]
-                return
-            
-            current_time = float(elem.get("time"))
-            travel_time = current_time - qtrip.start_time
-            
-            self.ridership_data.append(qtrip.to_dict(travel_time))
-            
-            del self._trip_map[person_id]
+
+            self._close_trip(person_code, qtrip, float(elem.get("time")))
+
+        elif e_type == "TransitDriverStarts":
+            veh_code = self.ids.vehicle.encode(elem.get("vehicleId"))
+            self._route_of_vehicle[veh_code] = elem.get("transitRouteId")
+
+    def _riders_counter(self, name: str) -> HyperLogLog:
+        counter = self.distinct_riders.get(name)
+        if counter is None:
+            counter = self.distinct_riders[name] = HyperLogLog(self.hll_precision)
+        return counter
+
+    def _count_boarding(self, qtrip: QTripData, person_id: str, veh_code: int, time: float):
+        """Adds the rider to the counters of the boarding hour and of the route (HyperLogLog mode)."""
+        if qtrip.person_hash is None:
+            qtrip.person_hash = stable_hash64(person_id)
+        self._riders_counter(f"hour_{int(time // 3600):02d}").add_hash(qtrip.person_hash)
+        route_id = self._route_of_vehicle.get(veh_code)
+        if route_id is not None:
+            self._riders_counter(f"route_{route_id}").add_hash(qtrip.person_hash)
+
+    def _close_trip(self, person_code: int, qtrip: QTripData, end_time: float):
+        """Writes the trip record; trips without a vehicle (pure walking) are dropped."""
+        del self._trip_map[person_code]
+        if not qtrip.veh_codes:
+            return
+
+        travel_time = end_time - qtrip.start_time
+
+        records = self.records
+        records["personCode"].append(person_code)
+        records["vehCodes"].append(tuple(qtrip.veh_codes))
+        records["vehTypeCodes"].append(tuple(qtrip.veh_type_codes))
+        records["mainMode"].append(qtrip.main_mode)
+        records["startTime"].append(qtrip.start_time)
+        records["travelTime"].append(travel_time)
+        records["usesBus"].append(qtrip.uses_bus)
+        if qtrip.uses_bus:
+            if self.distinct_riders:
+                self.distinct_riders[TOTAL_RIDERS].add_hash(qtrip.person_hash)
+            else:
+                self._bus_persons.add(person_code)
+
+        bins = self.time_bins
+        sketches = self.travel_time_sketches
+        bins.add("trips", qtrip.start_time)
+        if qtrip.main_mode == "car":
+            bins.add("car_trips", qtrip.start_time)
+            bins.add("car_travel_time", qtrip.start_time, travel_time)
+            sketches["car"].add(travel_time)
+        elif qtrip.main_mode == "pt":
+            bins.add("pt_trips", qtrip.start_time)
+            bins.add("pt_travel_time", qtrip.start_time, travel_time)
+            sketches["pt"].add(travel_time)
+            if qtrip.uses_bus:
+                bins.add("bus_trips", qtrip.start_time)
+                bins.add("bus_travel_time", qtrip.start_time, travel_time)
+                sketches["bus"].add(travel_time)
+
+    def close_window(self, end_time: float):
+        """
+        Called by EventsStream at the end of a time window: trips still under way are closed
+        at the window end (travel time censored to the window) instead of being lost.
+        """
+        for person_code, qtrip in list(self._trip_map.items()):
+            if qtrip.veh_codes:
+                self.truncated_trips += 1
+            self._close_trip(person_code, qtrip, end_time)
+        print(f"Closed {self.truncated_trips} trips still open at the window end ({end_time:.0f}s).")
+
+    def finish(self):
+        self.time_bins.flush()
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Totals of the trips recorded so far, with the definitions of the ridership and
+        travel time scores (cheap: read from the time bins, usable while streaming).
+        """
+        bins = self.time_bins
+        return {
+            "trips": int(bins.get("trips").sum()),
+            "bus_trips": int(bins.get("bus_trips").sum()),
+            "unique_persons_bus": self.count_unique_bus_persons(),
+            "total_car_travel_time": float(bins.get("car_travel_time").sum()),
+            "total_bus_travel_time": float(bins.get("bus_travel_time").sum())
+        }
+
+    def count_unique_bus_persons(self) -> int:
+        """Distinct persons with a bus trip: exact, or the HyperLogLog estimate in "hll" mode."""
+        if self.distinct_riders:
+            return int(round(self.distinct_riders[TOTAL_RIDERS].count()))
+        return len(self._bus_persons)
+
+    def get_distinct_riders(self) -> pd.DataFrame:
+        """Estimated distinct bus riders per counter (total, hour_HH, route_<routeId>), HyperLogLog mode."""
+        names = sorted(self.distinct_riders, key=lambda name: (name != TOTAL_RIDERS, name))
+        counters = [self.distinct_riders[name] for name in names]
+        return pd.DataFrame({
+            "counter": names,
+            "riders": [int(round(c.count())) for c in counters],
+            "relativeError": [c.relative_error for c in counters]
+        })
+
+    def save_distinct_riders_to_csv(self, output_path: str):
+        print(f"Saving distinct rider counts to: {output_path}")
+        df = self.get_distinct_riders()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
+
+    def save_distinct_rider_sketches_to_json(self, output_path: str):
+        """HyperLogLog registers, mergeable with other shards or scenarios (merge_sketches)."""
+        save_sketches_json(self.distinct_riders, output_path)
+
+    def get_travel_time_quantiles(self, quantiles: Optional[List[float]] = None) -> Dict[str, float]:
+        """Travel time percentiles per mode from the sketches, e.g. {"bus_travel_time_p90": ...}."""
+        quantiles = quantiles or self.QUANTILES
+        return named_quantiles(self.travel_time_sketches, quantiles, TRAVEL_TIME_QUANTILE_NAME)
+
+    def save_travel_time_sketches_to_json(self, output_path: str):
+        save_sketches_json(self.travel_time_sketches, output_path)
+
+    def get_time_series(self) -> pd.DataFrame:
+        """Per bin trips, bus boardings, travel time sums and mean travel time per mode."""
+        bins = self.time_bins
+        return bins.get_dataframe({
+            "mean_car_travel_time": bins.ratio("car_travel_time", "car_trips"),
+            "mean_pt_travel_time": bins.ratio("pt_travel_time", "pt_trips"),
+            "mean_bus_travel_time": bins.ratio("bus_travel_time", "bus_trips")
+        })
+
+    def save_time_series_to_csv(self, output_path: str):
+        print(f"Saving ridership time series to: {output_path}")
+        df = self.get_time_series()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
+
+    def get_vehicle_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vehicles of the records in CSR layout: offsets (one per record + 1) into flat arrays
+        of vehicle codes and vehicle type codes, in boarding order.
+        """
+        records = self.records
+        lengths = np.fromiter(map(len, records["vehCodes"]), dtype=np.int64, count=len(records["vehCodes"]))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        veh_codes = np.fromiter(chain.from_iterable(records["vehCodes"]), dtype=np.int32, count=int(offsets[-1]))
+        type_codes = np.fromiter(chain.from_iterable(records["vehTypeCodes"]), dtype=np.int32, count=int(offsets[-1]))
+        return offsets, veh_codes, type_codes
+
+    def _join_codes(self, namespace: str, code_lists: List[tuple]) -> List[str]:
+        decode = self.ids.namespace(namespace).decode
+        return ["|".join(decode(c) for c in codes) for codes in code_lists]
+
+    def _decoded_columns(self) -> Dict[str, List]:
+        records = self.records
+        return {
+            "personId": self.ids.person.decode_array(records["personCode"]).tolist(),
+            "vehTypeList": self._join_codes("vehicle_type", records["vehTypeCodes"]),
+            "vehIDList": self._join_codes("vehicle", records["vehCodes"]),
+            "mainMode": records["mainMode"],
+            "startTime": records["startTime"],
+            "travelTime": records["travelTime"],
+            "usesBus": records["usesBus"]
+        }
 
     def save_ridership_to_csv(self, output_path: str):
         print(f"Saving ridership data to: {output_path}")
-        save_csv_from_list(self.ridership_data, output_path)
-    
-    def get_dataframe(self) -> pd.DataFrame:
-        return pd.DataFrame(self.ridership_data)
+        save_csv_from_columns(self._decoded_columns(), output_path)
+
+    def get_dataframe(self, decode: bool = True) -> pd.DataFrame:
+        """Ridership records; with decode=False IDs stay as integer codes (faster joins)."""
+        if not decode:
+            return pd.DataFrame(self.records, columns=self.RECORD_COLUMNS)
+        return pd.DataFrame(self._decoded_columns())
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence, Tuple
+from src.modules.core_data_processor.schedule_processor import TransitScheduleData, parse_schedule_times
+from src.utils.file_utils import save_csv_from_columns
+from src.utils.metrics_utils import track_stage, record_stage
+
+class ServiceHoursPrepareData:
+    """
+    Scheduled service hours from the departures of a transit schedule. Every departure is
+    a trip running from its departure time until the arrival at the last stop of its route
+    (departure time + the route's last arrivalOffset):
+      - revenue hours: the sum of the trip durations, total and per route,
+      - vehicle-hours: per vehicle, first departure to last arrival of its trips (layovers
+        between trips included), summed over vehicles.
+
+    All departures are expanded into flat NumPy arrays (route row per trip via np.repeat)
+    and summed with bincount / reduceat, so large schedules cost one pass of array ops.
+
+    With a time_window (start, end) only the trips running in it are kept, clipped to it, so
+    the hours match the events based scores of the same period.
+    """
+    def __init__(self, schedule_path: Optional[str] = None, schedule: Optional[TransitScheduleData] = None,
+                 modes: Optional[Sequence[str]] = ("bus",), time_window: Optional[Tuple[float, float]] = None):
+        self.schedule_path = schedule_path
+        self.schedule = schedule
+        self.time_window = time_window # (start, end) seconds; None = whole day
+        self.modes = [m.lower() for m in modes] if modes else None # None = all transit modes
+        self.route_ids = np.zeros(0, dtype=object)
+        self.line_ids = np.zeros(0, dtype=object)
+        self.trip_route = np.zeros(0, dtype=np.int64)
+        self.trip_start = np.zeros(0, dtype=np.float64)
+        self.trip_end = np.zeros(0, dtype=np.float64)
+        self.trip_vehicle = np.zeros(0, dtype=object)
+
+    @property
+    def trip_duration(self) -> np.ndarray:
+        return self.trip_end - self.trip_start
+
+    @track_stage("service_hours.process")
+    def process(self):
+        if self.schedule is None:
+            self.schedule = TransitScheduleData(self.schedule_path)
+            self.schedule.process()
+        routes = [r for r in self.schedule.routes_list
+                  if r.stops and (self.modes is None or r.transport_mode.lower() in self.modes)]
+        self.route_ids = np.array([r.route_id for r in routes], dtype=object)
+        self.line_ids = np.array([r.line_id for r in routes], dtype=object)
+
+        # Trip duration per route: last arrival (else departure) offset - first departure offset
+        last = parse_schedule_times([r.stops[-1].arrival_offset or r.stops[-1].departure_offset for r in routes])
+        first = np.nan_to_num(parse_schedule_times([r.stops[0].departure_offset for r in routes]))
+        duration = np.nan_to_num(last - first)
+
+        counts = np.fromiter((len(r.departures) for r in routes), dtype=np.int64, count=len(routes))
+        self.trip_route = np.repeat(np.arange(len(routes)), counts)
+        departures = [d for r in routes for d in r.departures]
+        self.trip_start = parse_schedule_times([d.departure_time for d in departures]) + first[self.trip_route]
+        self.trip_end = self.trip_start + duration[self.trip_route]
+        self.trip_vehicle = np.array([d.vehicle_ref_id or d.departure_id for d in departures], dtype=object)
+        if self.time_window:
+            start, end = self.time_window
+            running = (self.trip_end > start) & (self.trip_start < end)
+            self.trip_route, self.trip_vehicle = self.trip_route[running], self.trip_vehicle[running]
+            self.trip_start = np.clip(self.trip_start[running], start, end)
+            self.trip_end = np.clip(self.trip_end[running], start, end)
+
+        record_stage(records_in=len(departures), records_out=len(routes))
+        print(f"Expanded {len(departures)} departures of {len(routes)} routes ({len(self.trip_start)} trips in service): "
+              f"{self.trip_duration.sum() / 3600:.1f} revenue hours.")
+
+    def _vehicle_spans(self) -> np.ndarray:
+        """First departure to last arrival of each vehicle's trips (s)."""
+        if len(self.trip_vehicle) == 0:
+            return np.zeros(0)
+        codes, _ = pd.factorize(self.trip_vehicle)
+        order = np.argsort(codes, kind="stable")
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(codes[order])) + 1))
+        return np.maximum.reduceat(self.trip_end[order], starts) - np.minimum.reduceat(self.trip_start[order], starts)
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """Trips, revenue hours and span of service per route."""
+        n = len(self.route_ids)
+        trips = np.bincount(self.trip_route, minlength=n)
+        revenue = np.bincount(self.trip_route, weights=self.trip_duration, minlength=n) / 3600
+        first, last = np.full(n, np.inf), np.full(n, -np.inf)
+        np.minimum.at(first, self.trip_route, self.trip_start)
+        np.maximum.at(last, self.trip_route, self.trip_end)
+        has_trips = trips > 0
+        return pd.DataFrame({
+            "routeId": self.route_ids,
+            "lineId": self.line_ids,
+            "trips": trips,
+            "revenueHours": revenue,
+            "firstDeparture": np.where(has_trips, first, np.nan),
+            "lastArrival": np.where(has_trips, last, np.nan)
+        })
+
+    def summary(self) -> Dict[str, float]:
+        spans = self._vehicle_spans()
+        return {
+            "routes": len(self.route_ids),
+            "trips": len(self.trip_route),
+            "vehicles": len(spans),
+            "revenue_hours": float(self.trip_duration.sum() / 3600),
+            "vehicle_hours": float(spans.sum() / 3600)
+        }
+
+    def save_route_service_hours_to_csv(self, output_path: str):
+        print(f"Saving route service hours to: {output_path}")
+        df = self.get_dataframe()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
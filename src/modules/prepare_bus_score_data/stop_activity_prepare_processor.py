@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from src.modules.core_data_processor.vehicle_processor import VehicleTypeIndex
+from src.modules.prepare_bus_score_data.events_stream import EventsStream
+from src.utils.array_utils import grow_array
+from src.utils.file_utils import save_csv_from_columns
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY, UNKNOWN_CODE
+from src.utils.metrics_utils import track_stage, record_stage
+
+# Boardings/alightings buffered before one vectorized NumPy accumulation
+BUFFER_SIZE = 1 << 16
+
+class StopActivityPrepareData:
+    """
+    Bus boardings and alightings per stop and hour of day. The stop a bus is at comes from
+    VehicleArrivesAtFacility (current facility code per vehicle code); every passenger
+    PersonEntersVehicle / PersonLeavesVehicle of that bus is counted at that stop.
+
+    Counts are accumulated in (stop code x hour) NumPy arrays from buffered batches, so the
+    handler adds little to a shared EventsStream pass. Passengers entering a bus whose
+    arrival at the stop was before the time window are not counted (stop unknown).
+    """
+    # Event types routed to _process_event by EventsStream
+    event_types = ("TransitDriverStarts", "VehicleArrivesAtFacility", "PersonEntersVehicle", "PersonLeavesVehicle")
+
+    def __init__(self, events_path: str, vehicle_path: str, id_dictionary: Optional[IdDictionary] = None,
+                 vehicle_types_path: Optional[str] = None, vehicle_index: Optional[VehicleTypeIndex] = None,
+                 time_window: Optional[Tuple[float, float]] = None, buffer_size: int = BUFFER_SIZE):
+        self.events_path = events_path
+        self.time_window = time_window # (start, end) seconds; None = whole day
+        self.vehicle_path = vehicle_path
+        self.ids = id_dictionary or ID_DICTIONARY
+        self.vehicle_index = vehicle_index or VehicleTypeIndex.from_csv(vehicle_path, vehicle_types_path, self.ids)
+        self.buffer_size = buffer_size
+
+        # Accumulators indexed by [stop code, hour] (grown on demand)
+        self.boardings = np.zeros((0, 0), dtype=np.int64)
+        self.alightings = np.zeros((0, 0), dtype=np.int64)
+        self.unknown_stop_events = 0
+
+        # Current facility per vehicle code (plain list: faster than NumPy for scalar updates)
+        self._stop_of_vehicle: List[int] = [UNKNOWN_CODE] * len(self.vehicle_index.bus_flags)
+        self._stops: List[int] = []
+        self._times: List[float] = []
+        self._boarding: List[bool] = []
+
+    @track_stage("stop_activity_prepare.process")
+    def process(self):
+        """
+        Extracts bus boardings and alightings per stop and hour from MATSim events.
+        """
+        print(f"Processing events from: {self.events_path}")
+        stream = EventsStream(self.events_path, [self], time_window=self.time_window)
+        event_count = stream.run()
+        record_stage(records_in=event_count, records_out=int(self.boardings.sum() + self.alightings.sum()),
+                     bytes_read=stream.bytes_read)
+        print(f"Counted {int(self.boardings.sum())} boardings and {int(self.alightings.sum())} alightings "
+              f"at {int(np.count_nonzero(self.boardings.sum(axis=1) + self.alightings.sum(axis=1)))} stops.")
+
+    def _process_event(self, elem):
+        e_type = elem.get("type")
+
+        if e_type == "PersonEntersVehicle" or e_type == "PersonLeavesVehicle":
+            code = self.vehicle_index.bus_code(elem.get("vehicle"))
+            # The transit driver also enters and leaves the vehicle
+            if code < 0 or elem.get("person").startswith("pt_"): return
+            stop = self._stop_of_vehicle[code]
+            if stop < 0:
+                self.unknown_stop_events += 1
+                return
+            self._stops.append(stop)
+            self._times.append(float(elem.get("time")))
+            self._boarding.append(e_type == "PersonEntersVehicle")
+            if len(self._stops) >= self.buffer_size:
+                self._flush()
+
+        elif e_type == "VehicleArrivesAtFacility":
+            code = self.vehicle_index.bus_code(elem.get("vehicle"))
+            if code >= 0:
+                self._stop_of_vehicle[code] = self.ids.stop.encode(elem.get("facility"))
+
+        elif e_type == "TransitDriverStarts":
+            code = self.vehicle_index.bus_code(elem.get("vehicleId"))
+            # New departure: not at a stop until its first arrival
+            if code >= 0:
+                self._stop_of_vehicle[code] = UNKNOWN_CODE
+
+    def finish(self):
+        self._flush()
+
+    def _flush(self):
+        if not self._stops:
+            return
+        stops = np.asarray(self._stops, dtype=np.int64)
+        hours = (np.asarray(self._times, dtype=np.float64) // 3600).astype(np.int64)
+        boarding = np.asarray(self._boarding, dtype=np.bool_)
+        self._stops, self._times, self._boarding = [], [], []
+
+        n_stops = max(len(self.ids.stop), self.boardings.shape[0])
+        n_hours = max(int(hours.max()) + 1, self.boardings.shape[1])
+        self.boardings = grow_array(self.boardings, (n_stops, n_hours))
+        self.alightings = grow_array(self.alightings, (n_stops, n_hours))
+        keys = stops * n_hours + hours
+        size = n_stops * n_hours
+        self.boardings += np.bincount(keys[boarding], minlength=size).reshape(n_stops, n_hours)
+        self.alightings += np.bincount(keys[~boarding], minlength=size).reshape(n_stops, n_hours)
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """Boardings and alightings per stop and hour (stop-hours with activity only)."""
+        self._flush()
+        stops, hours = np.nonzero(self.boardings + self.alightings)
+        return pd.DataFrame({
+            "stopId": self.ids.stop.decode_array(stops),
+            "hour": hours,
+            "boardings": self.boardings[stops, hours],
+            "alightings": self.alightings[stops, hours]
+        })
+
+    def get_stop_totals(self) -> pd.DataFrame:
+        """Daily boardings and alightings per stop, busiest stops first."""
+        self._flush()
+        boardings, alightings = self.boardings.sum(axis=1), self.alightings.sum(axis=1)
+        stops = np.flatnonzero(boardings + alightings)
+        df = pd.DataFrame({
+            "stopId": self.ids.stop.decode_array(stops),
+            "boardings": boardings[stops],
+            "alightings": alightings[stops],
+            "activity": boardings[stops] + alightings[stops]
+        })
+        return df.sort_values(["activity", "stopId"], ascending=[False, True], kind="stable").reset_index(drop=True)
+
+    def summary(self) -> Dict[str, float]:
+        """Network wide boardings, alightings and how concentrated they are on the busiest stops."""
+        totals = self.get_stop_totals()
+        activity = totals["activity"].to_numpy(dtype=np.float64)
+        total = float(activity.sum())
+        top_count = max(len(activity) // 10, 1)
+        return {
+            "boardings": int(totals["boardings"].sum()),
+            "alightings": int(totals["alightings"].sum()),
+            "active_stops": len(totals),
+            "mean_boardings_per_active_stop": float(totals["boardings"].mean()) if len(totals) else 0.0,
+            "top_decile_stops_activity_percentage": float(activity[:top_count].sum()) / total * 100 if total > 0 else 0.0,
+            "unknown_stop_events": self.unknown_stop_events
+        }
+
+    def save_stop_activity_to_csv(self, output_path: str):
+        print(f"Saving stop boardings/alightings to: {output_path}")
+        df = self.get_dataframe()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
+
+    def save_stop_totals_to_csv(self, output_path: str):
+        print(f"Saving stop activity totals to: {output_path}")
+        df = self.get_stop_totals()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
@@ -0,0 +1,143 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+from src.modules.core_data_processor.vehicle_processor import is_bus_type
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.utils.file_utils import save_csv_from_columns
+from src.utils.id_dictionary import IdDictionary, ID_DICTIONARY
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+
+# Vehicle types of a sequence are joined with this (the ridership lists use "|")
+SEQUENCE_SEPARATOR = ">"
+
+class TripStructurePrepareData:
+    """
+    Leg structure of the PT trips: transfers per trip (vehicles boarded - 1), the share of
+    trips with 0/1/2+ transfers, bus-only vs. bus-and-other-mode trips and the distribution
+    of vehicle type sequences (e.g. bus>bus, bus>train).
+
+    Works on the vehicles of the ridership records in CSR layout (offsets into a flat array
+    of vehicle type codes): counts come from np.diff/np.bincount and the sequences from one
+    np.unique over a padded code matrix, with no per-trip Python.
+    """
+    def __init__(self, ridership_csv_path: Optional[str] = None, ridership: Optional[RidershipPrepareData] = None,
+                 id_dictionary: Optional[IdDictionary] = None):
+        self.ridership_csv_path = ridership_csv_path
+        self.ridership = ridership
+        self.ids = ridership.ids if ridership is not None else (id_dictionary or ID_DICTIONARY)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.type_codes = np.zeros(0, dtype=np.int32)
+        self.bus_legs = np.zeros(0, dtype=np.int64)
+        self.sequences = np.zeros((0, 0), dtype=np.int32)
+        self.sequence_counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def legs(self) -> np.ndarray:
+        """Vehicles boarded per PT trip."""
+        return np.diff(self.offsets)
+
+    @property
+    def transfers(self) -> np.ndarray:
+        return np.maximum(self.legs - 1, 0)
+
+    def _load_csv(self):
+        """(offsets, type codes, main modes) from the vehTypeList column of the ridership CSV."""
+        df = pd.read_csv(self.ridership_csv_path, usecols=["mainMode", "vehTypeList"], dtype=str)
+        record_stage(records_in=len(df), bytes_read=file_size(self.ridership_csv_path))
+        type_lists = df["vehTypeList"].fillna("").str.split("|")
+        lengths = type_lists.str.len().to_numpy(dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        type_codes = self.ids.vehicle_type.encode_many(type_lists.explode().dropna())
+        return offsets, type_codes, df["mainMode"].to_numpy(dtype=object)
+
+    @track_stage("trip_structure.process")
+    def process(self):
+        if self.ridership is not None:
+            offsets, _, type_codes = self.ridership.get_vehicle_arrays()
+            main_mode = np.asarray(self.ridership.records["mainMode"], dtype=object)
+        else:
+            print(f"Analysing trip structure from: {self.ridership_csv_path}")
+            if not os.path.exists(self.ridership_csv_path):
+                raise FileNotFoundError(f"Ridership file not found at: {self.ridership_csv_path}")
+            offsets, type_codes, main_mode = self._load_csv()
+
+        # PT trips only: select their leg ranges of the flat arrays
+        lengths = np.diff(offsets)
+        is_pt = main_mode == "pt"
+        type_codes = type_codes[np.repeat(is_pt, lengths)]
+        lengths = lengths[is_pt]
+        self.offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.type_codes = type_codes
+
+        # Bus legs per trip: bus flag per vehicle type, summed per trip
+        n_trips = len(lengths)
+        trip_of_leg = np.repeat(np.arange(n_trips), lengths)
+        type_is_bus = np.array([is_bus_type(t, None) for t in self.ids.vehicle_type.ids()], dtype=np.bool_)
+        leg_is_bus = type_is_bus[type_codes] if len(type_is_bus) else np.zeros(len(type_codes), dtype=np.bool_)
+        self.bus_legs = np.bincount(trip_of_leg, weights=leg_is_bus, minlength=n_trips).astype(np.int64)
+
+        # Vehicle type sequences: one padded row per trip, counted with np.unique over rows
+        width = int(lengths.max()) if n_trips else 0
+        matrix = np.full((n_trips, width), -1, dtype=np.int32)
+        position = np.arange(len(type_codes)) - self.offsets[trip_of_leg]
+        matrix[trip_of_leg, position] = type_codes
+        if n_trips:
+            self.sequences, self.sequence_counts = np.unique(matrix, axis=0, return_counts=True)
+
+        record_stage(records_out=n_trips)
+        print(f"Analysed {n_trips} PT trips ({len(self.sequence_counts)} vehicle type sequences).")
+
+    def summary(self) -> Dict[str, float]:
+        """Transfer and mode combination shares of the PT trips (percentages)."""
+        legs, transfers, bus_legs = self.legs, self.transfers, self.bus_legs
+        n = len(legs)
+        def percentage(mask: np.ndarray) -> float:
+            return float(np.count_nonzero(mask)) / n * 100 if n > 0 else 0.0
+        return {
+            "pt_trips": n,
+            "mean_transfers": float(transfers.mean()) if n > 0 else 0.0,
+            "transfer_0_percentage": percentage(transfers == 0),
+            "transfer_1_percentage": percentage(transfers == 1),
+            "transfer_2plus_percentage": percentage(transfers >= 2),
+            "bus_only_percentage": percentage((bus_legs == legs) & (legs > 0)),
+            "bus_with_other_percentage": percentage((bus_legs > 0) & (bus_legs < legs)),
+            "no_bus_percentage": percentage(bus_legs == 0)
+        }
+
+    def get_transfer_distribution(self) -> pd.DataFrame:
+        """PT trips per number of transfers."""
+        counts = np.bincount(self.transfers)
+        total = max(int(counts.sum()), 1)
+        return pd.DataFrame({
+            "transfers": np.arange(len(counts)),
+            "trips": counts,
+            "percentage": counts / total * 100
+        })
+
+    def get_sequence_distribution(self) -> pd.DataFrame:
+        """PT trips per vehicle type sequence (most frequent first)."""
+        decode = self.ids.vehicle_type.decode
+        labels = [SEQUENCE_SEPARATOR.join(decode(c) for c in row if c >= 0) for row in self.sequences.tolist()]
+        legs = (self.sequences >= 0).sum(axis=1) if len(self.sequences) else np.zeros(0, dtype=np.int64)
+        total = max(int(self.sequence_counts.sum()), 1)
+        df = pd.DataFrame({
+            "sequence": labels,
+            "legs": legs,
+            "transfers": np.maximum(legs - 1, 0),
+            "trips": self.sequence_counts,
+            "percentage": self.sequence_counts / total * 100
+        })
+        return df.sort_values(["trips", "sequence"], ascending=[False, True], kind="stable").reset_index(drop=True)
+
+    def save_transfer_distribution_to_csv(self, output_path: str):
+        print(f"Saving transfer distribution to: {output_path}")
+        df = self.get_transfer_distribution()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
+
+    def save_sequence_distribution_to_csv(self, output_path: str):
+        print(f"Saving vehicle type sequences to: {output_path}")
+        df = self.get_sequence_distribution()
+        save_csv_from_columns({c: df[c].tolist() for c in df.columns}, output_path)
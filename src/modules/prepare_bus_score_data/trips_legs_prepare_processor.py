@@ -0,0 +1,219 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+from src.modules.core_data_processor.vehicle_processor import VehicleTypeIndex
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData, TOTAL_RIDERS
+from src.utils.id_dictionary import IdDictionary
+from src.utils.metrics_utils import track_stage, record_stage, file_size
+from src.utils.sketch_utils import stable_hash64, DEFAULT_HLL_PRECISION
+from src.utils.time_bin_utils import DEFAULT_BIN_SIZE, DEFAULT_NUM_BINS
+
+# pyarrow is optional: its CSV reader is multithreaded, else pandas' C parser is used
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# Only these columns of MATSim's output_trips.csv / output_legs.csv are read
+TRIPS_COLUMNS = ["person", "trip_id", "dep_time", "trav_time", "main_mode"]
+LEGS_COLUMNS = ["person", "trip_id", "dep_time", "wait_time", "vehicle_id", "transit_route"]
+
+def parse_matsim_time(values) -> np.ndarray:
+    """MATSim HH:MM:SS times (hours may pass 24) or plain seconds to float seconds; blanks give NaN."""
+    values = pd.Series(values, dtype=object).astype(str)
+    parts = values.str.split(":", expand=True)
+    if parts.shape[1] == 1:
+        return pd.to_numeric(parts[0], errors="coerce").to_numpy(dtype=np.float64)
+    seconds = np.zeros(len(values), dtype=np.float64)
+    for column, scale in zip(parts.columns, (3600.0, 60.0, 1.0)):
+        seconds += pd.to_numeric(parts[column], errors="coerce").to_numpy(dtype=np.float64) * scale
+    return seconds
+
+def read_matsim_table(path: str, columns: List[str]) -> pd.DataFrame:
+    """
+    Reads the given columns of a semicolon-delimited MATSim table (.csv or .csv.gz) as
+    strings. Columns missing from the file are left out.
+    """
+    header = pd.read_csv(path, sep=";", nrows=0).columns
+    usecols = [c for c in columns if c in header]
+    return pd.read_csv(path, sep=";", usecols=usecols, dtype=str, engine=CSV_ENGINE)
+
+class TripsLegsPrepareData(RidershipPrepareData):
+    """
+    Ridership records from MATSim's output_trips.csv and output_legs.csv instead of the
+    events file: the same trips, main modes, vehicles, bus flags, travel times, time series
+    and sketches as RidershipPrepareData, built column-wise from two small tables.
+
+    Trips without a vehicle leg (pure walking) are dropped, like in the events pass.
+    With a time window, trips departing in the window are kept and travel times are
+    censored at the window end.
+    """
+    def __init__(self, trips_path: str, legs_path: str, vehicle_type_path: str,
+                 id_dictionary: Optional[IdDictionary] = None, vehicle_types_path: Optional[str] = None,
+                 bin_size: float = DEFAULT_BIN_SIZE, num_bins: int = DEFAULT_NUM_BINS,
+                 time_window: Optional[Tuple[float, float]] = None,
+                 vehicle_index: Optional[VehicleTypeIndex] = None, distinct_counting: str = "exact",
+                 hll_precision: int = DEFAULT_HLL_PRECISION):
+        super().__init__(trips_path, vehicle_type_path, id_dictionary=id_dictionary,
+                         vehicle_types_path=vehicle_types_path, bin_size=bin_size, num_bins=num_bins,
+                         time_window=time_window, vehicle_index=vehicle_index,
+                         distinct_counting=distinct_counting, hll_precision=hll_precision)
+        self.trips_path = trips_path
+        self.legs_path = legs_path
+
+    @track_stage("trips_legs_prepare.process")
+    def process(self):
+        """
+        Extracts ridership trip data from the trips and legs tables.
+        """
+        print(f"Processing trips from: {self.trips_path}")
+        print(f"Processing legs from: {self.legs_path}")
+        for path in (self.trips_path, self.legs_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"MATSim table not found at: {path}")
+
+        trips = read_matsim_table(self.trips_path, TRIPS_COLUMNS)
+        legs = read_matsim_table(self.legs_path, LEGS_COLUMNS)
+        records_in = len(trips) + len(legs)
+
+        start = parse_matsim_time(trips["dep_time"])
+        end = start + parse_matsim_time(trips["trav_time"])
+        if self.time_window is not None:
+            window_start, window_end = self.time_window
+            in_window = (start >= window_start) & (start < window_end)
+            trips, start, end = trips[in_window], start[in_window], end[in_window]
+            self.truncated_trips = int(np.count_nonzero(end > window_end))
+            end = np.minimum(end, window_end)
+        trips = trips.assign(startTime=start, travelTime=end - start)
+
+        # Vehicle legs, in file order, with the vehicle classification of the index
+        legs = legs[legs["vehicle_id"].notna() & (legs["vehicle_id"] != "")]
+        veh_codes = self.ids.vehicle.encode_many(legs["vehicle_id"])
+        index = self.vehicle_index
+        known = veh_codes < len(index.vehicle_type_codes)
+        type_codes = np.full(len(veh_codes), self._unknown_type_code, dtype=np.int32)
+        type_codes[known] = index.vehicle_type_codes[veh_codes[known]]
+        is_bus = np.zeros(len(veh_codes), dtype=np.bool_)
+        is_bus[known] = index.is_bus[veh_codes[known]]
+
+        # Inner join: trips without a vehicle leg are dropped
+        trips = trips.join(self._group_legs(legs["trip_id"], veh_codes, type_codes, is_bus), on="trip_id", how="inner")
+
+        self._fill_records(trips)
+        self._add_boardings(legs[is_bus], trips)
+        self.finish()
+
+        record_count = len(self.records["personCode"])
+        record_stage(records_in=records_in, records_out=record_count,
+                     bytes_read=file_size(self.trips_path) + file_size(self.legs_path))
+        print(f"Extracted {record_count} ridership records.")
+
+    @staticmethod
+    def _group_legs(trip_ids: pd.Series, veh_codes: np.ndarray, type_codes: np.ndarray,
+                    is_bus: np.ndarray) -> pd.DataFrame:
+        """Per trip id: vehicle and type code tuples (leg order) and the bus flag, vectorized."""
+        trip_codes, unique_trips = pd.factorize(trip_ids)
+        if len(trip_codes) == 0:
+            return pd.DataFrame({"vehCodes": [], "vehTypeCodes": [], "usesBus": []}, index=unique_trips)
+        # Stable sort keeps the leg order inside each trip; codes run 0..n-1 like unique_trips
+        order = np.argsort(trip_codes, kind="stable")
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(trip_codes[order])) + 1))
+        ends = np.append(starts[1:], len(order)).tolist()
+        vehicles, types = veh_codes[order].tolist(), type_codes[order].tolist()
+        return pd.DataFrame({
+            "vehCodes": [tuple(vehicles[a:b]) for a, b in zip(starts.tolist(), ends)],
+            "vehTypeCodes": [tuple(types[a:b]) for a, b in zip(starts.tolist(), ends)],
+            "usesBus": np.logical_or.reduceat(is_bus[order], starts)
+        }, index=unique_trips)
+
+    def _fill_records(self, trips: pd.DataFrame):
+        """Ridership records, time series and travel time sketches of the kept trips."""
+        person_codes = self.ids.person.encode_many(trips["person"])
+        main_mode = trips["main_mode"].to_numpy(dtype=object)
+        start = trips["startTime"].to_numpy(dtype=np.float64)
+        travel = trips["travelTime"].to_numpy(dtype=np.float64)
+        uses_bus = trips["usesBus"].to_numpy(dtype=np.bool_)
+
+        records = self.records
+        records["personCode"].extend(person_codes.tolist())
+        records["vehCodes"].extend(trips["vehCodes"].tolist())
+        records["vehTypeCodes"].extend(trips["vehTypeCodes"].tolist())
+        records["mainMode"].extend(main_mode.tolist())
+        records["startTime"].extend(start.tolist())
+        records["travelTime"].extend(travel.tolist())
+        records["usesBus"].extend(uses_bus.tolist())
+
+        car, pt = main_mode == "car", main_mode == "pt"
+        bus = pt & uses_bus
+        bins = self.time_bins
+        bins.add_many("trips", start)
+        for mode, mask in (("car", car), ("pt", pt), ("bus", bus)):
+            bins.add_many(f"{mode}_trips", start[mask])
+            bins.add_many(f"{mode}_travel_time", start[mask], travel[mask])
+            self.travel_time_sketches[mode].add_many(travel[mask])
+
+        bus_persons = trips["person"][uses_bus]
+        if self.distinct_riders:
+            total = self.distinct_riders[TOTAL_RIDERS]
+            for person_id in bus_persons.unique():
+                total.add_hash(stable_hash64(person_id))
+        else:
+            self._bus_persons.update(person_codes[uses_bus].tolist())
+
+    def _add_boardings(self, bus_legs: pd.DataFrame, trips: pd.DataFrame):
+        """Bus boardings (leg departure + wait) of the kept trips, per hour and route in HyperLogLog mode."""
+        bus_legs = bus_legs[bus_legs["trip_id"].isin(trips["trip_id"])]
+        boarding = parse_matsim_time(bus_legs["dep_time"])
+        if "wait_time" in bus_legs.columns:
+            boarding = boarding + np.nan_to_num(parse_matsim_time(bus_legs["wait_time"]))
+        if self.time_window is not None:
+            in_window = boarding < self.time_window[1]
+            bus_legs, boarding = bus_legs[in_window], boarding[in_window]
+        self.time_bins.add_many("bus_boardings", boarding)
+
+        if not self.distinct_riders:
+            return
+        routes = bus_legs["transit_route"] if "transit_route" in bus_legs.columns else [None] * len(bus_legs)
+        hashes: Dict[str, int] = {}
+        for person_id, time, route_id in zip(bus_legs["person"], boarding.tolist(), routes):
+            person_hash = hashes.get(person_id)
+            if person_hash is None:
+                person_hash = hashes[person_id] = stable_hash64(person_id)
+            self._riders_counter(f"hour_{int(time // 3600):02d}").add_hash(person_hash)
+            if isinstance(route_id, str) and route_id:
+                self._riders_counter(f"route_{route_id}").add_hash(person_hash)
+
+    def check_parity(self, reference: RidershipPrepareData, time_tolerance: float = 2.0) -> Dict[str, Any]:
+        """
+        Compares the records with those of an events-based RidershipPrepareData over the same
+        run. Trips are paired by person and order of departure; a pair matches if main mode and
+        bus flag agree and start and travel times differ by at most time_tolerance seconds
+        (the tables store whole seconds).
+        """
+        columns = ["personId", "mainMode", "startTime", "travelTime", "usesBus"]
+        ours = self.get_dataframe()[columns]
+        theirs = reference.get_dataframe()[columns]
+        for df in (ours, theirs):
+            df.sort_values(["personId", "startTime"], inplace=True, kind="stable")
+            df["tripNumber"] = df.groupby("personId").cumcount()
+        pairs = ours.merge(theirs, on=["personId", "tripNumber"], suffixes=("", "Events"))
+        travel_diff = (pairs["travelTime"] - pairs["travelTimeEvents"]).abs()
+        matched = ((pairs["mainMode"] == pairs["mainModeEvents"])
+                   & (pairs["usesBus"].astype(bool) == pairs["usesBusEvents"].astype(bool))
+                   & ((pairs["startTime"] - pairs["startTimeEvents"]).abs() <= time_tolerance)
+                   & (travel_diff <= time_tolerance))
+
+        summary, reference_summary = self.summary(), reference.summary()
+        result = {
+            "trips": len(ours),
+            "reference_trips": len(theirs),
+            "matched_trips": int(matched.sum()),
+            "match_percentage": float(matched.sum()) / max(len(ours), len(theirs), 1) * 100,
+            "max_travel_time_diff": float(travel_diff.max()) if len(pairs) else 0.0,
+            "summary_diff": {key: summary[key] - reference_summary[key] for key in summary}
+        }
+        print(f"[Parity] {result['matched_trips']} of {result['trips']} trips match the events-based records "
+              f"({result['reference_trips']} trips, {result['match_percentage']:.2f}%).")
+        return result
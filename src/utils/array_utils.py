@@ -0,0 +1,15 @@
+import numpy as np
+from typing import Tuple, Union
+
+def grow_array(array: np.ndarray, shape: Union[int, Tuple[int, ...]]) -> np.ndarray:
+    """
+    Zero-pads an accumulator array indexed by code (route, stop, hour, ...) to at least
+    shape; the array itself is returned when it is already large enough.
+    """
+    shape = (shape,) if isinstance(shape, int) else tuple(shape)
+    shape = tuple(max(size, current) for size, current in zip(shape, array.shape))
+    if shape == array.shape:
+        return array
+    grown = np.zeros(shape, dtype=array.dtype)
+    grown[tuple(slice(0, n) for n in array.shape)] = array
+    return grown
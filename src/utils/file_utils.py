@@ -1,7 +1,7 @@
 import csv
 import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 def save_csv_from_list(data: List[Dict[str, Any]], output_path: str):
     if not data:
@@ -42,3 +42,86 @@ def save_json(data: Any, output_path: str, indent: int = 4):
     except Exception as e:
         print(f"Error saving JSON to {output_path}: {e}")
         raise
+
+def save_csv_from_columns(columns: Dict[str, List[Any]], output_path: str):
+    if not columns or not next(iter(columns.values()), None):
+        print(f"No data to save to {output_path}")
+        return
+
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # Columnar data: every value is a list of the same length
+        keys = list(columns.keys())
+        row_count = len(columns[keys[0]])
+
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(keys)
+            writer.writerows(zip(*(columns[k] for k in keys)))
+
+        print(f"Successfully saved {row_count} rows to {output_path}")
+
+    except Exception as e:
+        print(f"Error saving CSV to {output_path}: {e}")
+        raise
+
+def memmap_sidecar_paths(npy_path: str) -> Tuple[str, str]:
+    """Returns the (ids, metadata) sidecar paths of a memory-mapped .npy cache."""
+    base = npy_path[:-4] if npy_path.endswith('.npy') else npy_path
+    return base + '.ids.txt', base + '.meta.json'
+
+def save_memmap_array(array, output_path: str, ids: Optional[List[str]] = None, columns: Optional[List[str]] = None):
+    """
+    Writes a 2D float64 array as a .npy file that can be memory-mapped, an optional
+    id sidecar (one id per line, same row order) and a small JSON metadata file.
+    """
+    import numpy as np
+
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        data = np.asarray(array, dtype=np.float64)
+        if data.ndim != 2:
+            data = data.reshape(len(data), len(columns) if columns else -1)
+
+        mm = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float64, shape=data.shape)
+        mm[:] = data
+        mm.flush()
+        del mm
+
+        ids_path, meta_path = memmap_sidecar_paths(output_path)
+        if ids is not None:
+            with open(ids_path, 'w', encoding='utf-8') as f:
+                f.writelines(f"{i}\n" for i in ids)
+
+        meta = {
+            "count": int(data.shape[0]),
+            "shape": list(data.shape),
+            "dtype": "float64",
+            "columns": columns or [],
+            "ids_file": os.path.basename(ids_path) if ids is not None else None
+        }
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=4)
+
+        print(f"Successfully saved {data.shape[0]} rows to {output_path}")
+
+    except Exception as e:
+        print(f"Error saving memmap array to {output_path}: {e}")
+        raise
+
+def load_memmap_array(npy_path: str):
+    """Opens a .npy cache read-only as a memory map (no data is copied into RAM)."""
+    import numpy as np
+    return np.load(npy_path, mmap_mode='r')
+
+def load_memmap_ids(npy_path: str) -> List[str]:
+    ids_path, _ = memmap_sidecar_paths(npy_path)
+    with open(ids_path, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+
+def read_memmap_meta(npy_path: str) -> Dict[str, Any]:
+    """Reads the metadata sidecar of a .npy cache (e.g. the row count)."""
+    _, meta_path = memmap_sidecar_paths(npy_path)
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
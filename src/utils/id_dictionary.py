@@ -0,0 +1,129 @@
+import json
+import os
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+
+# ID namespaces used by the processors. Codes are only unique inside a namespace.
+PERSON = "person"
+VEHICLE = "vehicle"
+VEHICLE_TYPE = "vehicle_type"
+STOP = "stop"
+LINK = "link"
+NODE = "node"
+ROUTE = "route"
+NAMESPACES = [PERSON, VEHICLE, VEHICLE_TYPE, STOP, LINK, NODE, ROUTE]
+
+# Code returned by lookup() for IDs that were never encoded
+UNKNOWN_CODE = -1
+
+class IdNamespace:
+    """
+    Maps the string IDs of one namespace to dense int32 codes (0, 1, 2, ... in first-seen order)
+    and back. Codes are stable for the lifetime of the dictionary, so they can index NumPy arrays.
+    """
+    def __init__(self, name: str):
+        self.name: str = name
+        self._codes: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._ids_array: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._codes
+
+    def encode(self, id_: str) -> int:
+        """Returns the code of id_, assigning the next free code if it is new."""
+        code = self._codes.get(id_)
+        if code is None:
+            code = len(self._ids)
+            self._codes[id_] = code
+            self._ids.append(id_)
+            self._ids_array = None
+        return code
+
+    def lookup(self, id_: str) -> int:
+        """Returns the code of id_ without registering it (UNKNOWN_CODE if never encoded)."""
+        return self._codes.get(id_, UNKNOWN_CODE)
+
+    def encode_many(self, ids: Iterable[str]) -> np.ndarray:
+        encode = self.encode
+        return np.fromiter((encode(str(i)) for i in ids), dtype=np.int32)
+
+    def decode(self, code: int) -> Optional[str]:
+        return self._ids[code] if 0 <= code < len(self._ids) else None
+
+    def decode_array(self, codes) -> np.ndarray:
+        """Vectorized reverse lookup; unknown/negative codes decode to None."""
+        if self._ids_array is None:
+            self._ids_array = np.array(self._ids + [None], dtype=object)
+        codes = np.asarray(codes, dtype=np.int64)
+        # The trailing None slot absorbs UNKNOWN_CODE
+        return self._ids_array[np.where(codes >= 0, codes, len(self._ids))]
+
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+class IdDictionary:
+    """
+    Shared ID dictionary service: one IdNamespace per ID kind (person, vehicle, stop, ...).
+    Processors encode IDs while parsing, keep integer codes in their hot-path maps and
+    decode back to strings only when writing output.
+    """
+    def __init__(self):
+        self._namespaces: Dict[str, IdNamespace] = {}
+        for name in NAMESPACES:
+            self.namespace(name)
+
+    def namespace(self, name: str) -> IdNamespace:
+        ns = self._namespaces.get(name)
+        if ns is None:
+            ns = IdNamespace(name)
+            self._namespaces[name] = ns
+        return ns
+
+    def __getattr__(self, name: str) -> IdNamespace:
+        # Dot access to namespaces, e.g. ids.person.encode("p1")
+        namespaces = self.__dict__.get("_namespaces", {})
+        if name in namespaces:
+            return namespaces[name]
+        raise AttributeError(f"'IdDictionary' object has no attribute '{name}'")
+
+    def encode(self, namespace: str, id_: str) -> int:
+        return self.namespace(namespace).encode(id_)
+
+    def decode(self, namespace: str, code: int) -> Optional[str]:
+        return self.namespace(namespace).decode(code)
+
+    def decode_array(self, namespace: str, codes) -> np.ndarray:
+        return self.namespace(namespace).decode_array(codes)
+
+    def sizes(self) -> Dict[str, int]:
+        return {name: len(ns) for name, ns in self._namespaces.items()}
+
+    def reset(self):
+        self._namespaces = {}
+        for name in NAMESPACES:
+            self.namespace(name)
+
+    def save_json(self, output_path: str):
+        """Saves every namespace as code-ordered ID lists, so codes can be shared between processes."""
+        print(f"Saving ID dictionary to: {output_path}")
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({name: ns._ids for name, ns in self._namespaces.items()}, f, ensure_ascii=False)
+
+    @classmethod
+    def load_json(cls, input_path: str) -> "IdDictionary":
+        ids = cls()
+        with open(input_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for name, id_list in data.items():
+            ns = ids.namespace(name)
+            for id_ in id_list:
+                ns.encode(id_)
+        return ids
+
+# Dictionary shared by all processors of a run (codes agree across processors in one process)
+ID_DICTIONARY = IdDictionary()
@@ -0,0 +1,185 @@
+import cProfile
+import functools
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set
+from src.utils.file_utils import save_json
+
+# Peak RSS: 'resource' on Linux/macOS, psutil (optional) on Windows
+try:
+    import resource
+    USE_RESOURCE = True
+except ImportError:
+    USE_RESOURCE = False
+
+try:
+    import psutil
+    USE_PSUTIL = True
+except ImportError:
+    USE_PSUTIL = False
+
+# Opt-in profiling: BUS_SCORE_PROFILE=all or a comma separated list of stage names
+PROFILE_ENV = "BUS_SCORE_PROFILE"
+PROFILE_DIR_ENV = "BUS_SCORE_PROFILE_DIR"
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB (None if unavailable)."""
+    if USE_RESOURCE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KB on Linux but in bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if USE_PSUTIL:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+class StageMetrics:
+    def __init__(self, name: str):
+        self.name: str = name
+        self.status: str = "ok"
+        self.wall_time_s: float = 0.0
+        self.cpu_time_s: float = 0.0
+        self.peak_rss_delta_mb: Optional[float] = None
+        self.records_in: Optional[int] = None
+        self.records_out: Optional[int] = None
+        self.events_per_sec: Optional[float] = None
+        self.bytes_read: Optional[int] = None
+        self.extra: Dict[str, Any] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {k: v for k, v in self.__dict__.items() if k != "extra"}
+        data.update(self.extra)
+        return data
+
+class MetricsRegistry:
+    """
+    Collects one StageMetrics record per executed stage (processor or scoring call).
+    Always on; only stages selected for profiling pay for cProfile/tracemalloc.
+    """
+    def __init__(self):
+        self.stages: List[StageMetrics] = []
+        self._active: List[StageMetrics] = []
+        profile_env = os.environ.get(PROFILE_ENV, "").strip()
+        self.profile_stages: Set[str] = {s.strip() for s in profile_env.split(",") if s.strip()}
+        self.profile_dir: str = os.environ.get(PROFILE_DIR_ENV, "profiles")
+        self._profiling = False
+
+    def enable_profiling(self, stages: Optional[List[str]] = None, output_dir: Optional[str] = None):
+        """Profiles the given stage names (all stages if None) with cProfile and tracemalloc."""
+        self.profile_stages = set(stages) if stages else {"all"}
+        if output_dir:
+            self.profile_dir = output_dir
+
+    def disable_profiling(self):
+        self.profile_stages = set()
+
+    def _should_profile(self, name: str) -> bool:
+        return "all" in self.profile_stages or name in self.profile_stages
+
+    @contextmanager
+    def stage(self, name: str, bytes_read: Optional[int] = None, records_in: Optional[int] = None):
+        metrics = StageMetrics(name)
+        metrics.bytes_read = bytes_read
+        metrics.records_in = records_in
+        self._active.append(metrics)
+
+        profiler = None
+        # Nested stages run inside the outer profile (only one profiler may be active)
+        if not self._profiling and self._should_profile(name):
+            self._profiling = True
+            profiler = cProfile.Profile()
+            tracemalloc.start()
+            profiler.enable()
+
+        rss_before = _peak_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield metrics
+        except BaseException:
+            metrics.status = "error"
+            raise
+        finally:
+            metrics.wall_time_s = time.perf_counter() - wall_start
+            metrics.cpu_time_s = time.process_time() - cpu_start
+            rss_after = _peak_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                metrics.peak_rss_delta_mb = rss_after - rss_before
+            if metrics.records_in and metrics.wall_time_s > 0:
+                metrics.events_per_sec = metrics.records_in / metrics.wall_time_s
+
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                self._save_profile(metrics, profiler)
+
+            self._active.pop()
+            self.stages.append(metrics)
+            print(f"[Metrics] {name}: {metrics.wall_time_s:.3f}s wall, {metrics.cpu_time_s:.3f}s cpu"
+                  + (f", {metrics.records_in} in" if metrics.records_in is not None else "")
+                  + (f", {metrics.records_out} out" if metrics.records_out is not None else ""))
+
+    def _save_profile(self, metrics: StageMetrics, profiler: cProfile.Profile):
+        _, traced_peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        prof_path = os.path.join(self.profile_dir, f"{metrics.name}.prof")
+        profiler.dump_stats(prof_path)
+
+        alloc_path = os.path.join(self.profile_dir, f"{metrics.name}.tracemalloc.txt")
+        with open(alloc_path, "w", encoding="utf-8") as f:
+            for stat in snapshot.statistics("lineno")[:25]:
+                f.write(f"{stat}\n")
+
+        metrics.extra["tracemalloc_peak_mb"] = traced_peak / (1024 * 1024)
+        metrics.extra["profile_path"] = prof_path
+        metrics.extra["tracemalloc_path"] = alloc_path
+
+    def record(self, **values):
+        """Sets fields (records_in, records_out, bytes_read or extra keys) on the running stage."""
+        if not self._active:
+            return
+        metrics = self._active[-1]
+        for key, value in values.items():
+            if hasattr(metrics, key) and key != "extra":
+                setattr(metrics, key, value)
+            else:
+                metrics.extra[key] = value
+
+    def reset(self):
+        self.stages = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"stages": [m.to_dict() for m in self.stages]}
+
+    def save_json(self, output_path: str):
+        print(f"Saving stage metrics to: {output_path}")
+        save_json(self.to_dict(), output_path)
+
+# Shared registry used by all processors and scoring functions
+METRICS = MetricsRegistry()
+
+def track_stage(name: str):
+    """Decorator running a function/method inside METRICS.stage(name)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_stage(**values):
+    """Shortcut for METRICS.record(...) from inside a tracked stage."""
+    METRICS.record(**values)
+
+def file_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
@@ -0,0 +1,238 @@
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional
+
+# Accuracy parameter: k=200 keeps the rank error well under 1% in about 600 stored values per 1M
+DEFAULT_K = 200
+# Capacity shrink factor between consecutive compactor levels
+_C = 2.0 / 3.0
+# 2^12 one-byte registers (4 KB): relative standard error 1.04 / sqrt(4096) = 1.6%
+DEFAULT_HLL_PRECISION = 12
+_MASK64 = (1 << 64) - 1
+
+def stable_hash64(value: str) -> int:
+    """64-bit hash of a string, identical across processes and runs (unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016) over a stream of floats.
+
+    Values are appended to level 0; when the sketch is full a level is sorted and every
+    other value (random offset) is promoted to the next level with twice the weight.
+    Memory stays bounded whatever the stream length, and sketches of disjoint streams
+    (parallel shards, iterations, scenarios) merge into a sketch of their union.
+    Up to about k values nothing is compacted and quantiles are exact.
+    """
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = 0):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.compactors: List[List[float]] = [[]]
+        self._size = 0
+        self._max_size = self._capacity(0)
+        self._rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(_C ** depth * self.k)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def add(self, value: float):
+        self.compactors[0].append(value)
+        self._size += 1
+        self.n += 1
+        if value < self.min: self.min = value
+        if value > self.max: self.max = value
+        if self._size >= self._max_size:
+            self._compress()
+
+    def add_many(self, values: Iterable[float]):
+        for value in values:
+            self.add(float(value))
+
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            items = self.compactors[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self._grow()
+            items.sort()
+            # An odd value out stays on this level, so the total weight is preserved
+            keep = [items.pop()] if len(items) % 2 else []
+            self.compactors[level + 1].extend(items[self._rng.randint(0, 1)::2])
+            self.compactors[level] = keep
+            self._size = sum(len(c) for c in self.compactors)
+            if self._size < self._max_size:
+                break
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Adds the values summarized by another sketch (in place); returns self."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._size = sum(len(c) for c in self.compactors)
+        while self._size >= self._max_size:
+            self._compress()
+        return self
+
+    def _sorted_weighted(self):
+        values = np.concatenate([np.asarray(c, dtype=np.float64) for c in self.compactors])
+        weights = np.concatenate([np.full(len(c), 2 ** level, dtype=np.float64) for level, c in enumerate(self.compactors)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Values at the given ranks q in [0, 1] (lower value at ties, like inverted_cdf)."""
+        qs = list(qs)
+        if self.n == 0:
+            return [math.nan] * len(qs)
+        values, cum_weights = self._sorted_weighted()
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+            elif q >= 1:
+                result.append(self.max)
+            else:
+                idx = int(np.searchsorted(cum_weights, q * cum_weights[-1], side="left"))
+                result.append(float(values[min(idx, len(values) - 1)]))
+        return result
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": "kll", "k": self.k, "n": self.n, "min": self.min, "max": self.max,
+                "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        sketch = cls(int(data["k"]))
+        sketch.compactors = [list(map(float, c)) for c in data["compactors"]]
+        sketch._max_size = sum(sketch._capacity(level) for level in range(len(sketch.compactors)))
+        sketch.n = int(data["n"])
+        sketch.min, sketch.max = float(data["min"]), float(data["max"])
+        sketch._size = sum(len(c) for c in sketch.compactors)
+        return sketch
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter (Flajolet et al. 2007, 64-bit hashes) in 2^p byte registers.
+
+    Each value is hashed; the first p bits pick a register, which keeps the longest run of
+    leading zeros seen in the remaining bits. The count has a relative standard error of
+    1.04 / sqrt(2^p) (1.6% at the default p=12, 4 KB) whatever the number of values, and
+    counters of disjoint or overlapping streams merge (register-wise max) into the counter
+    of their union, so shards and scenarios can be combined without double counting.
+    """
+    def __init__(self, p: int = DEFAULT_HLL_PRECISION):
+        if not 4 <= p <= 18:
+            raise ValueError(f"HyperLogLog precision must be in [4, 18], got {p}")
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+        self._value_bits = 64 - p
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value: str):
+        self.add_hash(stable_hash64(value))
+
+    def add_hash(self, hashed: int):
+        """Adds a value by its 64-bit hash (see stable_hash64)."""
+        index = hashed >> self._value_bits
+        rest = hashed & ((1 << self._value_bits) - 1)
+        # Position of the first 1 bit in the remaining bits (all zeros: bits + 1)
+        rank = self._value_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add_many(self, values: Iterable[str]):
+        for value in values:
+            self.add_hash(stable_hash64(value))
+
+    def count(self) -> float:
+        """Estimated number of distinct values added."""
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Small range correction: linear counting while many registers are still empty
+        if estimate <= 2.5 * m and zeros > 0:
+            return m * math.log(m / zeros)
+        return estimate
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Adds the values counted by another counter of the same precision (in place); returns self."""
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge HyperLogLog counters of precision {self.p} and {other.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": "hll", "p": self.p, "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        counter = cls(int(data["p"]))
+        counter.registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return counter
+
+# Sketch classes by the "type" written in to_dict (older KLL files have none)
+_SKETCH_TYPES = {"kll": KLLSketch, "hll": HyperLogLog}
+
+def _sketch_from_dict(data: Dict[str, Any]):
+    return _SKETCH_TYPES[data.get("type", "kll")].from_dict(data)
+
+def merge_sketches(sketch_sets: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merges {name: sketch} sets (e.g. from shards or scenarios) name by name into new sketches."""
+    merged: Dict[str, Any] = {}
+    for sketches in sketch_sets:
+        for name, sketch in sketches.items():
+            if name not in merged:
+                # A copy, the inputs are left unchanged
+                merged[name] = _sketch_from_dict(sketch.to_dict())
+            else:
+                merged[name].merge(sketch)
+    return merged
+
+def named_quantiles(sketches: Dict[str, KLLSketch], quantiles: List[float],
+                    name_format: str = "{name}_p{pct}") -> Dict[str, float]:
+    """Flat {key: value} of every sketch at every quantile; keys from name_format (name, pct)."""
+    result = {}
+    for name, sketch in sketches.items():
+        for q, value in zip(quantiles, sketch.quantiles(quantiles)):
+            result[name_format.format(name=name, pct=round(q * 100))] = value
+    return result
+
+def save_sketches_json(sketches: Dict[str, Any], output_path: str):
+    print(f"Saving quantile sketches to: {output_path}")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        # inf (empty sketch min/max) is written as Infinity, read back by json.load
+        json.dump({name: sketch.to_dict() for name, sketch in sketches.items()}, f)
+
+def load_sketches_json(path: str) -> Dict[str, Any]:
+    """{name: sketch} saved by save_sketches_json (KLL sketches and HyperLogLog counters)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return {name: _sketch_from_dict(data) for name, data in json.load(f).items()}
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Defaults: hourly bins over a 30 hour MATSim day (later events fall in the last bin)
+DEFAULT_BIN_SIZE = 3600.0
+DEFAULT_NUM_BINS = 30
+# Values buffered per series before one np.bincount
+BUFFER_SIZE = 1 << 14
+
+class TimeBinAccumulator:
+    """
+    Fixed-size time series: one float64 array of num_bins per series name, bin index
+    int(time // bin_size). Event handlers only append (time, weight) to a buffer; the
+    buffer is added with a single np.bincount when full, so per-event cost is two appends.
+    Times before 0 go to the first bin, times past the end to the last one.
+    """
+    def __init__(self, series: List[str], bin_size: float = DEFAULT_BIN_SIZE, num_bins: int = DEFAULT_NUM_BINS):
+        self.bin_size = float(bin_size)
+        self.num_bins = int(num_bins)
+        self.series: Dict[str, np.ndarray] = {name: np.zeros(self.num_bins, dtype=np.float64) for name in series}
+        self._times: Dict[str, List[float]] = {name: [] for name in series}
+        self._weights: Dict[str, List[float]] = {name: [] for name in series}
+
+    def add(self, name: str, time: float, weight: float = 1.0):
+        times = self._times[name]
+        times.append(time)
+        self._weights[name].append(weight)
+        if len(times) >= BUFFER_SIZE:
+            self._flush_series(name)
+
+    def add_many(self, name: str, times, weights=None):
+        """Adds arrays of times (and weights) at once, e.g. from a table instead of an event stream."""
+        times = np.asarray(times, dtype=np.float64)
+        if len(times) == 0:
+            return
+        bins = (times // self.bin_size).astype(np.int64)
+        np.clip(bins, 0, self.num_bins - 1, out=bins)
+        weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        self.series[name] += np.bincount(bins, weights=weights, minlength=self.num_bins)
+
+    def _flush_series(self, name: str):
+        times = self._times[name]
+        if not times:
+            return
+        bins = (np.asarray(times, dtype=np.float64) // self.bin_size).astype(np.int64)
+        np.clip(bins, 0, self.num_bins - 1, out=bins)
+        self.series[name] += np.bincount(bins, weights=np.asarray(self._weights[name], dtype=np.float64),
+                                         minlength=self.num_bins)
+        self._times[name] = []
+        self._weights[name] = []
+
+    def flush(self):
+        for name in self.series:
+            self._flush_series(name)
+
+    def get(self, name: str) -> np.ndarray:
+        self._flush_series(name)
+        return self.series[name]
+
+    def ratio(self, numerator: str, denominator: str, scale: float = 1.0) -> np.ndarray:
+        """Per bin numerator / denominator * scale (NaN where the denominator is 0)."""
+        num, den = self.get(numerator), self.get(denominator)
+        return np.divide(num * scale, den, out=np.full(self.num_bins, np.nan), where=den > 0)
+
+    def merge(self, other: "TimeBinAccumulator"):
+        """Adds another accumulator with the same bins (e.g. from a parallel worker)."""
+        if other.bin_size != self.bin_size or other.num_bins != self.num_bins:
+            raise ValueError("Cannot merge time bins of different sizes")
+        other.flush()
+        for name, values in other.series.items():
+            if name not in self.series:
+                self.series[name] = np.zeros(self.num_bins, dtype=np.float64)
+                self._times[name] = []
+                self._weights[name] = []
+            self.series[name] += values
+
+    def bin_starts(self) -> np.ndarray:
+        return np.arange(self.num_bins, dtype=np.float64) * self.bin_size
+
+    def get_dataframe(self, derived: Optional[Dict[str, np.ndarray]] = None) -> pd.DataFrame:
+        """One row per bin: bin start/end (seconds), every series and optional derived columns."""
+        self.flush()
+        starts = self.bin_starts()
+        data = {"binStart": starts, "binEnd": starts + self.bin_size}
+        data.update(self.series)
+        data.update(derived or {})
+        return pd.DataFrame(data)
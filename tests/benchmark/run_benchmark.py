@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config, dict_to_config
+from tests.benchmark.synthetic_scenario import generate_scenario
+
+test_name = "benchmark"
+
+# --- Stage runners (module level so they can run in a fresh worker process) ---
+
+def _paths(config: Dict, work_dir: str) -> Dict[str, str]:
+    matsim = config["data"]["matsim"]
+    return {
+        "network": matsim["static_input"]["network"],
+        "plans": matsim["static_input"]["plan"],
+        "schedule": matsim["before"]["input"]["transit_schedule"],
+        "vehicles_xml": matsim["before"]["input"]["transit_vehicle"],
+        "events": matsim["before"]["output"]["events"],
+        "vehicles_csv": os.path.join(work_dir, "vehicles.csv"),
+        "homes_npy": os.path.join(work_dir, "homes.npy"),
+        "activities_csv": os.path.join(work_dir, "plan_activities.csv"),
+        "legs_csv": os.path.join(work_dir, "plan_legs.csv"),
+        "ridership_csv": os.path.join(work_dir, "ridership.csv"),
+        "otp_csv": os.path.join(work_dir, "otp.csv"),
+        # config.yaml is written next to the scenario's test_output directory
+        "config_yaml": os.path.join(os.path.dirname(config["test"]["output"]), "config.yaml"),
+        "compare_dir": os.path.join(work_dir, "compare_flow"),
+    }
+
+def _stage_network(config, p):
+    from src.modules.core_data_processor.network_processor import NetworkData
+    NetworkData(p["network"]).process()
+
+def _stage_schedule(config, p):
+    from src.modules.core_data_processor.schedule_processor import TransitScheduleData
+    TransitScheduleData(p["schedule"]).process()
+
+def _stage_vehicles(config, p):
+    from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+    proc = VehicleData(p["vehicles_xml"])
+    proc.process()
+    proc.save_vehicles_to_csv(p["vehicles_csv"])
+    proc.save_vehicle_types_to_csv(os.path.join(os.path.dirname(p["vehicles_csv"]), VEHICLE_TYPES_CSV))
+
+def _stage_plans(config, p):
+    from src.modules.core_data_processor.plan_input_processor import PlanInputData
+    proc = PlanInputData(p["plans"])
+    proc.process()
+    proc.save_homes_to_npy(p["homes_npy"])
+    proc.save_activities_to_csv(p["activities_csv"])
+    proc.save_legs_to_csv(p["legs_csv"])
+
+def _stage_ridership_prepare(config, p):
+    from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+    proc = RidershipPrepareData(p["events"], p["vehicles_csv"])
+    proc.process()
+    proc.save_ridership_to_csv(p["ridership_csv"])
+
+def _stage_otp_prepare(config, p):
+    from src.modules.prepare_bus_score_data.on_time_performance_prepare_processor import OnTimePerformancePrepareData
+    proc = OnTimePerformancePrepareData(p["events"], p["vehicles_csv"])
+    proc.process()
+    proc.save_otp_data_to_csv(p["otp_csv"])
+
+def _stage_bus_occupancy_prepare(config, p):
+    from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+    BusOccupancyPrepareData(p["events"], p["vehicles_csv"]).process()
+
+def _stage_bus_distance_prepare(config, p):
+    from src.modules.core_data_processor.network_processor import NetworkData
+    from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+    from src.modules.prepare_bus_score_data.bus_distance_prepare_processor import BusDistancePrepareData
+    network = NetworkData(p["network"])
+    network.process()
+    occupancy = BusOccupancyPrepareData(p["events"], p["vehicles_csv"])
+    BusDistancePrepareData(p["events"], network.link_length_array(), occupancy, link_ids=network.ids).process()
+
+def _stage_events_shared(config, p):
+    from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+    from src.modules.prepare_bus_score_data.on_time_performance_prepare_processor import OnTimePerformancePrepareData
+    from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+    from src.modules.prepare_bus_score_data.events_stream import run_events_stream
+    ridership = RidershipPrepareData(p["events"], p["vehicles_csv"])
+    run_events_stream(p["events"], [
+        ridership,
+        OnTimePerformancePrepareData(p["events"], p["vehicles_csv"]),
+        BusOccupancyPrepareData(p["events"], p["vehicles_csv"], vehicle_index=ridership.vehicle_index)
+    ])
+
+def _stage_od_matrix(config, p):
+    from src.modules.core_data_processor.network_processor import NetworkData
+    from src.modules.core_data_processor.zone_processor import ZoneGrid
+    from src.modules.prepare_bus_score_data.od_matrix_prepare_processor import ODMatrixPrepareData
+    network = NetworkData(p["network"])
+    network.process()
+    grid_cfg = config["data"]["matsim"]["static_input"]["grid"]
+    grid = ZoneGrid.from_points([n.x for n in network.nodes_list], [n.y for n in network.nodes_list],
+                                grid_cfg["rows"], grid_cfg["cols"])
+    ODMatrixPrepareData(p["activities_csv"], p["ridership_csv"], grid, legs_csv_path=p["legs_csv"]).process()
+
+def _stage_coverage(config, p):
+    from src.modules.bus_scoring.service_coverage_scoring import ServiceCoveragePrepareData
+    proc = ServiceCoveragePrepareData(p["schedule"], p["homes_npy"])
+    proc.process()
+    proc.calculate_coverage(radius=400.0)
+
+def _stage_score_ridership(config, p):
+    from src.modules.bus_scoring.ridership_scoring import calculate_bus_ridership
+    calculate_bus_ridership(p["ridership_csv"], p["homes_npy"])
+
+def _stage_score_travel_time(config, p):
+    from src.modules.bus_scoring.travel_time_scoring import calculate_travel_time_scores
+    calculate_travel_time_scores(p["ridership_csv"])
+
+def _stage_score_otp(config, p):
+    from src.modules.bus_scoring.on_time_performance_scoring import calculate_otp_score
+    calculate_otp_score(p["otp_csv"], min_threshold=-180, max_threshold=180)
+
+def _stage_compare_flow(config, p):
+    # End to end: the generated config.yaml must run through the full BEFORE/AFTER compare
+    from src.modules.compare_flow.compare_flow import run_compare_flow
+    run_compare_flow(p["config_yaml"], p["compare_dir"])
+
+# Benchmark name -> (runner, metrics stage names reported for it). Order matters:
+# later stages read the files written by earlier ones.
+BENCHMARK_STAGES: Dict[str, tuple] = {
+    "network": (_stage_network, ["network.process"]),
+    "schedule": (_stage_schedule, ["schedule.process"]),
+    "vehicles": (_stage_vehicles, ["vehicles.process"]),
+    "plans": (_stage_plans, ["plans.process"]),
+    "ridership_prepare": (_stage_ridership_prepare, ["ridership_prepare.process"]),
+    "otp_prepare": (_stage_otp_prepare, ["otp_prepare.process"]),
+    "bus_occupancy_prepare": (_stage_bus_occupancy_prepare, ["bus_occupancy_prepare.process"]),
+    "bus_distance_prepare": (_stage_bus_distance_prepare, ["bus_distance_prepare.process"]),
+    "events_shared": (_stage_events_shared, ["events.stream"]),
+    "od_matrix": (_stage_od_matrix, ["od_matrix.process"]),
+    "coverage": (_stage_coverage, ["coverage.process", "coverage.calculate"]),
+    "score_ridership": (_stage_score_ridership, ["score.ridership"]),
+    "score_travel_time": (_stage_score_travel_time, ["score.travel_time"]),
+    "score_otp": (_stage_score_otp, ["score.otp"]),
+    # METRICS holds the stages of the last (AFTER) scenario of the compare flow
+    "compare_flow": (_stage_compare_flow, ["events.stream", "coverage.calculate"]),
+}
+
+def _run_stage(stage: str, config: Dict, work_dir: str) -> Dict:
+    """Runs one stage in the current (fresh) process and returns its metrics."""
+    import io
+    import contextlib
+    from src.utils.metrics_utils import METRICS, _peak_rss_mb
+
+    runner, reported = BENCHMARK_STAGES[stage]
+    METRICS.reset()
+    start = time.perf_counter()
+    # Processor progress output is not part of the benchmark report
+    with contextlib.redirect_stdout(io.StringIO()):
+        runner(config, _paths(config, work_dir))
+    wall = time.perf_counter() - start
+
+    stages = [m.to_dict() for m in METRICS.stages if m.name in reported]
+    records_in = sum(m.get("records_in") or 0 for m in stages)
+    stage_wall = sum(m["wall_time_s"] for m in stages)
+    return {
+        "wall_time_s": wall,
+        "stage_wall_time_s": stage_wall,
+        "cpu_time_s": sum(m["cpu_time_s"] for m in stages),
+        "records_in": records_in,
+        "records_out": sum(m.get("records_out") or 0 for m in stages),
+        "throughput_per_sec": (records_in / stage_wall) if stage_wall > 0 and records_in else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "metrics": stages
+    }
+
+def run_scale(target_events: int, output_dir: str, seed: int, stages: List[str]) -> Dict:
+    scenario_dir = os.path.join(output_dir, "scenarios", f"events_{target_events}")
+    config = generate_scenario(scenario_dir, target_events, seed)
+    with open(os.path.join(scenario_dir, "scenario_meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    work_dir = os.path.join(output_dir, "work", f"events_{target_events}")
+    os.makedirs(work_dir, exist_ok=True)
+
+    result = {"target_events": target_events, "events": meta["scenarios"]["before"]["events"], "stages": {}}
+    for stage in stages:
+        # A fresh process per stage keeps peak memory figures independent
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            stage_result = executor.submit(_run_stage, stage, config, work_dir).result()
+        result["stages"][stage] = stage_result
+        rate = stage_result["throughput_per_sec"]
+        print(f"  [{target_events}] {stage:<22} {stage_result['wall_time_s']:8.3f}s"
+              + (f" {rate:12.0f} rec/s" if rate else " " * 18)
+              + (f" {stage_result['peak_rss_mb']:8.1f} MB" if stage_result["peak_rss_mb"] is not None else ""))
+    return result
+
+def find_regressions(current: Dict, previous: Dict, threshold: float, min_seconds: float = 0.05) -> List[Dict]:
+    """
+    Stages whose wall time grew by more than threshold (relative) since the previous run.
+    Stages faster than min_seconds in both runs are timer noise and are not compared.
+    """
+    regressions = []
+    for scale, scale_res in current["results"].items():
+        prev_scale = previous.get("results", {}).get(scale)
+        if not prev_scale:
+            continue
+        for stage, res in scale_res["stages"].items():
+            prev = prev_scale["stages"].get(stage)
+            # Compare the tracked stage time (excludes interpreter start-up and imports)
+            key = "stage_wall_time_s" if res.get("stage_wall_time_s") else "wall_time_s"
+            if not prev or not prev.get(key):
+                continue
+            if max(res[key], prev[key]) < min_seconds:
+                continue
+            change = res[key] / prev[key] - 1.0
+            if change > threshold:
+                regressions.append({"scale": scale, "stage": stage, "previous_s": prev[key],
+                                    "current_s": res[key], "change": change})
+    return regressions
+
+def main():
+    config = load_config()
+    bench_cfg = config.get("benchmark", dict_to_config({}))
+
+    parser = argparse.ArgumentParser(description="Benchmark processors and scoring on synthetic scenarios")
+    parser.add_argument("--scales", type=int, nargs="+", default=bench_cfg.get("scales", [10000, 100000]),
+                        help="Target events per scenario, e.g. 10000 100000 1000000")
+    parser.add_argument("--output", default=bench_cfg.get("output", os.path.join(config.test.output, test_name)),
+                        help="Directory for scenarios and results")
+    parser.add_argument("--seed", type=int, default=bench_cfg.get("seed", 42))
+    parser.add_argument("--stages", nargs="+", default=list(BENCHMARK_STAGES.keys()), choices=list(BENCHMARK_STAGES.keys()))
+    parser.add_argument("--threshold", type=float, default=bench_cfg.get("regression_threshold", 0.2),
+                        help="Relative wall time increase reported as a regression")
+    args = parser.parse_args()
+
+    output_dir = args.output if os.path.isabs(args.output) else os.path.join(project_root, args.output)
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, "benchmark_results.json")
+    history_path = os.path.join(output_dir, "benchmark_history.jsonl")
+
+    previous = None
+    if os.path.exists(results_path):
+        with open(results_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": {}
+    }
+    for scale in args.scales:
+        print(f"\n--- Benchmark scale: {scale} events ---")
+        report["results"][str(scale)] = run_scale(scale, output_dir, args.seed, args.stages)
+
+    report["regressions"] = find_regressions(report, previous, args.threshold) if previous else []
+    for reg in report["regressions"]:
+        print(f"REGRESSION [{reg['scale']}] {reg['stage']}: {reg['previous_s']:.3f}s -> {reg['current_s']:.3f}s "
+              f"(+{reg['change'] * 100:.0f}%)")
+
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report) + "\n")
+    print(f"\nBenchmark results saved to: {results_path}")
+
+if __name__ == "__main__":
+    main()
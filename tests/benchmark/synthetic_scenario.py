@@ -0,0 +1,570 @@
+import gzip
+import heapq
+import json
+import math
+import os
+import random
+import yaml
+from typing import Dict, List, Optional, Tuple
+
+# Synthetic MATSim scenario: a G x G grid network, bus lines along every other
+# row/column (plus one rail line), persons commuting home -> work -> home by
+# pt, car or walk, and a time-ordered events file consistent with all of it.
+
+NODE_SPACING = 400.0        # m between grid nodes
+BUS_SPEED = 8.0             # m/s
+CAR_SPEED = 13.9            # m/s
+WALK_SPEED = 1.2            # m/s
+DWELL_TIME = 20.0           # s at every stop
+SERVICE_START = 5 * 3600.0
+SERVICE_END = 23 * 3600.0
+BUS_EVENT_SHARE = 0.3       # share of all events produced by transit vehicles
+
+MODE_SHARES = {"before": (0.40, 0.45), "after": (0.45, 0.40)} # (pt, car), rest walks
+HEADWAY_FACTOR = {"before": 1.0, "after": 0.8}
+
+def _fmt_time(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+class _Line:
+    def __init__(self, line_id: str, mode: str, nodes: List[Tuple[int, int]]):
+        self.line_id = line_id
+        self.mode = mode
+        # Two routes per line: forward over nodes, backward over reversed nodes
+        self.routes = [
+            _Route(f"{line_id}_f", self, nodes),
+            _Route(f"{line_id}_b", self, list(reversed(nodes)))
+        ]
+
+class _Route:
+    def __init__(self, route_id: str, line: _Line, nodes: List[Tuple[int, int]]):
+        self.route_id = route_id
+        self.line = line
+        self.nodes = nodes
+        # The first stop sits on the link arriving at the first node
+        first_link = _link_id(nodes[1], nodes[0])
+        self.links = [first_link] + [_link_id(a, b) for a, b in zip(nodes[:-1], nodes[1:])]
+        self.stop_ids = [f"s_{link}" for link in self.links]
+        link_time = NODE_SPACING / BUS_SPEED
+        self.arrival_offsets = [k * (link_time + DWELL_TIME) for k in range(len(nodes))]
+        self.departures: List[float] = []
+
+    def vehicle_id(self, dep_idx: int) -> str:
+        return f"{'bus' if self.line.mode == 'bus' else 'train'}_{self.route_id}_{dep_idx}"
+
+def _node_id(node: Tuple[int, int]) -> str:
+    return f"n{node[0]}_{node[1]}"
+
+def _link_id(a: Tuple[int, int], b: Tuple[int, int]) -> str:
+    return f"l{a[0]}_{a[1]}-{b[0]}_{b[1]}"
+
+def _node_xy(node: Tuple[int, int]) -> Tuple[float, float]:
+    return node[1] * NODE_SPACING, node[0] * NODE_SPACING
+
+class _PersonSpec:
+    """Scenario independent person choices (home/work, desired times, mode draw)."""
+    def __init__(self, person_id: str, route_idx: int, board: int, alight: int,
+                 morning: float, evening: float, mode_draw: float, jitter: Tuple[float, float, float, float]):
+        self.person_id = person_id
+        self.route_idx = route_idx
+        self.board = board
+        self.alight = alight
+        self.morning = morning
+        self.evening = evening
+        self.mode_draw = mode_draw
+        self.jitter = jitter
+
+class SyntheticScenarioGenerator:
+    """
+    Writes a consistent BEFORE/AFTER synthetic MATSim scenario sized for about
+    target_events events per scenario (10k .. 10M), plus a config.yaml in the
+    same layout as conf/config.yaml pointing at the generated files.
+    """
+    def __init__(self, output_dir: str, target_events: int = 100_000, seed: int = 42,
+                 compress_events: bool = False):
+        self.output_dir = output_dir
+        self.target_events = int(target_events)
+        self.seed = seed
+        self.compress_events = compress_events
+
+        self.grid_size = int(min(60, max(6, math.sqrt(self.target_events / 2000.0) + 6)))
+        self.lines: List[_Line] = []
+        self.persons: List[_PersonSpec] = []
+        self._delay_cache: Dict[Tuple[int, int], List[float]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    # ------------------------------------------------------------------ layout
+    def _build_lines(self, scenario: str):
+        g = self.grid_size
+        lines = [_Line("rail_0", "rail", [(0, c) for c in range(g)])]
+        for r in range(2, g, 2):
+            lines.append(_Line(f"row_{r}", "bus", [(r, c) for c in range(g)]))
+        for c in range(1, g, 2):
+            lines.append(_Line(f"col_{c}", "bus", [(r, c) for r in range(g)]))
+        if scenario == "after":
+            # Network edit: the last column line is dropped, a new line serves row 1
+            lines = lines[:-1] + [_Line("row_1", "bus", [(1, c) for c in range(g)])]
+        return lines
+
+    def _route_index(self, lines: List[_Line]) -> List[_Route]:
+        return [route for line in lines for route in line.routes]
+
+    def _plan_departures(self, routes: List[_Route], scenario: str):
+        per_departure = 4 * self.grid_size + 3
+        departures = max(len(routes), int(self.target_events * BUS_EVENT_SHARE / per_departure))
+        span = SERVICE_END - SERVICE_START
+        headway = span * len(routes) / departures * HEADWAY_FACTOR[scenario]
+        headway = min(7200.0, max(300.0, headway))
+        for idx, route in enumerate(routes):
+            start = SERVICE_START + (idx * 37) % int(headway)
+            count = int((SERVICE_END - start) // headway) + 1
+            route.departures = [start + k * headway for k in range(count)]
+
+    def _build_persons(self, routes: List[_Route]):
+        """Person choices are drawn from BEFORE routes only, so both scenarios share them."""
+        rng = random.Random(self.seed)
+        bus_routes = [i for i, r in enumerate(routes) if r.line.mode == "bus"]
+        bus_events = sum(len(r.departures) * (2 + 2 * len(r.nodes) + 2 * len(r.links) + 1) for r in routes)
+        person_events = max(100, self.target_events - bus_events)
+        # pt ~ 28, car ~ 2 * (8 + 2 * links), walk 8 events per person
+        avg_links = self.grid_size / 3.0
+        per_person = 0.4 * 28 + 0.45 * 2 * (8 + 2 * avg_links) + 0.15 * 8
+        count = max(10, int(person_events / per_person))
+
+        self.persons = []
+        for p in range(count):
+            route_idx = rng.choice(bus_routes) if rng.random() < 0.9 else rng.randrange(len(routes))
+            n = len(routes[route_idx].nodes)
+            board = rng.randrange(0, n - 1)
+            alight = rng.randrange(board + 1, min(n, board + 1 + max(2, n // 2)))
+            morning = rng.uniform(6 * 3600, 9 * 3600)
+            evening = rng.uniform(16 * 3600, 19 * 3600)
+            jitter = tuple(rng.uniform(-150, 150) for _ in range(4))
+            self.persons.append(_PersonSpec(str(p), route_idx, board, alight, morning, evening, rng.random(), jitter))
+
+    def _delays(self, route_idx: int, dep_idx: int, n_stops: int) -> List[float]:
+        key = (route_idx, dep_idx)
+        delays = self._delay_cache.get(key)
+        if delays is None:
+            rng = random.Random(self.seed * 1_000_003 + route_idx * 10_007 + dep_idx)
+            # Bounded steps keep every vehicle's events in stop order
+            delay = max(-50.0, rng.gauss(0, 60))
+            delays = [round(delay, 1)]
+            for _ in range(n_stops - 1):
+                delay += max(-40.0, rng.gauss(5, 30))
+                delays.append(round(delay, 1))
+            self._delay_cache[key] = delays
+        return delays
+
+    # ------------------------------------------------------------ static files
+    def _write_network(self, path: str):
+        g = self.grid_size
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<network>\n<nodes>\n')
+            for r in range(g):
+                for c in range(g):
+                    x, y = _node_xy((r, c))
+                    f.write(f'<node id="{_node_id((r, c))}" x="{x}" y="{y}" />\n')
+            f.write('</nodes>\n<links capperiod="01:00:00">\n')
+            for r in range(g):
+                for c in range(g):
+                    for dr, dc in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                        rr, cc = r + dr, c + dc
+                        if 0 <= rr < g and 0 <= cc < g:
+                            f.write(f'<link id="{_link_id((r, c), (rr, cc))}" from="{_node_id((r, c))}" '
+                                    f'to="{_node_id((rr, cc))}" length="{NODE_SPACING}" freespeed="{CAR_SPEED}" '
+                                    f'capacity="1800.0" permlanes="1.0" modes="car,pt" />\n')
+            f.write('</links>\n</network>\n')
+
+    def _write_schedule(self, path: str, lines: List[_Line]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stops = {}
+        for line in lines:
+            for route in line.routes:
+                for stop_id, link, node in zip(route.stop_ids, route.links, route.nodes):
+                    stops[stop_id] = (link, node)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<transitSchedule>\n<transitStops>\n')
+            for stop_id, (link, node) in stops.items():
+                x, y = _node_xy(node)
+                f.write(f'<stopFacility id="{stop_id}" x="{x}" y="{y}" linkRefId="{link}" isBlocking="false" />\n')
+            f.write('</transitStops>\n')
+            for line in lines:
+                f.write(f'<transitLine id="{line.line_id}">\n')
+                for route in line.routes:
+                    f.write(f'<transitRoute id="{route.route_id}">\n<transportMode>{line.mode}</transportMode>\n<routeProfile>\n')
+                    last = len(route.nodes) - 1
+                    for k, (stop_id, offset) in enumerate(zip(route.stop_ids, route.arrival_offsets)):
+                        attrs = f'refId="{stop_id}"'
+                        if k > 0:
+                            attrs += f' arrivalOffset="{_fmt_time(offset)}"'
+                        if k < last:
+                            attrs += f' departureOffset="{_fmt_time(offset + (DWELL_TIME if k > 0 else 0))}"'
+                        f.write(f'<stop {attrs} awaitDeparture="true" />\n')
+                    f.write('</routeProfile>\n<route>\n')
+                    for link in route.links:
+                        f.write(f'<link refId="{link}" />\n')
+                    f.write('</route>\n<departures>\n')
+                    for k, dep in enumerate(route.departures):
+                        f.write(f'<departure id="{route.route_id}_{k}" departureTime="{_fmt_time(dep)}" '
+                                f'vehicleRefId="{route.vehicle_id(k)}" />\n')
+                    f.write('</departures>\n</transitRoute>\n')
+                f.write('</transitLine>\n')
+            f.write('</transitSchedule>\n')
+
+    def _write_vehicles(self, path: str, lines: List[_Line]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<vehicleDefinitions xmlns="http://www.matsim.org/files/dtd">\n'
+                    '<vehicleType id="bus">\n<capacity seats="40" standingRoomInPersons="30" />\n'
+                    '<length meter="12.0" />\n<networkMode networkMode="car" />\n</vehicleType>\n'
+                    '<vehicleType id="train">\n<capacity seats="200" standingRoomInPersons="300" />\n'
+                    '<length meter="100.0" />\n<networkMode networkMode="rail" />\n</vehicleType>\n')
+            for line in lines:
+                type_id = "bus" if line.mode == "bus" else "train"
+                for route in line.routes:
+                    for k in range(len(route.departures)):
+                        f.write(f'<vehicle id="{route.vehicle_id(k)}" type="{type_id}" />\n')
+            f.write('</vehicleDefinitions>\n')
+
+    def _person_coords(self, person: _PersonSpec, routes: List[_Route]):
+        route = routes[person.route_idx]
+        hx, hy = _node_xy(route.nodes[person.board])
+        wx, wy = _node_xy(route.nodes[person.alight])
+        j = person.jitter
+        # Keep the jittered locations inside the network bounds
+        top = (self.grid_size - 1) * NODE_SPACING
+        clip = lambda v: min(top, max(0.0, v))
+        return (clip(hx + j[0]), clip(hy + j[1])), (clip(wx + j[2]), clip(wy + j[3]))
+
+    def _write_plans(self, path: str, routes: List[_Route]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pt_share, car_share = MODE_SHARES["before"]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n<population>\n')
+            for person in self.persons:
+                (hx, hy), (wx, wy) = self._person_coords(person, routes)
+                route = routes[person.route_idx]
+                mode = self._person_mode(person, "before")
+                home_link = route.links[person.board]
+                work_link = route.links[person.alight]
+                f.write(f'<person id="{person.person_id}">\n<plan score="0.0" selected="yes">\n')
+                f.write(f'<activity type="home" link="{home_link}" x="{hx:.1f}" y="{hy:.1f}" end_time="{_fmt_time(person.morning)}" />\n')
+                f.write(f'<leg mode="{mode}" dep_time="{_fmt_time(person.morning)}">\n'
+                        f'<attributes><attribute name="routingMode" class="java.lang.String">{mode}</attribute></attributes>\n</leg>\n')
+                f.write(f'<activity type="work" link="{work_link}" x="{wx:.1f}" y="{wy:.1f}" end_time="{_fmt_time(person.evening)}" />\n')
+                f.write(f'<leg mode="{mode}" dep_time="{_fmt_time(person.evening)}">\n'
+                        f'<attributes><attribute name="routingMode" class="java.lang.String">{mode}</attribute></attributes>\n</leg>\n')
+                f.write(f'<activity type="home" link="{home_link}" x="{hx:.1f}" y="{hy:.1f}" />\n')
+                f.write('</plan>\n</person>\n')
+            f.write('</population>\n')
+
+    def _person_mode(self, person: _PersonSpec, scenario: str) -> str:
+        pt_share, car_share = MODE_SHARES[scenario]
+        if person.mode_draw < pt_share:
+            return "pt"
+        if person.mode_draw < pt_share + car_share:
+            return "car"
+        return "walk"
+
+    # ------------------------------------------------------------------ events
+    def _bus_events(self, route_idx: int, route: _Route, dep_idx: int):
+        t0 = route.departures[dep_idx]
+        veh = route.vehicle_id(dep_idx)
+        driver = f"pt_{veh}"
+        delays = self._delays(route_idx, dep_idx, len(route.nodes))
+        events = [
+            (t0 - 60, f'type="TransitDriverStarts" driverId="{driver}" vehicleId="{veh}" '
+                      f'transitLineId="{route.line.line_id}" transitRouteId="{route.route_id}" departureId="{route.route_id}_{dep_idx}"'),
+            (t0 - 60, f'type="PersonEntersVehicle" person="{driver}" vehicle="{veh}"'),
+        ]
+        last_departure = t0
+        for k, (stop_id, offset) in enumerate(zip(route.stop_ids, route.arrival_offsets)):
+            arrival = t0 + offset + delays[k]
+            if k > 0:
+                link = route.links[k]
+                events.append((last_departure + 1, f'type="entered link" vehicle="{veh}" link="{link}"'))
+                events.append((arrival - 1, f'type="left link" vehicle="{veh}" link="{link}"'))
+            events.append((arrival, f'type="VehicleArrivesAtFacility" vehicle="{veh}" facility="{stop_id}" delay="{delays[k]}"'))
+            if k < len(route.nodes) - 1:
+                last_departure = arrival + DWELL_TIME
+                events.append((last_departure, f'type="VehicleDepartsAtFacility" vehicle="{veh}" facility="{stop_id}" delay="{delays[k]}"'))
+        end = t0 + route.arrival_offsets[-1] + delays[-1] + 1
+        events.append((end, f'type="PersonLeavesVehicle" person="{driver}" vehicle="{veh}"'))
+        return events
+
+    def _nearest_departure(self, route: _Route, board: int, desired: float) -> int:
+        offset = route.arrival_offsets[board]
+        best = min(range(len(route.departures)), key=lambda k: abs(route.departures[k] + offset - desired))
+        return best
+
+    def _pt_trip_events(self, person: _PersonSpec, routes: List[_Route], route_idx: int,
+                        board: int, alight: int, desired: float, from_act: str, to_act: str):
+        route = routes[route_idx]
+        dep_idx = self._nearest_departure(route, board, desired)
+        delays = self._delays(route_idx, dep_idx, len(route.nodes))
+        t0 = route.departures[dep_idx]
+        veh = route.vehicle_id(dep_idx)
+        board_arrival = t0 + route.arrival_offsets[board] + delays[board]
+        alight_arrival = t0 + route.arrival_offsets[alight] + delays[alight]
+        pid = person.person_id
+        walk = 150.0 / WALK_SPEED
+        start = board_arrival - walk - 120
+        stop_from, stop_to = route.stop_ids[board], route.stop_ids[alight]
+        link_from, link_to = route.links[board], route.links[alight]
+        # Legs: (departure, travel time, wait time, mode, vehicle, transit route)
+        pt_start = start + walk
+        legs = [
+            (start, walk, 0.0, "walk", "", ""),
+            (pt_start, alight_arrival + 1 - pt_start, board_arrival + 1 - pt_start, "pt", veh, route.route_id),
+            (alight_arrival + 1, walk, 0.0, "walk", "", ""),
+        ]
+        return start, legs, [
+            (start, f'type="actend" person="{pid}" link="{link_from}" actType="{from_act}"'),
+            (start, f'type="departure" person="{pid}" link="{link_from}" legMode="walk" computationalRoutingMode="pt"'),
+            (start + walk, f'type="arrival" person="{pid}" link="{link_from}" legMode="walk"'),
+            (start + walk, f'type="actstart" person="{pid}" link="{link_from}" actType="pt interaction"'),
+            (start + walk, f'type="actend" person="{pid}" link="{link_from}" actType="pt interaction"'),
+            (start + walk, f'type="departure" person="{pid}" link="{link_from}" legMode="pt" computationalRoutingMode="pt"'),
+            (board_arrival + 1, f'type="PersonEntersVehicle" person="{pid}" vehicle="{veh}"'),
+            (alight_arrival + 1, f'type="PersonLeavesVehicle" person="{pid}" vehicle="{veh}"'),
+            (alight_arrival + 1, f'type="arrival" person="{pid}" link="{link_to}" legMode="pt"'),
+            (alight_arrival + 1, f'type="actstart" person="{pid}" link="{link_to}" actType="pt interaction"'),
+            (alight_arrival + 1, f'type="actend" person="{pid}" link="{link_to}" actType="pt interaction"'),
+            (alight_arrival + 1, f'type="departure" person="{pid}" link="{link_to}" legMode="walk" computationalRoutingMode="pt"'),
+            (alight_arrival + 1 + walk, f'type="arrival" person="{pid}" link="{link_to}" legMode="walk"'),
+            (alight_arrival + 1 + walk, f'type="actstart" person="{pid}" link="{link_to}" actType="{to_act}"'),
+        ]
+
+    def _car_trip_events(self, person: _PersonSpec, links: List[str], depart: float, from_act: str, to_act: str):
+        pid = person.person_id
+        veh = f"car_{pid}"
+        link_time = NODE_SPACING / CAR_SPEED
+        events = [
+            (depart, f'type="actend" person="{pid}" link="{links[0]}" actType="{from_act}"'),
+            (depart, f'type="departure" person="{pid}" link="{links[0]}" legMode="car" computationalRoutingMode="car"'),
+            (depart, f'type="PersonEntersVehicle" person="{pid}" vehicle="{veh}"'),
+            (depart, f'type="vehicle enters traffic" person="{pid}" link="{links[0]}" vehicle="{veh}" networkMode="car"'),
+        ]
+        t = depart
+        for link in links[1:]:
+            events.append((t + 1, f'type="left link" vehicle="{veh}" link="{link}"'))
+            events.append((t + 1, f'type="entered link" vehicle="{veh}" link="{link}"'))
+            t += link_time
+        events += [
+            (t, f'type="vehicle leaves traffic" person="{pid}" link="{links[-1]}" vehicle="{veh}" networkMode="car"'),
+            (t, f'type="PersonLeavesVehicle" person="{pid}" vehicle="{veh}"'),
+            (t, f'type="arrival" person="{pid}" link="{links[-1]}" legMode="car"'),
+            (t, f'type="actstart" person="{pid}" link="{links[-1]}" actType="{to_act}"'),
+        ]
+        return [(depart, t - depart, 0.0, "car", veh, "")], events
+
+    def _walk_trip_events(self, person: _PersonSpec, link_from: str, link_to: str, depart: float,
+                          distance: float, from_act: str, to_act: str):
+        pid = person.person_id
+        arrive = depart + distance / WALK_SPEED
+        return [(depart, arrive - depart, 0.0, "walk", "", "")], [
+            (depart, f'type="actend" person="{pid}" link="{link_from}" actType="{from_act}"'),
+            (depart, f'type="departure" person="{pid}" link="{link_from}" legMode="walk" computationalRoutingMode="walk"'),
+            (arrive, f'type="arrival" person="{pid}" link="{link_to}" legMode="walk"'),
+            (arrive, f'type="actstart" person="{pid}" link="{link_to}" actType="{to_act}"'),
+        ]
+
+    def _person_trips(self, person: _PersonSpec, routes: List[_Route], person_routes: List[_Route],
+                      positions: Dict[str, int], scenario: str):
+        """Returns (start_time, legs, events) of the morning and evening trip of a person."""
+        base_route = person_routes[person.route_idx]
+        mode = self._person_mode(person, scenario)
+        if mode == "pt" and base_route.route_id not in positions:
+            mode = "car" # line removed in this scenario
+        board, alight = person.board, person.alight
+        trips = []
+        if mode == "pt":
+            route_idx = positions[base_route.route_id]
+            back_id = base_route.route_id[:-1] + ("b" if base_route.route_id.endswith("f") else "f")
+            back_idx = positions[back_id]
+            n = len(base_route.nodes)
+            trips.append(self._pt_trip_events(person, routes, route_idx, board, alight, person.morning, "home", "work"))
+            trips.append(self._pt_trip_events(person, routes, back_idx, n - 1 - alight, n - 1 - board, person.evening, "work", "home"))
+        elif mode == "car":
+            out_links = base_route.links[board:alight + 1]
+            nodes = base_route.nodes
+            back_links = [_link_id(nodes[k + 1], nodes[k]) for k in range(alight - 1, board - 1, -1)]
+            back_links = [base_route.links[alight]] + back_links
+            trips.append((person.morning, *self._car_trip_events(person, out_links, person.morning, "home", "work")))
+            trips.append((person.evening, *self._car_trip_events(person, back_links, person.evening, "work", "home")))
+        else:
+            distance = (alight - board) * NODE_SPACING
+            link_from, link_to = base_route.links[board], base_route.links[alight]
+            trips.append((person.morning, *self._walk_trip_events(person, link_from, link_to, person.morning, distance, "home", "work")))
+            trips.append((person.evening, *self._walk_trip_events(person, link_to, link_from, person.evening, distance, "work", "home")))
+        return trips
+
+    def _write_events(self, path: str, routes: List[_Route], person_routes: List[_Route], scenario: str) -> int:
+        """Merges all entity event lists in time order with a bounded heap."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        positions = {r.route_id: i for i, r in enumerate(routes)}
+
+        # Entities sorted by their first event time: ('bus', route_idx, dep_idx) / ('person', idx, trip)
+        entities = []
+        for route_idx, route in enumerate(routes):
+            for dep_idx, dep in enumerate(route.departures):
+                entities.append((dep - 60, 0, route_idx, dep_idx))
+        for p_idx, person in enumerate(self.persons):
+            for trip_idx, (start, _, _) in enumerate(self._person_trips(person, routes, person_routes, positions, scenario)):
+                entities.append((start, 1, p_idx, trip_idx))
+        entities.sort()
+
+        heap: List[Tuple[float, int, str]] = []
+        seq = 0
+        count = 0
+        open_func = gzip.open if path.endswith(".gz") else open
+        with open_func(path, "wt", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n<events version="1.0">\n')
+
+            def flush_until(limit: float):
+                nonlocal count
+                while heap and heap[0][0] < limit:
+                    time, _, attrs = heapq.heappop(heap)
+                    f.write(f'\t<event time="{time:.1f}" {attrs}  />\n')
+                    count += 1
+
+            for start, kind, a, b in entities:
+                flush_until(start)
+                if kind == 0:
+                    events = self._bus_events(a, routes[a], b)
+                else:
+                    events = self._person_trips(self.persons[a], routes, person_routes, positions, scenario)[b][2]
+                for time, attrs in events:
+                    heapq.heappush(heap, (round(time, 1), seq, attrs))
+                    seq += 1
+            flush_until(math.inf)
+            f.write('</events>\n')
+        return count
+
+    def _write_trips_legs(self, trips_path: str, legs_path: str, routes: List[_Route],
+                          person_routes: List[_Route], scenario: str):
+        """output_trips.csv / output_legs.csv in MATSim's semicolon layout, consistent with the events."""
+        positions = {r.route_id: i for i, r in enumerate(routes)}
+        with open(trips_path, "w", encoding="utf-8") as trips_f, open(legs_path, "w", encoding="utf-8") as legs_f:
+            trips_f.write("person;trip_number;trip_id;dep_time;trav_time;wait_time;main_mode;start_activity_type;end_activity_type\n")
+            legs_f.write("person;trip_id;dep_time;trav_time;wait_time;mode;vehicle_id;transit_route\n")
+            for person in self.persons:
+                pid = person.person_id
+                trips = self._person_trips(person, routes, person_routes, positions, scenario)
+                for number, (start, legs, _) in enumerate(trips, start=1):
+                    trip_id = f"{pid}_{number}"
+                    end = legs[-1][0] + legs[-1][1]
+                    main_mode = next((leg[3] for leg in legs if leg[3] != "walk"), "walk")
+                    wait = sum(leg[2] for leg in legs)
+                    acts = ("home", "work") if number == 1 else ("work", "home")
+                    trips_f.write(f"{pid};{number};{trip_id};{_fmt_time(start)};{_fmt_time(end - start)};"
+                                  f"{_fmt_time(wait)};{main_mode};{acts[0]};{acts[1]}\n")
+                    for dep, trav, leg_wait, mode, vehicle, route_id in legs:
+                        legs_f.write(f"{pid};{trip_id};{_fmt_time(dep)};{_fmt_time(trav)};{_fmt_time(leg_wait)};"
+                                     f"{mode};{vehicle};{route_id}\n")
+
+    # --------------------------------------------------------------- outputs
+    def _config_dict(self) -> Dict:
+        events_name = "output_events.xml.gz" if self.compress_events else "output_events.xml"
+        def scenario(name):
+            base = os.path.join(self.output_dir, name)
+            return {
+                "input": {
+                    "transit_schedule": os.path.join(base, "input", "transit_schedule.xml"),
+                    "transit_vehicle": os.path.join(base, "input", "transitVehicles.xml"),
+                },
+                "output": {
+                    "events": os.path.join(base, "output", events_name),
+                    "trips": os.path.join(base, "output", "output_trips.csv"),
+                    "plan": os.path.join(base, "output", "output_plans.xml"),
+                    "legs": os.path.join(base, "output", "output_legs.csv"),
+                }
+            }
+        static = os.path.join(self.output_dir, "static_input")
+        return {
+            "data": {"matsim": {
+                "static_input": {
+                    "network": os.path.join(static, "network.xml"),
+                    "plan": os.path.join(static, "plans.xml"),
+                    "zones": {"output_path": os.path.join(static, "zones.json")},
+                    "grid": {"rows": 20, "cols": 20},
+                },
+                "before": scenario("before"),
+                "after": scenario("after"),
+            }},
+            # Same sections and defaults as conf/config.yaml, so the compare flow runs on the scenario
+            "time_window": None,
+            "distinct_riders": "exact",
+            "iterations": {"enabled": False, "workers": None, "every": 1},
+            "accessibility": {
+                "enabled": True,
+                "departure_window": "07:00-08:00",
+                "interval": 10,
+                "thresholds": [30, 45, 60],
+                "access_radius": 800,
+                "workers": None,
+            },
+            "checkpoints": {
+                "enabled": False,
+                "dir": os.path.join(self.output_dir, "test_output", "checkpoints"),
+                "interval_mb": 256,
+            },
+            "time_bins": {"bin_size": 3600, "num_bins": 30},
+            "test": {"output": os.path.join(self.output_dir, "test_output")}
+        }
+
+    def generate(self) -> Dict:
+        """Writes all files and returns the config dict (also saved as config.yaml)."""
+        print(f"Generating synthetic scenario (~{self.target_events} events, grid {self.grid_size}x{self.grid_size}) in {self.output_dir}")
+        config = self._config_dict()
+        matsim = config["data"]["matsim"]
+
+        before_lines = self._build_lines("before")
+        before_routes = self._route_index(before_lines)
+        self._plan_departures(before_routes, "before")
+        self._build_persons(before_routes)
+
+        self._write_network(matsim["static_input"]["network"])
+        self._write_plans(matsim["static_input"]["plan"], before_routes)
+
+        for scenario in ("before", "after"):
+            lines = before_lines if scenario == "before" else self._build_lines("after")
+            routes = self._route_index(lines)
+            if scenario == "after":
+                self._plan_departures(routes, "after")
+            self._delay_cache = {}
+            scen_cfg = matsim[scenario]
+            self._write_schedule(scen_cfg["input"]["transit_schedule"], lines)
+            self._write_vehicles(scen_cfg["input"]["transit_vehicle"], lines)
+            events = self._write_events(scen_cfg["output"]["events"], routes, before_routes, scenario)
+            self._write_trips_legs(scen_cfg["output"]["trips"], scen_cfg["output"]["legs"], routes, before_routes, scenario)
+            self.stats[scenario] = {
+                "events": events,
+                "persons": len(self.persons),
+                "routes": len(routes),
+                "departures": sum(len(r.departures) for r in routes)
+            }
+            print(f"  {scenario}: {events} events, {self.stats[scenario]['departures']} departures")
+
+        with open(os.path.join(self.output_dir, "config.yaml"), "w", encoding="utf-8") as f:
+            yaml.safe_dump(config, f, sort_keys=False)
+        with open(os.path.join(self.output_dir, "scenario_meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"target_events": self.target_events, "seed": self.seed,
+                       "grid_size": self.grid_size, "scenarios": self.stats}, f, indent=4)
+        return config
+
+def generate_scenario(output_dir: str, target_events: int, seed: int = 42, compress_events: bool = False) -> Dict:
+    """Generates a scenario unless one with the same size and seed already exists."""
+    meta_path = os.path.join(output_dir, "scenario_meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("target_events") == target_events and meta.get("seed") == seed:
+            print(f"Reusing synthetic scenario in {output_dir}")
+            with open(os.path.join(output_dir, "config.yaml"), "r", encoding="utf-8") as f:
+                return yaml.safe_load(f)
+    return SyntheticScenarioGenerator(output_dir, target_events, seed, compress_events).generate()
@@ -0,0 +1,75 @@
+import os
+import sys
+import gzip
+import shutil
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+from src.modules.prepare_bus_score_data.events_stream import open_events
+from src.modules.compare_flow.iteration_scoring import IterationScoring, find_iteration_events
+
+test_name = "test_iteration_scoring"
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    MATSIM_OUTPUT_DIR = os.path.join(TEST_OUTPUT_DIR, "matsim_output")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Fake ITERS directory (the output events as iterations 0..3) ---")
+    with open_events(EVENTS_PATH) as f:
+        events = f.read()
+    for it in range(4):
+        it_dir = os.path.join(MATSIM_OUTPUT_DIR, "ITERS", f"it.{it}")
+        os.makedirs(it_dir)
+        with gzip.open(os.path.join(it_dir, f"{it}.events.xml.gz"), "wb") as out:
+            out.write(events)
+    print(f"Found iterations: {[it for it, _ in find_iteration_events(MATSIM_OUTPUT_DIR)]}")
+
+    print("\n--- Step 2: Process Vehicles (XML -> CSV) ---")
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLES_CSV)
+    vehicle_data.save_vehicle_types_to_csv(os.path.join(TEST_OUTPUT_DIR, VEHICLE_TYPES_CSV))
+
+    print("\n--- Step 3: Score iterations serially and in a process pool ---")
+    serial = IterationScoring(MATSIM_OUTPUT_DIR, VEHICLES_CSV, os.path.join(TEST_OUTPUT_DIR, "serial"), num_workers=1)
+    serial.process()
+    serial.save_scores()
+    pool = IterationScoring(MATSIM_OUTPUT_DIR, VEHICLES_CSV, os.path.join(TEST_OUTPUT_DIR, "pool"), num_workers=2)
+    pool.process()
+    pool.save_scores()
+
+    # Verification
+    print("\n--- Step 4: Verify Output ---")
+    df = pool.get_dataframe()
+    print(df.to_string(index=False))
+    if serial.get_dataframe().equals(df):
+        print("SUCCESS: Process pool scores match the serial run.")
+    else:
+        print("FAILURE: Process pool scores differ from the serial run.")
+    if len(df) == 4 and df.drop(columns="iteration").nunique().max() == 1:
+        print("SUCCESS: Identical iterations give identical scores.")
+    else:
+        print("FAILURE: Unexpected iteration scores.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import shutil
+import json
+import numpy as np
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.network_processor import NetworkData
+from src.modules.core_data_processor.plan_input_processor import PlanInputData
+from src.modules.core_data_processor.schedule_processor import TransitScheduleData
+from src.modules.core_data_processor.zone_processor import ZoneGrid
+from src.modules.core_data_processor.raptor_router import Timetable, RaptorRouter
+from src.modules.bus_scoring.accessibility_scoring import AccessibilityScoring
+
+test_name = "test_accessibility_scoring"
+
+def connection_scan(timetable: Timetable, origin: int, departure_time: float) -> np.ndarray:
+    """Reference earliest arrivals (unlimited transfers): plain connection scan over every trip hop."""
+    connections = []
+    for r, route in enumerate(timetable.routes):
+        for trip in range(route.num_trips):
+            for i in range(route.num_stops - 1):
+                connections.append((route.departures[trip, i], route.arrivals[trip, i + 1],
+                                    route.stops[i], route.stops[i + 1], (r, trip)))
+    connections.sort(key=lambda c: c[:2])
+    footpaths = {}
+    for a, b, w in zip(timetable.transfer_from, timetable.transfer_to, timetable.transfer_time):
+        footpaths.setdefault(a, []).append((b, w))
+
+    best = np.full(timetable.num_stops, np.inf)
+    best[origin] = departure_time
+    for b, w in footpaths.get(origin, []):
+        best[b] = min(best[b], departure_time + w)
+    boarded = set()
+    for dep, arr, a, b, trip in connections:
+        if dep < departure_time or (trip not in boarded and best[a] > dep):
+            continue
+        boarded.add(trip)
+        if arr < best[b]:
+            best[b] = arr
+            for c, w in footpaths.get(b, []):
+                best[c] = min(best[c], arr + w)
+    return best - departure_time
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    SCHEDULE_PATH = config.data.matsim.before.input.transit_schedule
+    PLANS_PATH = config.data.matsim.static_input.plan
+    NETWORK_PATH = config.data.matsim.static_input.network
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    HOMES_NPY = os.path.join(TEST_OUTPUT_DIR, "homes_processed.npy")
+    ACTIVITIES_CSV = os.path.join(TEST_OUTPUT_DIR, "plan_activities.csv")
+    ACCESSIBILITY_CSV = os.path.join(TEST_OUTPUT_DIR, "zone_accessibility.csv")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: RAPTOR vs. connection scan ---")
+    schedule = TransitScheduleData(SCHEDULE_PATH)
+    schedule.process()
+    timetable = Timetable.from_schedule(schedule)
+    origins = np.arange(0, timetable.num_stops, max(timetable.num_stops // 20, 1))
+    # Enough rounds for any number of transfers
+    router = RaptorRouter(timetable, max_rounds=50)
+    batched = router.from_stops(origins, 7 * 3600.0)
+    def same(reference: np.ndarray, result: np.ndarray) -> bool:
+        return np.array_equal(np.isinf(reference), np.isinf(result)) and \
+            np.allclose(reference[np.isfinite(reference)], result[np.isfinite(reference)])
+    mismatches, single_mismatches = 0, 0
+    for column, origin in enumerate(origins):
+        reference = connection_scan(timetable, origin, 7 * 3600.0)
+        mismatches += not same(reference, batched[:, column])
+        # Alone, no other origin's walks mark the stops of this one
+        single_mismatches += not same(reference, router.from_stops([origin], 7 * 3600.0)[:, 0])
+    if mismatches == 0:
+        print(f"SUCCESS: Batched RAPTOR matches the connection scan from {len(origins)} origin stops.")
+    else:
+        print(f"FAILURE: {mismatches} of {len(origins)} origin stops differ from the connection scan (batched).")
+    if single_mismatches == 0:
+        print(f"SUCCESS: RAPTOR from each origin stop alone matches the connection scan.")
+    else:
+        print(f"FAILURE: {single_mismatches} of {len(origins)} single origin stops differ from the connection scan.")
+
+    print("\n--- Step 2: Zone accessibility (homes, activities, grid) ---")
+    plans = PlanInputData(PLANS_PATH)
+    plans.process()
+    plans.save_homes_to_npy(HOMES_NPY)
+    plans.save_activities_to_csv(ACTIVITIES_CSV)
+    network = NetworkData(NETWORK_PATH)
+    network.process()
+    grid = ZoneGrid.from_points([n.x for n in network.nodes_list], [n.y for n in network.nodes_list],
+                                rows=config.data.matsim.static_input.grid.rows,
+                                cols=config.data.matsim.static_input.grid.cols)
+
+    single = AccessibilityScoring(SCHEDULE_PATH, grid, HOMES_NPY, ACTIVITIES_CSV, num_workers=1)
+    single.process()
+    single.save_zone_accessibility_to_csv(ACCESSIBILITY_CSV)
+    pooled = AccessibilityScoring(SCHEDULE_PATH, grid, HOMES_NPY, ACTIVITIES_CSV, num_workers=2, batch_size=4)
+    pooled.process()
+
+    # Verification
+    print("\n--- Step 3: Verify Output ---")
+    if np.array_equal(single.reachable_population, pooled.reachable_population) and \
+            np.array_equal(single.reachable_activities, pooled.reachable_activities):
+        print("SUCCESS: Process pool matches the single process run.")
+    else:
+        print("FAILURE: Process pool results differ from the single process run.")
+
+    df = single.get_dataframe()
+    reachable = df[[f"reachable_population_{t}" for t in single.thresholds]].to_numpy()
+    # Longer thresholds reach at least as much, and every zone reaches its own population
+    if (np.diff(reachable, axis=1) >= 0).all() and (reachable[:, 0] >= df["population"].to_numpy()).all():
+        print("SUCCESS: Reachable population grows with the threshold and includes the own zone.")
+    else:
+        print("FAILURE: Reachable population is not monotonic in the threshold.")
+
+    result = single.summary()
+    with open(os.path.join(TEST_OUTPUT_DIR, "accessibility_score.json"), 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=4)
+    print(f"Result: {json.dumps(result, indent=4)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import shutil
+import threading
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+from src.modules.prepare_bus_score_data.events_stream import open_events
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.bus_scoring.live_scoring import LiveScoring
+
+test_name = "test_live_scoring"
+
+def write_slowly(source_path: str, target_path: str, parts: int = 20, delay: float = 0.1):
+    """Copies the events file in parts, like MATSim writing it during the simulation."""
+    with open_events(source_path) as f:
+        data = f.read()
+    step = max(1, len(data) // parts)
+    with open(target_path, "wb") as out:
+        for i in range(0, len(data), step):
+            out.write(data[i:i + step])
+            out.flush()
+            time.sleep(delay)
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    GROWING_EVENTS = os.path.join(TEST_OUTPUT_DIR, "output_events.xml")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Process Vehicles (XML -> CSV) ---")
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLES_CSV)
+    vehicle_data.save_vehicle_types_to_csv(os.path.join(TEST_OUTPUT_DIR, VEHICLE_TYPES_CSV))
+
+    print("\n--- Step 2: Follow the events file while it is being written ---")
+    writer = threading.Thread(target=write_slowly, args=(EVENTS_PATH, GROWING_EVENTS))
+    writer.start()
+    live = LiveScoring(GROWING_EVENTS, VEHICLES_CSV, os.path.join(TEST_OUTPUT_DIR, "live"),
+                       publish_interval=3600, poll_interval=0.05, idle_timeout=30)
+    final_scores = live.run()
+    writer.join()
+
+    # Verification
+    print("\n--- Step 3: Verify Output ---")
+    print(f"Published {len(live.history)} running scores.")
+    running_users = [s["ridership_unique_persons"] for s in live.history]
+    if running_users == sorted(running_users):
+        print("SUCCESS: Running bus users never decrease.")
+    else:
+        print("FAILURE: Running bus users decreased.")
+
+    # Final scores match a regular run over the complete file
+    reference = RidershipPrepareData(EVENTS_PATH, VEHICLES_CSV)
+    reference.process()
+    if final_scores["ridership_unique_persons"] == reference.summary()["unique_persons_bus"]:
+        print(f"SUCCESS: Final scores ready: {final_scores}")
+    else:
+        print(f"FAILURE: Final scores differ from a complete run: {reference.summary()}")
+
+if __name__ == "__main__":
+    main()
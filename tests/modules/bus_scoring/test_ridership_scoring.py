@@ -33,6 +33,7 @@ def main():
     TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
     VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
     RIDERSHIP_CSV = os.path.join(TEST_OUTPUT_DIR, "ridership_with_types.csv")
+    RIDERS_JSON = os.path.join(TEST_OUTPUT_DIR, "distinct_riders.json")
     
     # Cleanup previous runs
     if os.path.exists(TEST_OUTPUT_DIR):
@@ -52,7 +53,7 @@ def main():
     print("\n--- Step 3: Calculate Bus Ridership Score ---")
     print(f"Using Prepared Data: {RIDERSHIP_CSV}")
     
-    unique_persons = calculate_bus_ridership(RIDERSHIP_CSV)
+    unique_persons = calculate_bus_ridership(RIDERSHIP_CSV)["unique_persons_bus"]
     
     # Save to JSON
     json_output_path = os.path.join(TEST_OUTPUT_DIR, "ridership_score.json")
@@ -66,5 +67,18 @@ def main():
     else:
         print(f"\nWARNING: Bus Ridership is 0. Check if this is expected.")
 
+    print("\n--- Step 4: Approximate Distinct Riders (HyperLogLog) ---")
+    hll_data = RidershipPrepareData(EVENTS_PATH, VEHICLES_CSV, distinct_counting="hll")
+    hll_data.process()
+    hll_data.save_distinct_rider_sketches_to_json(RIDERS_JSON)
+    hll_data.save_distinct_riders_to_csv(os.path.join(TEST_OUTPUT_DIR, "distinct_riders.csv"))
+    estimate = calculate_bus_ridership(RIDERSHIP_CSV, riders_sketch_path=RIDERS_JSON)
+    # Within 3 standard errors (plus one rider for tiny populations)
+    tolerance = 3 * estimate["unique_persons_bus_error"] * unique_persons + 1
+    if abs(estimate["unique_persons_bus"] - unique_persons) <= tolerance:
+        print(f"SUCCESS: HyperLogLog estimate {estimate['unique_persons_bus']} vs exact {unique_persons}.")
+    else:
+        print(f"FAILURE: HyperLogLog estimate {estimate['unique_persons_bus']} too far from exact {unique_persons}.")
+
 if __name__ == "__main__":
     main()
@@ -3,6 +3,7 @@ import os
 import sys
 import shutil
 import json
+import numpy as np
 
 # Add project root to sys.path to enable importing from src
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -10,7 +11,7 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from src.config_loader import load_config
-from src.modules.bus_scoring.service_coverage_scoring import start_scoring
+from src.modules.bus_scoring.service_coverage_scoring import start_scoring, ServiceCoveragePrepareData
 from src.modules.core_data_processor.plan_input_processor import PlanInputData
 
 test_name = "test_service_coverage_scoring"
@@ -21,6 +22,7 @@ def main():
     
     # Inputs
     SCHEDULE_PATH = config.data.matsim.before.input.transit_schedule
+    AFTER_SCHEDULE_PATH = config.data.matsim.after.input.transit_schedule
     PLANS_PATH = config.data.matsim.static_input.plan # "plans_scale0.375true.xml"
     
     # Resolve absolute paths if needed
@@ -28,6 +30,8 @@ def main():
         SCHEDULE_PATH = os.path.join(project_root, SCHEDULE_PATH)
     if not os.path.isabs(PLANS_PATH):
         PLANS_PATH = os.path.join(project_root, PLANS_PATH)
+    if not os.path.isabs(AFTER_SCHEDULE_PATH):
+        AFTER_SCHEDULE_PATH = os.path.join(project_root, AFTER_SCHEDULE_PATH)
 
     TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
     
@@ -56,5 +60,21 @@ def main():
     print(f"Score saved to: {json_output_path}")
     print(f"Result: {json.dumps(result, indent=4)}")
 
+    print(f"\n--- Incremental AFTER Coverage (stop set diff) ---")
+    HOMES_NPY = os.path.join(TEST_OUTPUT_DIR, "population_homes.npy")
+    before = ServiceCoveragePrepareData(SCHEDULE_PATH, HOMES_NPY)
+    before.process()
+    before.calculate_coverage(radius=400.0)
+    incremental = ServiceCoveragePrepareData(AFTER_SCHEDULE_PATH, HOMES_NPY)
+    incremental.process()
+    incremental_result = incremental.calculate_coverage(radius=400.0, baseline=before)
+    full = ServiceCoveragePrepareData(AFTER_SCHEDULE_PATH, HOMES_NPY)
+    full.process()
+    full_result = full.calculate_coverage(radius=400.0)
+    if incremental_result == full_result and np.array_equal(incremental.home_distances, full.home_distances):
+        print(f"SUCCESS: Incremental AFTER coverage matches the full recompute: {full_result}")
+    else:
+        print(f"FAILURE: Incremental {incremental_result} vs. full {full_result}")
+
 if __name__ == "__main__":
     main()
@@ -3,6 +3,7 @@ import os
 import sys
 import shutil
 import pandas as pd
+import numpy as np
 import json
 
 # Add project root to sys.path to enable importing from src
@@ -33,6 +34,7 @@ def main():
     TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
     VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
     RIDERSHIP_CSV = os.path.join(TEST_OUTPUT_DIR, "ridership_with_types.csv")
+    SKETCHES_JSON = os.path.join(TEST_OUTPUT_DIR, "travel_time_sketches.json")
     
     # Cleanup previous runs
     if os.path.exists(TEST_OUTPUT_DIR):
@@ -48,11 +50,12 @@ def main():
     ridership_data = RidershipPrepareData(EVENTS_PATH, VEHICLES_CSV)
     ridership_data.process()
     ridership_data.save_ridership_to_csv(RIDERSHIP_CSV)
+    ridership_data.save_travel_time_sketches_to_json(SKETCHES_JSON)
     
     print("\n--- Step 3: Calculate Travel Time Scores ---")
     print(f"Using Prepared Data: {RIDERSHIP_CSV}")
     
-    scores = calculate_travel_time_scores(RIDERSHIP_CSV)
+    scores = calculate_travel_time_scores(RIDERSHIP_CSV, SKETCHES_JSON)
     
     # Save to JSON
     json_output_path = os.path.join(TEST_OUTPUT_DIR, "travel_time_scores.json")
@@ -62,5 +65,21 @@ def main():
     print(f"Scores saved to: {json_output_path}")
     print(f"Scores content: {scores}")
 
+    print("\n--- Step 4: Verify Sketch Percentiles ---")
+    df = pd.read_csv(RIDERSHIP_CSV)
+    car_times = df.loc[df['mainMode'] == 'car', 'travelTime']
+    if car_times.empty:
+        print("SKIPPED: No car trips.")
+    else:
+        # The sketch stays exact up to ~k values and within ~1% rank error beyond
+        exact = np.percentile(car_times, 50, method="inverted_cdf")
+        p50 = scores["car_travel_time_p50"]
+        # Rank range of the p50 value (ties), with a small tolerance for float noise in event times
+        below, at_or_below = (car_times < p50 - 1e-6).mean(), (car_times <= p50 + 1e-6).mean()
+        if below <= 0.51 and at_or_below >= 0.49:
+            print(f"SUCCESS: Car p50 {scores['car_travel_time_p50']:.1f}s (exact {exact:.1f}s).")
+        else:
+            print(f"FAILURE: Car p50 {scores['car_travel_time_p50']:.1f}s is off (exact {exact:.1f}s).")
+
 if __name__ == "__main__":
     main()
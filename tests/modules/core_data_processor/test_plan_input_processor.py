@@ -35,6 +35,9 @@ def main():
 
     TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
     OUTPUT_CSV = os.path.join(TEST_OUTPUT_DIR, "home_locations.csv")
+    HOMES_NPY = os.path.join(TEST_OUTPUT_DIR, "home_locations.npy")
+    ACTIVITIES_CSV = os.path.join(TEST_OUTPUT_DIR, "plan_activities.csv")
+    LEGS_CSV = os.path.join(TEST_OUTPUT_DIR, "plan_legs.csv")
     
     # Cleanup
     if os.path.exists(TEST_OUTPUT_DIR):
@@ -46,6 +49,9 @@ def main():
     processor = PlanInputData(PLANS_PATH)
     processor.process()
     processor.save_to_csv(OUTPUT_CSV)
+    processor.save_homes_to_npy(HOMES_NPY)
+    processor.save_activities_to_csv(ACTIVITIES_CSV)
+    processor.save_legs_to_csv(LEGS_CSV)
     
     print(f"Test complete. Outputs in {TEST_OUTPUT_DIR}")
 
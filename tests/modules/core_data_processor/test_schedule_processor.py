@@ -23,6 +23,8 @@ def main():
     ROUTES_PATH = os.path.join(TEST_OUTPUT, "routes.csv")
     ROUTE_STOPS_PATH = os.path.join(TEST_OUTPUT, "route_stops.csv")
     ROUTE_LINKS_PATH = os.path.join(TEST_OUTPUT, "route_links.csv")
+    DEPARTURES_PATH = os.path.join(TEST_OUTPUT, "departures.csv")
+    ROUTE_STOP_DISTANCES_PATH = os.path.join(TEST_OUTPUT, "route_stop_distances.csv")
     
     # Cleanup previous runs
     if os.path.exists(TEST_OUTPUT):
@@ -37,7 +39,31 @@ def main():
     schedule_data.save_routes_to_csv(ROUTES_PATH)
     schedule_data.save_route_stops_to_csv(ROUTE_STOPS_PATH)
     schedule_data.save_route_links_to_csv(ROUTE_LINKS_PATH)
-    
+    schedule_data.save_departures_to_csv(DEPARTURES_PATH)
+
+    # CSR route/stop index must agree with scans of the route stop lists
+    index = schedule_data.get_route_stop_index()
+    index.save_route_stop_distances_to_csv(ROUTE_STOP_DISTANCES_PATH)
+    stops_by_id = {s.stop_id: s for s in schedule_data.stops_list}
+    mismatches = 0
+    for route in schedule_data.routes_list:
+        if index.stops_of_route(route.route_id).tolist() != [rs.stop_code for rs in route.stops]:
+            mismatches += 1
+            continue
+        coords = [stops_by_id.get(rs.stop_ref_id) for rs in route.stops]
+        length = sum(((a.x - b.x) ** 2 + (a.y - b.y) ** 2) ** 0.5 for a, b in zip(coords, coords[1:]) if a and b)
+        if abs(index.route_lengths()[index.route_row(route.route_id)] - length) > 1e-6:
+            mismatches += 1
+    for stop in schedule_data.stops_list:
+        expected = sorted({r.route_id for r in schedule_data.routes_list
+                           if any(rs.stop_ref_id == stop.stop_id for rs in r.stops)})
+        if sorted(index.routes_at_stop(stop.stop_id)) != expected:
+            mismatches += 1
+    if mismatches == 0:
+        print(f"SUCCESS: Route/stop index matches the route stop lists ({index.num_routes} routes).")
+    else:
+        print(f"FAILURE: {mismatches} routes/stops differ between the index and the route stop lists.")
+
     print(f"Test complete. Outputs in {TEST_OUTPUT}")
 
 if __name__ == "__main__":
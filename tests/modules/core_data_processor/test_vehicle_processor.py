@@ -6,7 +6,7 @@ import sys
 import shutil
 
 from src.config_loader import load_config
-from src.modules.core_data_processor.vehicle_processor import VehicleData
+from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
 
 test_name = "test_vehicle_processor"
 
@@ -27,6 +27,12 @@ def main():
     vehicle_data = VehicleData(VEHICLE_PATH)
     vehicle_data.process()
     vehicle_data.save_vehicles_to_csv(VEH_TYPE_PATH)
+    vehicle_data.save_vehicle_types_to_csv(os.path.join(TEST_OUTPUT, VEHICLE_TYPES_CSV))
+
+    # Bus bitmap indexed by vehicle code
+    type_index = vehicle_data.get_type_index()
+    print(f"Vehicle types: {[(t.id, t.mode, t.capacity, t.is_bus) for t in vehicle_data.vehicle_types]}")
+    print(f"Bus vehicles: {type_index.num_bus_vehicles} / {len(vehicle_data.vehicle_list)}")
     
     print(f"Test complete. Outputs in {TEST_OUTPUT}")
 
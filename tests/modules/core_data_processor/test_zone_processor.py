@@ -0,0 +1,50 @@
+import os
+import sys
+import shutil
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.network_processor import NetworkData
+from src.modules.core_data_processor.zone_processor import ZoneGrid
+
+test_name = os.path.basename(__file__)
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    NETWORK_PATH = config.data.matsim.static_input.network
+    GRID_CFG = config.data.matsim.static_input.grid
+    TEST_OUTPUT = os.path.join(config.test.output, test_name)
+    ZONES_PATH = os.path.join(TEST_OUTPUT, "zones.json")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT):
+        shutil.rmtree(TEST_OUTPUT)
+    os.makedirs(TEST_OUTPUT, exist_ok=True)
+
+    print(f"Reading network from: {NETWORK_PATH}")
+    network_data = NetworkData(NETWORK_PATH)
+    network_data.process()
+
+    xs = [n.x for n in network_data.nodes_list]
+    ys = [n.y for n in network_data.nodes_list]
+    grid = ZoneGrid.from_points(xs, ys, rows=GRID_CFG.rows, cols=GRID_CFG.cols)
+    grid.save_zones_to_json(ZONES_PATH)
+
+    # Every network node must fall inside the grid
+    zones = grid.zone_index(xs, ys)
+    outside = int((zones < 0).sum())
+    if outside == 0:
+        print(f"SUCCESS: All {len(zones)} nodes mapped to {grid.num_zones} zones.")
+    else:
+        print(f"FAILURE: {outside} nodes fall outside the grid.")
+
+    print(f"Test complete. Outputs in {TEST_OUTPUT}")
+
+if __name__ == "__main__":
+    main()
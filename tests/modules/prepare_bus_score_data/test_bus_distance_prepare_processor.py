@@ -0,0 +1,83 @@
+import os
+import sys
+import shutil
+import pandas as pd
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.network_processor import NetworkData
+from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+from src.modules.prepare_bus_score_data.bus_distance_prepare_processor import BusDistancePrepareData
+from src.utils.id_dictionary import IdDictionary
+
+test_name = "test_bus_distance_prepare_processor"
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    NETWORK_PATH = config.data.matsim.static_input.network
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    DISTANCES_CSV = os.path.join(TEST_OUTPUT_DIR, "bus_route_distances.csv")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Process Network (link lengths) and Vehicles ---")
+    network = NetworkData(NETWORK_PATH)
+    network.process()
+    link_lengths = network.link_length_array()
+    print(f"Link length array: {len(link_lengths)} links, {link_lengths.sum() / 1000:.1f} km in total")
+
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLES_CSV)
+    vehicle_data.save_vehicle_types_to_csv(os.path.join(TEST_OUTPUT_DIR, VEHICLE_TYPES_CSV))
+
+    print("\n--- Step 2: Bus Vehicle-km / Passenger-km ---")
+    occupancy = BusOccupancyPrepareData(EVENTS_PATH, VEHICLES_CSV)
+    distance = BusDistancePrepareData(EVENTS_PATH, link_lengths, occupancy, link_ids=network.ids)
+    distance.process()
+    distance.save_route_distances_to_csv(DISTANCES_CSV)
+    print(f"Totals: {distance.summary()}")
+
+    # Verification
+    print("\n--- Step 3: Verify Output ---")
+    if os.path.exists(DISTANCES_CSV):
+        df = pd.read_csv(DISTANCES_CSV)
+        print(f"Output columns: {list(df.columns)}")
+        print(df.sort_values("passengerKm", ascending=False).head())
+    else:
+        print("FAILURE: Output file not created.")
+
+    print("\n--- Step 4: Network With Its Own ID Dictionary ---")
+    # Link codes must come from the dictionary the link length array is indexed by
+    own_ids = IdDictionary()
+    own_ids.link.encode("not_in_network") # link codes shifted against the shared dictionary
+    own_network = NetworkData(NETWORK_PATH, id_dictionary=own_ids)
+    own_network.process()
+    own = BusDistancePrepareData(EVENTS_PATH, own_network.link_length_array(),
+                                 BusOccupancyPrepareData(EVENTS_PATH, VEHICLES_CSV), link_ids=own_network.ids)
+    own.process()
+    shared_km, own_km = distance.summary()["vehicle_km"], own.summary()["vehicle_km"]
+    if abs(shared_km - own_km) < 1e-6:
+        print(f"SUCCESS: Same vehicle-km with the network's own dictionary ({own_km:.1f} km).")
+    else:
+        print(f"FAILURE: Vehicle-km {own_km:.1f} with the network's own dictionary, expected {shared_km:.1f}.")
+
+if __name__ == "__main__":
+    main()
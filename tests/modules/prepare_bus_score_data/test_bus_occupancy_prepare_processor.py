@@ -0,0 +1,72 @@
+import os
+import sys
+import shutil
+import pandas as pd
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+from src.modules.prepare_bus_score_data.events_stream import run_events_stream
+
+test_name = "test_bus_occupancy_prepare_processor"
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    LOADS_CSV = os.path.join(TEST_OUTPUT_DIR, "bus_loads.csv")
+    DISTRIBUTION_CSV = os.path.join(TEST_OUTPUT_DIR, "bus_load_factor_distribution.csv")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Process Vehicles and Vehicle Types (XML -> CSV) ---")
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLES_CSV)
+    vehicle_data.save_vehicle_types_to_csv(os.path.join(TEST_OUTPUT_DIR, VEHICLE_TYPES_CSV))
+
+    print("\n--- Step 2: Bus Occupancy (standalone pass) ---")
+    occupancy = BusOccupancyPrepareData(EVENTS_PATH, VEHICLES_CSV)
+    occupancy.process()
+    occupancy.save_loads_to_csv(LOADS_CSV)
+    occupancy.save_load_factor_distribution_to_csv(DISTRIBUTION_CSV)
+    print(f"Crowding summary: {occupancy.summary()}")
+
+    print("\n--- Step 3: Shared pass with the ridership processor ---")
+    ridership = RidershipPrepareData(EVENTS_PATH, VEHICLES_CSV)
+    shared = BusOccupancyPrepareData(EVENTS_PATH, VEHICLES_CSV, vehicle_index=ridership.vehicle_index)
+    run_events_stream(EVENTS_PATH, [ridership, shared])
+
+    # Verification
+    print("\n--- Step 4: Verify Output ---")
+    if shared.summary() == occupancy.summary():
+        print("SUCCESS: Shared pass matches the standalone pass.")
+    else:
+        print(f"FAILURE: Shared pass differs: {shared.summary()}")
+
+    if os.path.exists(DISTRIBUTION_CSV):
+        df = pd.read_csv(DISTRIBUTION_CSV)
+        print(f"Output columns: {list(df.columns)}")
+        print(df.sort_values("maxLoadFactor", ascending=False).head())
+    else:
+        print("FAILURE: Output file not created.")
+
+if __name__ == "__main__":
+    main()
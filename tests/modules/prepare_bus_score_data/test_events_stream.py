@@ -0,0 +1,120 @@
+import os
+import sys
+import shutil
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.on_time_performance_prepare_processor import OnTimePerformancePrepareData
+from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+from src.modules.prepare_bus_score_data.stop_activity_prepare_processor import StopActivityPrepareData
+from src.modules.prepare_bus_score_data.events_stream import run_events_stream
+from src.utils.id_dictionary import IdDictionary
+from src.utils.metrics_utils import file_size
+
+test_name = "test_events_stream"
+
+class _Preemption(Exception):
+    pass
+
+class _Preempt:
+    """Handler simulating a crash: raises at event number at_event (class level, so not checkpointed)."""
+    at_event = None
+
+    def __init__(self):
+        self.seen = 0
+
+    def _process_event(self, elem):
+        self.seen += 1
+        if self.seen == _Preempt.at_event:
+            raise _Preemption()
+
+def build_handlers(events_path: str, vehicles_csv: str):
+    """Handlers of the compare flow's shared pass, with their own ID dictionary."""
+    ids = IdDictionary()
+    ridership = RidershipPrepareData(events_path, vehicles_csv, id_dictionary=ids)
+    otp = OnTimePerformancePrepareData(events_path, vehicles_csv, id_dictionary=ids,
+                                       vehicle_index=ridership.vehicle_index)
+    occupancy = BusOccupancyPrepareData(events_path, vehicles_csv, id_dictionary=ids,
+                                        vehicle_index=ridership.vehicle_index)
+    activity = StopActivityPrepareData(events_path, vehicles_csv, id_dictionary=ids,
+                                       vehicle_index=ridership.vehicle_index)
+    return [ridership, otp, occupancy, activity, _Preempt()]
+
+def results(handlers):
+    ridership, otp, occupancy, activity = handlers[:4]
+    return [ridership.get_dataframe(), ridership.get_time_series(), otp.get_dataframe(),
+            occupancy.get_dataframe(), activity.get_dataframe()]
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    CHECKPOINT_PATH = os.path.join(TEST_OUTPUT_DIR, "events.checkpoint")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Process Vehicles and Vehicle Types (XML -> CSV) ---")
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLES_CSV)
+    vehicle_data.save_vehicle_types_to_csv(os.path.join(TEST_OUTPUT_DIR, VEHICLE_TYPES_CSV))
+
+    print("\n--- Step 2: Uninterrupted Shared Pass ---")
+    handlers = build_handlers(EVENTS_PATH, VEHICLES_CSV)
+    event_count = run_events_stream(EVENTS_PATH, handlers)
+    expected = results(handlers)
+
+    print("\n--- Step 3: Checkpointed Pass Interrupted at 70% of the Events ---")
+    # About ten checkpoints over the (decompressed) file
+    interval = max((file_size(EVENTS_PATH) or 0) * (4 if EVENTS_PATH.endswith(".gz") else 1) // 10, 1 << 16)
+    _Preempt.at_event = int(event_count * 0.7)
+    try:
+        run_events_stream(EVENTS_PATH, build_handlers(EVENTS_PATH, VEHICLES_CSV),
+                          checkpoint_path=CHECKPOINT_PATH, checkpoint_interval=interval)
+        print("FAILURE: The pass was not interrupted.")
+    except _Preemption:
+        print(f"Interrupted at event {_Preempt.at_event}.")
+    if not os.path.exists(CHECKPOINT_PATH):
+        print("FAILURE: No checkpoint written before the interruption.")
+
+    print("\n--- Step 4: Resume from the Checkpoint ---")
+    _Preempt.at_event = None
+    handlers = build_handlers(EVENTS_PATH, VEHICLES_CSV)
+    run_events_stream(EVENTS_PATH, handlers, checkpoint_path=CHECKPOINT_PATH, checkpoint_interval=interval)
+
+    # Verification
+    print("\n--- Step 5: Verify Output ---")
+    if all(a.equals(b) for a, b in zip(results(handlers), expected)):
+        print("SUCCESS: Resumed pass matches the uninterrupted pass.")
+    else:
+        print("FAILURE: Resumed pass differs from the uninterrupted pass.")
+
+    if handlers[4].seen == event_count:
+        print(f"SUCCESS: {event_count} events seen once over the interrupted and resumed runs.")
+    else:
+        print(f"FAILURE: {handlers[4].seen} events seen vs. {event_count} uninterrupted.")
+
+    if not os.path.exists(CHECKPOINT_PATH):
+        print("SUCCESS: Checkpoint removed after the completed pass.")
+    else:
+        print("FAILURE: Checkpoint left after the completed pass.")
+
+if __name__ == "__main__":
+    main()
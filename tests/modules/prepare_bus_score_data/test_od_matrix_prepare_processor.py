@@ -0,0 +1,94 @@
+
+import os
+import sys
+import shutil
+import pandas as pd
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.vehicle_processor import VehicleData
+from src.modules.core_data_processor.network_processor import NetworkData
+from src.modules.core_data_processor.plan_input_processor import PlanInputData
+from src.modules.core_data_processor.zone_processor import ZoneGrid
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.od_matrix_prepare_processor import ODMatrixPrepareData
+
+test_name = "test_od_matrix_prepare_processor"
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    NETWORK_PATH = config.data.matsim.static_input.network
+    PLANS_PATH = config.data.matsim.static_input.plan
+    GRID_CFG = config.data.matsim.static_input.grid
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    ACTIVITIES_CSV = os.path.join(TEST_OUTPUT_DIR, "plan_activities.csv")
+    LEGS_CSV = os.path.join(TEST_OUTPUT_DIR, "plan_legs.csv")
+    RIDERSHIP_CSV = os.path.join(TEST_OUTPUT_DIR, "ridership_with_types.csv")
+    OD_NPZ = os.path.join(TEST_OUTPUT_DIR, "od_matrices.npz")
+    OD_CSV = os.path.join(TEST_OUTPUT_DIR, "od_pairs.csv")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Build Zone Grid from Network ---")
+    network_data = NetworkData(NETWORK_PATH)
+    network_data.process()
+    grid = ZoneGrid.from_points(
+        [n.x for n in network_data.nodes_list], [n.y for n in network_data.nodes_list],
+        rows=GRID_CFG.rows, cols=GRID_CFG.cols
+    )
+
+    print("\n--- Step 2: Plans Activities + Ridership Data ---")
+    plan_data = PlanInputData(PLANS_PATH)
+    plan_data.process()
+    plan_data.save_activities_to_csv(ACTIVITIES_CSV)
+    plan_data.save_legs_to_csv(LEGS_CSV)
+
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLES_CSV)
+
+    ridership_data = RidershipPrepareData(EVENTS_PATH, VEHICLES_CSV)
+    ridership_data.process()
+    ridership_data.save_ridership_to_csv(RIDERSHIP_CSV)
+
+    print("\n--- Step 3: Build OD Matrices ---")
+    od_data = ODMatrixPrepareData(ACTIVITIES_CSV, RIDERSHIP_CSV, grid, legs_csv_path=LEGS_CSV)
+    od_data.process()
+    od_data.save_od_matrices_to_npz(OD_NPZ)
+    od_data.save_od_pairs_to_csv(OD_CSV)
+
+    # Verification
+    print("\n--- Step 4: Verify Output ---")
+    if os.path.exists(OD_CSV):
+        df = pd.read_csv(OD_CSV)
+        print(f"OD pairs: {len(df)}, trips: {df['trips'].sum()}, PT trips: {df['pt_trips'].sum()}")
+        print(df.sort_values("trips", ascending=False).head())
+        # One-to-one: every ridership trip is matched or unmatched, and a plan trip takes at most one
+        ridership_trips = len(pd.read_csv(RIDERSHIP_CSV))
+        plan_trips = len(od_data._load_plan_trips())
+        if df["trips"].sum() + od_data.unmatched_trips == ridership_trips and df["trips"].sum() <= plan_trips:
+            print(f"SUCCESS: {df['trips'].sum()} of {ridership_trips} trips matched to {plan_trips} plan trips.")
+        else:
+            print(f"FAILURE: {df['trips'].sum()} matched + {od_data.unmatched_trips} unmatched "
+                  f"!= {ridership_trips} trips (plan trips: {plan_trips}).")
+    else:
+        print("FAILURE: Output file not created.")
+
+if __name__ == "__main__":
+    main()
@@ -47,6 +47,7 @@ def main():
     otp_processor = OnTimePerformancePrepareData(EVENTS_PATH, VEHICLES_CSV)
     otp_processor.process()
     otp_processor.save_otp_data_to_csv(OTP_CSV)
+    otp_processor.save_time_series_to_csv(os.path.join(TEST_OUTPUT_DIR, "otp_time_series.csv"))
     
     # Verification
     print("\n--- Step 3: Verify Output ---")
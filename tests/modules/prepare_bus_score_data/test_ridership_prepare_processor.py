@@ -11,6 +11,7 @@ if project_root not in sys.path:
 
 from src.config_loader import load_config
 from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.events_stream import parse_time_window
 from src.modules.core_data_processor.vehicle_processor import VehicleData
 
 test_name = "test_ridership_prepare_processor"
@@ -49,6 +50,7 @@ def main():
     dataset = RidershipPrepareData(EVENTS_PATH, VEHICLE_CSV_PATH)
     dataset.process()
     dataset.save_ridership_to_csv(RIDERSHIP_OUTPUT_CSV)
+    dataset.save_time_series_to_csv(os.path.join(TEST_OUTPUT_DIR, "ridership_time_series.csv"))
     
     # Verification
     print("\n--- Step 3: Verify Output ---")
@@ -64,5 +66,15 @@ def main():
     else:
         print("FAILURE: Output file not created.")
 
+    print("\n--- Step 4: Morning Peak Window (06:00-09:00) ---")
+    peak = RidershipPrepareData(EVENTS_PATH, VEHICLE_CSV_PATH, time_window=parse_time_window("06:00-09:00"))
+    peak.process()
+    peak_df = peak.get_dataframe()
+    if peak_df.empty or peak_df["startTime"].between(6 * 3600, 9 * 3600, inclusive="left").all():
+        print(f"SUCCESS: {len(peak_df)} peak trips, all starting inside the window "
+              f"({peak.truncated_trips} closed at the window end).")
+    else:
+        print("FAILURE: Peak trips outside the window.")
+
 if __name__ == "__main__":
     main()
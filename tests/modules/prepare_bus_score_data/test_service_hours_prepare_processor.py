@@ -0,0 +1,106 @@
+import os
+import sys
+import math
+import shutil
+import pandas as pd
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.schedule_processor import TransitScheduleData, parse_schedule_time
+from src.modules.prepare_bus_score_data.service_hours_prepare_processor import ServiceHoursPrepareData
+from src.modules.bus_scoring.productivity_scoring import calculate_productivity_score
+
+test_name = "test_service_hours_prepare_processor"
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    SCHEDULE_XML_PATH = config.data.matsim.before.input.transit_schedule
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    SERVICE_HOURS_CSV = os.path.join(TEST_OUTPUT_DIR, "route_service_hours.csv")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Process Transit Schedule ---")
+    schedule = TransitScheduleData(SCHEDULE_XML_PATH)
+    schedule.process()
+
+    print("\n--- Step 2: Service Hours (vectorized) ---")
+    service = ServiceHoursPrepareData(schedule=schedule)
+    service.process()
+    service.save_route_service_hours_to_csv(SERVICE_HOURS_CSV)
+    summary = service.summary()
+    print(f"Service hours summary: {summary}")
+
+    # Verification
+    print("\n--- Step 3: Verify against a per-departure loop ---")
+    revenue = 0.0
+    for route in schedule.routes_list:
+        if not route.stops or route.transport_mode.lower() != "bus":
+            continue
+        last = route.stops[-1]
+        end = parse_schedule_time(last.arrival_offset or last.departure_offset)
+        start = parse_schedule_time(route.stops[0].departure_offset)
+        start = 0.0 if math.isnan(start) else start
+        for departure in route.departures:
+            revenue += end - start
+    revenue /= 3600
+    if math.isclose(summary["revenue_hours"], revenue, rel_tol=1e-9, abs_tol=1e-9):
+        print(f"SUCCESS: {summary['revenue_hours']:.2f} revenue hours match the loop.")
+    else:
+        print(f"FAILURE: {summary['revenue_hours']} revenue hours vs. {revenue} from the loop.")
+
+    if summary["vehicle_hours"] >= summary["revenue_hours"] - 1e-9:
+        print("SUCCESS: Vehicle-hours cover the revenue hours.")
+    else:
+        print(f"FAILURE: {summary['vehicle_hours']} vehicle-hours < {summary['revenue_hours']} revenue hours.")
+
+    print("\n--- Step 4: Service Hours in a Time Window (06:00-09:00) ---")
+    window = (6 * 3600.0, 9 * 3600.0)
+    windowed = ServiceHoursPrepareData(schedule=schedule, time_window=window)
+    windowed.process()
+    clipped = 0.0
+    for route in schedule.routes_list:
+        if not route.stops or route.transport_mode.lower() != "bus":
+            continue
+        last = route.stops[-1]
+        first = parse_schedule_time(route.stops[0].departure_offset)
+        first = 0.0 if math.isnan(first) else first
+        duration = parse_schedule_time(last.arrival_offset or last.departure_offset) - first
+        for departure in route.departures:
+            start = parse_schedule_time(departure.departure_time) + first
+            clipped += max(min(start + duration, window[1]) - max(start, window[0]), 0.0)
+    clipped /= 3600
+    if math.isclose(windowed.summary()["revenue_hours"], clipped, rel_tol=1e-9, abs_tol=1e-9):
+        print(f"SUCCESS: {clipped:.2f} revenue hours in the window match the clipped loop.")
+    else:
+        print(f"FAILURE: {windowed.summary()['revenue_hours']} windowed revenue hours vs. {clipped} from the loop.")
+
+    print("\n--- Step 5: Productivity Score ---")
+    riders = 1000
+    res = calculate_productivity_score(summary["revenue_hours"], riders)
+    if math.isclose(res["productivity"], math.exp(-summary["revenue_hours"] / riders)) \
+            and calculate_productivity_score(summary["revenue_hours"], 0)["productivity"] == 0.0:
+        print("SUCCESS: Productivity score is exp(-service hours / riders).")
+    else:
+        print(f"FAILURE: Unexpected productivity score: {res}")
+
+    if os.path.exists(SERVICE_HOURS_CSV):
+        df = pd.read_csv(SERVICE_HOURS_CSV)
+        print(f"Output columns: {list(df.columns)}")
+        print(df.head())
+    else:
+        print("FAILURE: Output file not created.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import shutil
+import pandas as pd
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.core_data_processor.vehicle_processor import VehicleData, VEHICLE_TYPES_CSV
+from src.modules.prepare_bus_score_data.bus_occupancy_prepare_processor import BusOccupancyPrepareData
+from src.modules.prepare_bus_score_data.stop_activity_prepare_processor import StopActivityPrepareData
+from src.modules.prepare_bus_score_data.events_stream import run_events_stream
+
+test_name = "test_stop_activity_prepare_processor"
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLES_CSV = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    ACTIVITY_CSV = os.path.join(TEST_OUTPUT_DIR, "stop_activity.csv")
+    TOTALS_CSV = os.path.join(TEST_OUTPUT_DIR, "stop_activity_totals.csv")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Process Vehicles and Vehicle Types (XML -> CSV) ---")
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLES_CSV)
+    vehicle_data.save_vehicle_types_to_csv(os.path.join(TEST_OUTPUT_DIR, VEHICLE_TYPES_CSV))
+
+    print("\n--- Step 2: Stop Boardings/Alightings (standalone pass) ---")
+    activity = StopActivityPrepareData(EVENTS_PATH, VEHICLES_CSV)
+    activity.process()
+    activity.save_stop_activity_to_csv(ACTIVITY_CSV)
+    activity.save_stop_totals_to_csv(TOTALS_CSV)
+    print(f"Stop activity summary: {activity.summary()}")
+
+    print("\n--- Step 3: Shared pass with the occupancy processor ---")
+    occupancy = BusOccupancyPrepareData(EVENTS_PATH, VEHICLES_CSV)
+    shared = StopActivityPrepareData(EVENTS_PATH, VEHICLES_CSV, vehicle_index=occupancy.vehicle_index)
+    run_events_stream(EVENTS_PATH, [occupancy, shared])
+
+    # Verification
+    print("\n--- Step 4: Verify Output ---")
+    if shared.summary() == activity.summary():
+        print("SUCCESS: Shared pass matches the standalone pass.")
+    else:
+        print(f"FAILURE: Shared pass differs: {shared.summary()}")
+
+    # Over the whole day every passenger who boards a bus also leaves it
+    summary = activity.summary()
+    if summary["boardings"] == summary["alightings"]:
+        print(f"SUCCESS: {summary['boardings']} boardings balance the alightings.")
+    else:
+        print(f"FAILURE: {summary['boardings']} boardings vs. {summary['alightings']} alightings.")
+
+    if os.path.exists(TOTALS_CSV):
+        df = pd.read_csv(TOTALS_CSV)
+        print(f"Output columns: {list(df.columns)}")
+        print(df.head())
+    else:
+        print("FAILURE: Output file not created.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import shutil
+import pandas as pd
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.trip_structure_prepare_processor import TripStructurePrepareData
+from src.modules.core_data_processor.vehicle_processor import VehicleData
+
+test_name = "test_trip_structure_prepare_processor"
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLE_CSV_PATH = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    RIDERSHIP_CSV = os.path.join(TEST_OUTPUT_DIR, "ridership_processed.csv")
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Prepare Vehicles and Ridership ---")
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLE_CSV_PATH)
+    ridership = RidershipPrepareData(EVENTS_PATH, VEHICLE_CSV_PATH)
+    ridership.process()
+    ridership.save_ridership_to_csv(RIDERSHIP_CSV)
+
+    print("\n--- Step 2: Trip Structure (in-memory records and ridership CSV) ---")
+    in_memory = TripStructurePrepareData(ridership=ridership)
+    in_memory.process()
+    in_memory.save_transfer_distribution_to_csv(os.path.join(TEST_OUTPUT_DIR, "pt_transfer_distribution.csv"))
+    in_memory.save_sequence_distribution_to_csv(os.path.join(TEST_OUTPUT_DIR, "pt_vehicle_sequences.csv"))
+    from_csv = TripStructurePrepareData(RIDERSHIP_CSV)
+    from_csv.process()
+    print(f"Summary: {in_memory.summary()}")
+
+    # Verification
+    print("\n--- Step 3: Verify Output ---")
+    if in_memory.summary() == from_csv.summary():
+        print("SUCCESS: In-memory and CSV trip structures match.")
+    else:
+        print("FAILURE: In-memory and CSV trip structures differ.")
+
+    # Reference: transfers by splitting the vehicle lists row by row
+    df = pd.read_csv(RIDERSHIP_CSV)
+    pt = df[df["mainMode"] == "pt"]
+    expected = pt["vehIDList"].str.split("|").str.len().sub(1).clip(lower=0).value_counts().sort_index()
+    distribution = in_memory.get_transfer_distribution().set_index("transfers")["trips"]
+    if distribution[distribution > 0].to_dict() == expected.to_dict():
+        print("SUCCESS: Transfer counts match the vehicle lists.")
+    else:
+        print(f"FAILURE: Transfer counts {distribution.to_dict()} differ from {expected.to_dict()}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import shutil
+
+# Add project root to sys.path to enable importing from src
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_loader import load_config
+from src.modules.prepare_bus_score_data.ridership_prepare_processor import RidershipPrepareData
+from src.modules.prepare_bus_score_data.trips_legs_prepare_processor import TripsLegsPrepareData
+from src.modules.core_data_processor.vehicle_processor import VehicleData
+
+test_name = "test_trips_legs_prepare_processor"
+
+def main():
+    # Setup paths
+    config = load_config()
+
+    # Inputs
+    EVENTS_PATH = config.data.matsim.before.output.events
+    if not os.path.exists(EVENTS_PATH) and os.path.exists(EVENTS_PATH + ".gz"):
+         EVENTS_PATH += ".gz"
+    TRIPS_PATH = config.data.matsim.before.output.trips
+    LEGS_PATH = config.data.matsim.before.output.legs
+    VEHICLE_XML_PATH = config.data.matsim.before.input.transit_vehicle
+
+    TEST_OUTPUT_DIR = os.path.join(config.test.output, test_name)
+    VEHICLE_CSV_PATH = os.path.join(TEST_OUTPUT_DIR, "vehicles.csv")
+    RIDERSHIP_OUTPUT_CSV = os.path.join(TEST_OUTPUT_DIR, "ridership_from_trips.csv")
+
+    if not os.path.exists(TRIPS_PATH) or not os.path.exists(LEGS_PATH):
+        print(f"SKIPPED: Trips/legs tables not found ({TRIPS_PATH}, {LEGS_PATH}).")
+        return
+
+    # Cleanup previous runs
+    if os.path.exists(TEST_OUTPUT_DIR):
+        shutil.rmtree(TEST_OUTPUT_DIR)
+    os.makedirs(TEST_OUTPUT_DIR, exist_ok=True)
+
+    print("--- Step 1: Prepare Vehicle Types (XML -> CSV) ---")
+    vehicle_data = VehicleData(VEHICLE_XML_PATH)
+    vehicle_data.process()
+    vehicle_data.save_vehicles_to_csv(VEHICLE_CSV_PATH)
+
+    print("\n--- Step 2: Ridership from Trips/Legs Tables ---")
+    dataset = TripsLegsPrepareData(TRIPS_PATH, LEGS_PATH, VEHICLE_CSV_PATH)
+    dataset.process()
+    dataset.save_ridership_to_csv(RIDERSHIP_OUTPUT_CSV)
+    dataset.save_time_series_to_csv(os.path.join(TEST_OUTPUT_DIR, "ridership_time_series.csv"))
+
+    print("\n--- Step 3: Parity with the Events-Based Ridership ---")
+    reference = RidershipPrepareData(EVENTS_PATH, VEHICLE_CSV_PATH)
+    reference.process()
+    parity = dataset.check_parity(reference)
+    if parity["match_percentage"] >= 99.0 and parity["summary_diff"]["unique_persons_bus"] == 0:
+        print(f"SUCCESS: Trips/legs ridership matches the events ({parity['match_percentage']:.2f}% of trips).")
+    else:
+        print(f"FAILURE: Trips/legs ridership differs from the events: {parity}")
+
+if __name__ == "__main__":
+    main()